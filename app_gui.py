@@ -2,6 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
+import json
 import requests
 import threading
 import calendar
@@ -9,6 +10,8 @@ from datetime import date
 
 # --- Configuration ---
 API_URL = "http://127.0.0.1:8000/analyze"
+# Same analysis as newline-delimited JSON progress events (per year, with provisional results)
+API_STREAM_URL = "http://127.0.0.1:8000/analyze/stream"
 
 AVAILABLE_VARIABLES = [
     "max_temp_c",
@@ -134,7 +137,7 @@ class TerraClimeApp:
         ttk.Button(actions, text="Clear Results", command=self._clear_results).pack(side=tk.LEFT, padx=8)
 
         # Progress + Status
-        self.progress = ttk.Progressbar(actions, mode="indeterminate", length=180)
+        self.progress = ttk.Progressbar(actions, mode="determinate", length=180)
         self.progress.pack(side=tk.LEFT, padx=10)
         self.status_label = ttk.Label(actions, text="")
         self.status_label.pack(side=tk.LEFT, padx=6)
@@ -244,7 +247,7 @@ class TerraClimeApp:
             return
 
         self._set_inputs_enabled(False)
-        self.progress.start(12)
+        self.progress.configure(mode="determinate", value=0, maximum=1)
         self.status_label.config(text="Fetching NASA data…")
 
         payload = {
@@ -261,19 +264,47 @@ class TerraClimeApp:
 
     def _run_analysis(self, payload: dict):
         try:
-            resp = requests.post(API_URL, json=payload, timeout=120)
-            resp.raise_for_status()
-            data = resp.json()
-        except requests.exceptions.RequestException as e:
-            self.root.after(0, lambda: messagebox.showerror("API Error", f"Could not get data from the backend.\n\nError: {e}"))
-            self.root.after(0, self._reset_ui_state)
-            return
+            # The read timeout applies between events, not to the whole analysis
+            with requests.post(API_STREAM_URL, json=payload, stream=True, timeout=(10, 120)) as resp:
+                if resp.status_code == 404:
+                    # Older backend without the streaming endpoint
+                    self._run_analysis_blocking(payload)
+                    return
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if line:
+                        event = json.loads(line)
+                        self.root.after(0, lambda e=event: self._handle_event(e))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.root.after(0, lambda err=e: messagebox.showerror("API Error", f"Could not get data from the backend.\n\nError: {err}"))
+        self.root.after(0, self._reset_ui_state)
 
+    def _run_analysis_blocking(self, payload: dict):
+        self.root.after(0, lambda: (self.progress.configure(mode="indeterminate"), self.progress.start(12)))
+        resp = requests.post(API_URL, json=payload, timeout=120)
+        resp.raise_for_status()
+        data = resp.json()
         self.root.after(0, lambda d=data: self._display_results(d))
-        self.root.after(0, self._reset_ui_state)
+
+    def _handle_event(self, event: dict):
+        kind = event.get("event")
+        if kind == "start":
+            self.progress.configure(maximum=max(1, event.get("total", 1)), value=0)
+            self.status_label.config(text=f"Fetching NASA data… 0/{event.get('total', 0)} days")
+        elif kind == "progress":
+            done, total = event.get("done", 0), event.get("total", 0)
+            self.progress.configure(value=done)
+            self.status_label.config(text=f"Fetching NASA data… {done}/{total} days (provisional results)")
+            self._display_results({"results": event.get("provisional", [])})
+        elif kind == "result":
+            self.progress.configure(value=self.progress["maximum"])
+            self._display_results(event)
+        elif kind == "error":
+            messagebox.showerror("API Error", f"The analysis failed.\n\nError: {event.get('detail')}")
 
     def _reset_ui_state(self):
         self.progress.stop()
+        self.progress.configure(mode="determinate", value=0)
         self.status_label.config(text="")
         self._set_inputs_enabled(True)
 
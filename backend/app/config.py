@@ -0,0 +1,51 @@
+# backend/app/config.py
+
+import os
+
+# Same examples the desktop GUI offers (app_gui.EXAMPLE_LOCATIONS); kept here
+# because the backend cannot import the Tk app. They seed the prefetch hot list.
+EXAMPLE_LOCATIONS = [
+    ("Yosemite Valley, USA", 37.74, -119.59),
+    ("New Delhi, India", 28.61, 77.21),
+    ("Nairobi, Kenya", -1.29, 36.82),
+    ("Sydney, Australia", -33.87, 151.21),
+    ("London, UK", 51.51, -0.13),
+]
+
+# --- Background prefetch (app/services/prefetch.py) ---
+# Opt-in: "1" starts the prefetch worker with the API, which then downloads
+# granules in the background with the configured Earthdata credentials
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+# Calendar days from today that are pre-warmed for every hot location
+PREFETCH_DAYS_AHEAD = int(os.getenv("PREFETCH_DAYS_AHEAD", "14"))
+# Popular cells taken from the query log, on top of EXAMPLE_LOCATIONS
+PREFETCH_POPULAR_CELLS = int(os.getenv("PREFETCH_POPULAR_CELLS", "20"))
+# Prefetch items fetched at the same time, and download threads per item
+# (live queries use NASA_FETCH_WORKERS threads)
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+PREFETCH_FETCH_WORKERS = int(os.getenv("PREFETCH_FETCH_WORKERS", "2"))
+# The worker waits this long after the last live query before resuming
+PREFETCH_IDLE_SECONDS = float(os.getenv("PREFETCH_IDLE_SECONDS", "5"))
+# Seconds between rebuilding the hot list (dates move on, popularity changes)
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "21600"))
+
+# --- Data source (app/services/data_access.py) ---
+# "opendap" (live GES DISC), "netcdf" (local mirror file) or "simulator"
+DATA_SOURCE = os.getenv("DATA_SOURCE", "opendap")
+# MERRA-2 fields (T2M, PRECTOTCORR, ...) on the lat/lon grid, hourly with real timestamps
+DATA_SOURCE_PATH = os.getenv("DATA_SOURCE_PATH", "offline_merra2.nc4")
+# Same seed, same simulated values
+SIMULATOR_SEED = int(os.getenv("SIMULATOR_SEED", "0"))
+
+# --- Background jobs (app/services/pipeline.py, /jobs endpoints) ---
+# Worker processes running jobs; 0 runs them on threads in the API process.
+# Workers are spawned and read their configuration from the environment.
+JOB_PROCESSES = int(os.getenv("JOB_PROCESSES", "2"))
+# A queued/running job not updated for this long is considered dead and is not joined
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "900"))
+# Minimum seconds between partial-result updates of a running job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1"))
+
+# --- Local granule reads (app/services/granule_reader.py) ---
+# Decompressed HDF5 chunks kept in memory, shared by all local reads in a process
+CHUNK_CACHE_BYTES = int(float(os.getenv("CHUNK_CACHE_MB", "256")) * 2**20)
@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.routers import metrics
+
 app = FastAPI(title="Weather Likelihood API", version="0.1.0")
 
 app.add_middleware(
@@ -10,6 +12,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(metrics.router)
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
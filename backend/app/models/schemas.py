@@ -0,0 +1,126 @@
+# backend/app/models/schemas.py
+
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class AnalysisRequest(BaseModel):
+    latitude: float = Field(..., example=37.74)
+    longitude: float = Field(..., example=-119.59)
+    month: int = Field(..., gt=0, lt=13, example=7)
+    day: int = Field(..., gt=0, lt=32, example=15)
+    variables: List[str] = Field(..., example=["max_temp_c"])
+    # Pool the days within ±window_days of the date from every year (0 = the date only)
+    window_days: int = Field(0, ge=0, le=15, example=7)
+    # Baseline period, anywhere from 1980 to the latest published year; each bound
+    # defaults to the configured climate period (CLIMATE_START_YEAR/CLIMATE_END_YEAR)
+    start_year: Optional[int] = Field(None, ge=1980, example=1991)
+    end_year: Optional[int] = Field(None, ge=1980, example=2020)
+
+
+class ThresholdAnalysis(BaseModel):
+    probability_exceeding: Optional[float] = Field(None, example=0.40)
+    probability_of_event: Optional[float] = Field(None, example=0.10)
+    empirical_probability_exceeding: Optional[float] = Field(None, example=0.37)
+    # Bootstrap confidence interval of the reported probability
+    confidence_interval: Optional[List[float]] = Field(None, example=[0.22, 0.58])
+
+
+class VariableResult(BaseModel):
+    variable: str
+    unit: str
+    mean: float
+    std_dev: float
+    likelihood: ThresholdAnalysis
+    percentiles: Optional[Dict[str, float]] = Field(None, example={"p10": 27.1, "p50": 30.4, "p90": 33.8})
+    raw_data_points: int
+
+
+class GridCellInfo(BaseModel):
+    """The MERRA-2 cell the query point was snapped to; all data comes from this cell."""
+    latitude: float = Field(..., example=37.5)
+    longitude: float = Field(..., example=-119.375)
+    lat_index: int = Field(..., example=255)
+    lon_index: int = Field(..., example=97)
+
+
+class AnalysisResponse(BaseModel):
+    query: AnalysisRequest
+    grid_cell: Optional[GridCellInfo] = None
+    results: List[VariableResult]
+    metadata: dict = {
+        "data_source": "NASA MERRA-2 M2T1NXSLV.5.12.4 via GES DISC OPe_NDAP",
+        "climate_period": "1991-2020"
+    }
+
+
+class Point(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90, example=37.74)
+    longitude: float = Field(..., ge=-180, le=180, example=-119.59)
+
+
+class CalendarDay(BaseModel):
+    month: int = Field(..., gt=0, lt=13, example=7)
+    day: int = Field(..., gt=0, lt=32, example=15)
+
+
+class BatchAnalysisRequest(BaseModel):
+    """Every point is analyzed for every date."""
+    points: List[Point] = Field(..., min_length=1)
+    dates: List[CalendarDay] = Field(..., min_length=1)
+    variables: List[str] = Field(..., example=["max_temp_c", "precipitation_mm"])
+
+
+class BatchPointColumns(BaseModel):
+    """One entry per requested point, in request order, with the MERRA-2 cell it snapped to."""
+    latitude: List[float]
+    longitude: List[float]
+    cell_latitude: List[float]
+    cell_longitude: List[float]
+
+
+class BatchResultColumns(BaseModel):
+    """
+    One entry per (point, date, variable) with data. `point` indexes into the
+    point columns; probabilities not computed for a variable are null.
+    """
+    point: List[int] = []
+    month: List[int] = []
+    day: List[int] = []
+    variable: List[str] = []
+    mean: List[float] = []
+    std_dev: List[float] = []
+    probability_exceeding: List[Optional[float]] = []
+    probability_of_event: List[Optional[float]] = []
+    empirical_probability_exceeding: List[Optional[float]] = []
+    probability_ci_low: List[float] = []
+    probability_ci_high: List[float] = []
+    p10: List[float] = []
+    p50: List[float] = []
+    p90: List[float] = []
+    raw_data_points: List[int] = []
+
+
+class BatchAnalysisResponse(BaseModel):
+    points: BatchPointColumns
+    results: BatchResultColumns
+    units: dict
+    metadata: dict = {
+        "data_source": "NASA MERRA-2 M2T1NXSLV.5.12.4 via GES DISC OPe_NDAP",
+        "climate_period": "1991-2020"
+    }
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str = Field(..., example="batch")
+    status: str = Field(..., example="running")  # queued, running, done or failed
+    done: int = 0  # units of work finished out of `total` (sampled dates for analyze, calendar days for batch)
+    total: int = 0
+    created: float
+    updated: float
+    # Results so far while running, shaped like the final result
+    partial: Optional[dict] = None
+    # The /analyze or /analyze/batch response body once done
+    result: Optional[dict] = None
+    error: Optional[str] = None
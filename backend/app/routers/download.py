@@ -0,0 +1,82 @@
+# backend/app/routers/download.py
+
+import time
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.services.data_access import get_data_source
+from app.services.export import export_csv, export_netcdf
+from app.services.prefetch import live_traffic
+from app.services.stats import VARIABLE_DETAILS
+from app.utils.metrics import REQUEST_SECONDS
+
+# Upper bound on points x dates in one download (each date is 30 years of rows)
+MAX_DOWNLOAD_QUERIES = 5000
+
+FORMATS = {
+    "csv": (export_csv, "text/csv", "csv"),
+    "netcdf": (export_netcdf, "application/x-netcdf", "nc"),
+}
+
+router = APIRouter()
+
+
+@router.get("/api/download")
+def download(
+    latitude: List[float] = Query(...),
+    longitude: List[float] = Query(...),
+    month: List[int] = Query(...),
+    day: List[int] = Query(...),
+    variables: List[str] = Query(...),
+    window_days: int = Query(0, ge=0, le=15),
+    format: str = Query("csv", pattern="^(csv|netcdf)$"),
+):
+    """
+    The historical daily values behind a query or batch, as a streamed CSV or
+    NetCDF file: one row per point (latitude[i], longitude[i]), calendar day
+    (month[j], day[j]) and climate-period date. Every file carries the dataset
+    DOI, the source granules, software versions and the NASA non-endorsement notice.
+    """
+    if len(latitude) != len(longitude):
+        raise HTTPException(status_code=422, detail="latitude and longitude must be given the same number of times")
+    if len(month) != len(day):
+        raise HTTPException(status_code=422, detail="month and day must be given the same number of times")
+    if not all(-90 <= lat <= 90 for lat in latitude) or not all(-180 <= lon <= 180 for lon in longitude):
+        raise HTTPException(status_code=422, detail="Coordinates out of range")
+    if not all(1 <= m <= 12 for m in month) or not all(1 <= d <= 31 for d in day):
+        raise HTTPException(status_code=422, detail="month must be 1-12 and day 1-31")
+    requested = [var for var in dict.fromkeys(variables) if var in VARIABLE_DETAILS]
+    if not requested:
+        raise HTTPException(status_code=422, detail=f"No known variables; expected some of {sorted(VARIABLE_DETAILS)}")
+    if len(latitude) * len(month) > MAX_DOWNLOAD_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_DOWNLOAD_QUERIES} point/date combinations per download",
+        )
+
+    export, media_type, extension = FORMATS[format]
+    points = list(zip(latitude, longitude))
+    days = list(dict.fromkeys(zip(month, day)))
+    chunks = export(get_data_source(), points, days, requested, window_days)
+    return StreamingResponse(
+        _timed(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="terraclime_export.{extension}"'},
+    )
+
+
+def _timed(chunks):
+    """Pass the export through, counting it as live traffic; runs on Starlette's threadpool."""
+    started = time.perf_counter()
+    try:
+        with live_traffic.track():
+            yield from chunks
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated file
+        print(f"  - Download failed: {e}")
+        raise
+    finally:
+        chunks.close()
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="download")
@@ -0,0 +1,14 @@
+# backend/app/routers/metrics.py
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.utils.metrics import CONTENT_TYPE, render
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: stage timings, download volume and cache hit ratios."""
+    return Response(content=render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,145 @@
+# backend/app/routers/query.py
+
+import asyncio
+from fastapi import APIRouter, HTTPException
+
+from nasa_data_fetcher import climate_period
+from app.models.schemas import (
+    AnalysisRequest,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
+    BatchResultColumns,
+    JobStatus,
+)
+from app.services.data_access import get_data_source
+from app.services.datasets import snap_to_grid
+from app.services.pipeline import get_job_queue
+from app.services.prefetch import live_traffic
+from app.services.stats import VARIABLE_DETAILS, summarize_many
+from app.utils.metrics import REQUEST_SECONDS, time_stage
+
+# Upper bound on points x dates in one batch request
+MAX_BATCH_QUERIES = 5000
+# Upper bound on points x dates in one batch job
+MAX_JOB_QUERIES = 50000
+
+router = APIRouter()
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(request: BatchAnalysisRequest):
+    """
+    Likelihood statistics for many points and dates in one call.
+
+    Points that fall in the same MERRA-2 cell share their data, and each granule
+    is downloaded once for all points that need it. Results are columnar: parallel
+    lists with one entry per (point, date, variable).
+    """
+    with REQUEST_SECONDS.time(endpoint="analyze_batch"):
+        return await _analyze_batch(request)
+
+
+async def _analyze_batch(request: BatchAnalysisRequest) -> BatchAnalysisResponse:
+    if len(request.points) * len(request.dates) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_QUERIES} point/date combinations per batch request",
+        )
+
+    requested, cells, days = batch_query(request)
+
+    # The batch download blocks for a long time; keep it off the event loop
+    with live_traffic.track():
+        series = await asyncio.to_thread(get_data_source().batch_series, cells, days, requested) if requested else {}
+    return batch_response(request, series, get_data_source().description)
+
+
+def batch_query(request: BatchAnalysisRequest):
+    """(known variables, grid cells, (month, day) pairs) of a batch request."""
+    requested = tuple(dict.fromkeys(var for var in request.variables if var in VARIABLE_DETAILS))
+    cells = [snap_to_grid(point.latitude, point.longitude) for point in request.points]
+    days = [(date.month, date.day) for date in request.dates]
+    return requested, cells, days
+
+
+def batch_response(request: BatchAnalysisRequest, series: dict, data_source: str) -> BatchAnalysisResponse:
+    """Columnar response for a batch request from the fetched {(cell index, month, day): {variable: [values]}}."""
+    requested, cells, days = batch_query(request)
+
+    # One vectorized statistics pass over every (point, date, variable)
+    keys = [(n, cell, month, day, var) for n, cell in enumerate(cells) for month, day in days for var in requested]
+    with time_stage("statistics"):
+        summaries = summarize_many(
+            (var, series.get((cell.index, month, day), {}).get(var, [])) for _, cell, month, day, var in keys
+        )
+
+    columns = {name: [] for name in BatchResultColumns.model_fields}
+    for (n, _, month, day, var), summary in zip(keys, summaries):
+        if summary is None:
+            continue
+        likelihood = summary["likelihood"]
+        low, high = likelihood["confidence_interval"]
+        row = {
+            "point": n,
+            "month": month,
+            "day": day,
+            "variable": var,
+            "mean": summary["mean"],
+            "std_dev": summary["std_dev"],
+            "probability_exceeding": likelihood.get("probability_exceeding"),
+            "probability_of_event": likelihood.get("probability_of_event"),
+            "empirical_probability_exceeding": likelihood.get("empirical_probability_exceeding"),
+            "probability_ci_low": low,
+            "probability_ci_high": high,
+            "raw_data_points": summary["raw_data_points"],
+            **summary["percentiles"],
+        }
+        for name, values in columns.items():
+            values.append(row[name])
+
+    return BatchAnalysisResponse(
+        points={
+            "latitude": [point.latitude for point in request.points],
+            "longitude": [point.longitude for point in request.points],
+            "cell_latitude": [cell.latitude for cell in cells],
+            "cell_longitude": [cell.longitude for cell in cells],
+        },
+        results=columns,
+        units={var: VARIABLE_DETAILS[var]["unit"] for var in requested},
+        metadata={**BatchAnalysisResponse.model_fields["metadata"].default, "data_source": data_source,
+                  "climate_period": "{}-{}".format(*climate_period())},
+    )
+
+
+@router.post("/jobs/analyze", response_model=JobStatus, status_code=202)
+async def submit_analyze_job(request: AnalysisRequest):
+    """
+    Run an /analyze query in the background. Poll GET /jobs/{id}; the finished
+    job's result is the /analyze response. An identical query that is already
+    queued, running or done returns that job instead of starting another.
+    """
+    try:
+        climate_period(request.start_year, request.end_year)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await asyncio.to_thread(get_job_queue().submit, "analyze", request.model_dump())
+
+
+@router.post("/jobs/batch", response_model=JobStatus, status_code=202)
+async def submit_batch_job(request: BatchAnalysisRequest):
+    """Run an /analyze/batch query in the background, with a larger size limit; see /jobs/analyze."""
+    if len(request.points) * len(request.dates) > MAX_JOB_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_JOB_QUERIES} point/date combinations per batch job",
+        )
+    return await asyncio.to_thread(get_job_queue().submit, "batch", request.model_dump())
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    """Status, progress and (partial) results of a background job."""
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
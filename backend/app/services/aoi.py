@@ -0,0 +1,201 @@
+# backend/app/services/aoi.py
+
+"""
+Areas of interest: area-weighted MERRA-2 values over a polygon or bounding box.
+
+An AOI is turned once into an AOIMask: the rectangle of grid cells spanning it
+and each cell's share of the AOI's area. Masks are cached by a hash of the
+normalized geometry, so a repeated AOI query skips the geometry work entirely
+and reducing a granule is a single weighted sum over the (lat, lon) block:
+
+    mask = aoi_mask(parse_aoi(bbox=[-119.9, 37.5, -119.2, 38.2]))
+    area_mean = mask.apply(daily_values)   # (..., lat, lon) -> (...)
+
+Cell areas use the cos(latitude) approximation, exact enough for 0.5° cells.
+Geometries are in lon/lat degrees and may not cross the antimeridian.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from pyproj import Geod
+from shapely.geometry import Polygon, box
+
+from app.services.datasets import (
+    MERRA2_LAT_START, MERRA2_LAT_STEP, MERRA2_LON_START, MERRA2_LON_STEP, MERRA2_NLON,
+    cell_from_index, snap_to_grid,
+)
+from app.utils.metrics import REGISTRY
+
+# Largest AOI accepted, in grid cells of its bounding rectangle (~ 1,000 x 1,000 km)
+MAX_AOI_CELLS = 4000
+# Masks kept in memory
+AOI_MASK_CACHE_SIZE = 256
+
+_GEOD = Geod(ellps="WGS84")
+
+
+def parse_aoi(polygon=None, bbox=None):
+    """
+    Shapely geometry for an AOI given either as a polygon ring of [lon, lat]
+    pairs (GeoJSON order) or a bbox [west, south, east, north]. Raises ValueError
+    for empty, invalid or antimeridian-crossing shapes.
+    """
+    if (polygon is None) == (bbox is None):
+        raise ValueError("Give exactly one of polygon or bbox")
+    if bbox is not None:
+        if len(bbox) != 4:
+            raise ValueError("bbox must be [west, south, east, north]")
+        west, south, east, north = map(float, bbox)
+        if west >= east or south >= north:
+            raise ValueError("bbox must have west < east and south < north")
+        geom = box(west, south, east, north)
+    else:
+        if len(polygon) < 3:
+            raise ValueError("A polygon needs at least three [lon, lat] vertices")
+        geom = Polygon([(float(lon), float(lat)) for lon, lat in polygon])
+
+    if geom.is_empty or not geom.is_valid or geom.area == 0:
+        raise ValueError("The area of interest is empty or not a valid polygon")
+    west, south, east, north = geom.bounds
+    if south < -90 or north > 90 or west < -180 or east > 180:
+        raise ValueError("Coordinates must be lon in [-180, 180] and lat in [-90, 90]")
+    return geom
+
+
+def geometry_key(geom) -> str:
+    """Stable hash of a geometry; the same shape with rotated or reversed rings hashes the same."""
+    return hashlib.sha256(shapely.to_wkb(shapely.normalize(geom))).hexdigest()[:24]
+
+
+class AOIMask:
+    """
+    Area weights of the grid cells overlapping an AOI.
+
+    weights has shape (len(lat_indices), len(lon_indices)) over the AOI's
+    bounding rectangle of cells and sums to 1; cells outside the AOI weigh 0.
+    """
+
+    def __init__(self, key: str, lat_start: int, lon_start: int, weights: np.ndarray, area_km2: float):
+        self.key = key
+        self.lat_start = lat_start
+        self.lon_start = lon_start
+        self.weights = weights
+        self.area_km2 = area_km2
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, AOIMask) and other.key == self.key
+
+    @property
+    def lat_indices(self) -> np.ndarray:
+        return self.lat_start + np.arange(self.weights.shape[0])
+
+    @property
+    def lon_indices(self) -> np.ndarray:
+        return self.lon_start + np.arange(self.weights.shape[1])
+
+    @property
+    def latitudes(self) -> np.ndarray:
+        return MERRA2_LAT_START + MERRA2_LAT_STEP * self.lat_indices
+
+    @property
+    def longitudes(self) -> np.ndarray:
+        return MERRA2_LON_START + MERRA2_LON_STEP * self.lon_indices
+
+    @property
+    def corners(self) -> list:
+        """The two GridCells spanning the block, e.g. for a box subset download."""
+        return [cell_from_index(self.lat_indices[0], self.lon_indices[0]),
+                cell_from_index(self.lat_indices[-1], self.lon_indices[-1])]
+
+    def cells(self) -> list:
+        """(GridCell, weight) of every cell the AOI overlaps."""
+        return [
+            (cell_from_index(self.lat_start + i, self.lon_start + j), float(self.weights[i, j]))
+            for i, j in zip(*np.nonzero(self.weights))
+        ]
+
+    def apply(self, values) -> np.ndarray:
+        """
+        Area-weighted mean over the trailing (lat, lon) axes. Cells without data
+        (NaN) are left out and the remaining weights renormalized.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        weights = np.where(finite, self.weights, 0.0)
+        total = weights.sum(axis=(-2, -1))
+        weighted = (np.where(finite, values, 0.0) * weights).sum(axis=(-2, -1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, weighted / total, np.nan)
+
+
+def build_mask(geom) -> AOIMask:
+    """Intersect an AOI with the MERRA-2 grid; see AOIMask."""
+    west, south, east, north = geom.bounds
+    low, high = snap_to_grid(south, west), snap_to_grid(north, east)
+    lat_indices = np.arange(low.lat_index, high.lat_index + 1)
+    # No wrap-around: the sliver east of the last cell's edge (179.6875°) is dropped
+    lon_stop = high.lon_index if east < 180 - MERRA2_LON_STEP / 2 else MERRA2_NLON - 1
+    lon_indices = np.arange(low.lon_index, lon_stop + 1)
+    count = len(lat_indices) * len(lon_indices)
+    if count > MAX_AOI_CELLS:
+        raise ValueError(f"The area of interest spans {count} grid cells; at most {MAX_AOI_CELLS} are allowed")
+
+    lat = MERRA2_LAT_START + MERRA2_LAT_STEP * lat_indices
+    lon = MERRA2_LON_START + MERRA2_LON_STEP * lon_indices
+    lat_grid, lon_grid = np.meshgrid(lat, lon, indexing="ij")
+    cells = shapely.box(
+        lon_grid - MERRA2_LON_STEP / 2, np.maximum(lat_grid - MERRA2_LAT_STEP / 2, -90),
+        lon_grid + MERRA2_LON_STEP / 2, np.minimum(lat_grid + MERRA2_LAT_STEP / 2, 90),
+    ).ravel()
+
+    # Only cells the tree finds touching the AOI are intersected
+    shapely.prepare(geom)
+    hits = shapely.STRtree(cells).query(geom, predicate="intersects")
+    overlap = np.zeros(count)
+    overlap[hits] = shapely.area(shapely.intersection(cells[hits], geom))
+    weights = overlap.reshape(lat_grid.shape) * np.cos(np.radians(lat_grid))
+    if weights.sum() <= 0:
+        raise ValueError("The area of interest does not overlap the grid")
+
+    area_m2, _ = _GEOD.geometry_area_perimeter(geom)
+    return AOIMask(geometry_key(geom), int(lat_indices[0]), int(lon_indices[0]),
+                   weights / weights.sum(), abs(area_m2) / 1e6)
+
+
+_masks = OrderedDict()
+_masks_lock = threading.Lock()
+_mask_stats = {"hits": 0, "misses": 0}
+
+
+def aoi_mask(geom) -> AOIMask:
+    """The AOIMask of a geometry, built once per distinct shape and kept in an LRU cache."""
+    key = geometry_key(geom)
+    with _masks_lock:
+        mask = _masks.get(key)
+        if mask is not None:
+            _masks.move_to_end(key)
+            _mask_stats["hits"] += 1
+            return mask
+        _mask_stats["misses"] += 1
+
+    mask = build_mask(geom)
+    with _masks_lock:
+        _masks[key] = mask
+        while len(_masks) > AOI_MASK_CACHE_SIZE:
+            _masks.popitem(last=False)
+    return mask
+
+
+@REGISTRY.collector
+def _aoi_metrics():
+    yield ("terraclime_aoi_mask_cache_hits_total", "counter",
+           "AOI queries whose cell-weight mask was already cached.", [({}, _mask_stats["hits"])])
+    yield ("terraclime_aoi_mask_cache_misses_total", "counter",
+           "AOI queries that built a new cell-weight mask.", [({}, _mask_stats["misses"])])
@@ -0,0 +1,234 @@
+# backend/app/services/catalog.py
+
+"""
+Granule catalog: resolve a (collection, date) to the exact granule file name.
+
+MERRA-2 file names carry a processing stream (MERRA2_100/200/300/400) that the
+fetcher used to guess from the year. Reprocessed days (e.g. MERRA2_401) do not
+follow that rule, so the guessed URL 404s and the day is lost. The catalog
+records the real file name of every day, learned either from a manifest (a
+plain list of granule URLs or CMR granule-search JSON) or from the archive's
+monthly directory listings, and keeps it in a local JSON file.
+
+Lookups are dict reads. A month is listed at most once; months recent enough to
+still receive granules are listed again after LISTING_TTL. Example:
+
+    python -m app.services.catalog --manifest subset_M2T1NXSLV.txt
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import threading
+import time
+
+from app.storage.store import CACHE_DIR, _atomic_write_json
+
+# Empty string disables the catalog (granule URLs are then guessed from the year)
+GRANULE_CATALOG_PATH = os.getenv("GRANULE_CATALOG_PATH", os.path.join(CACHE_DIR, "granule_catalog.json"))
+# Whether months missing from the catalog are listed from the archive on first use
+GRANULE_CATALOG_LISTING = os.getenv("GRANULE_CATALOG_LISTING", "1") == "1"
+# Months ending less than this long ago may still gain granules (MERRA-2 lags ~3 weeks)
+RECENT_MONTH_DAYS = 90
+LISTING_TTL = 24 * 3600
+
+GRANULE_NAME = re.compile(r"^MERRA2_(\d{3})\.(\w+)\.(\d{4})(\d{2})(\d{2})\.nc4$")
+COLLECTION_NAME = re.compile(r"/(M2\w+\.\d+\.\d+\.\d+)/")
+_LISTING_HREF = re.compile(r'href="([^"/?]+\.nc4)"')
+
+
+class GranuleNotFound(FileNotFoundError):
+    """The catalog knows the archive has no granule for a date."""
+
+
+def parse_granule_name(name: str):
+    """(stream, date) of a granule file name, or None if it is not one."""
+    match = GRANULE_NAME.match(name)
+    if not match:
+        return None
+    stream, _, year, month, day = match.groups()
+    try:
+        return int(stream), datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def manifest_urls(text: str) -> list:
+    """
+    Granule URLs from a manifest: CMR search results (ECHO JSON `feed.entry[].links`
+    or UMM JSON `items[].umm.RelatedUrls`), or any text with one URL per line.
+    """
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    urls = []
+    for entry in document.get("feed", {}).get("entry", []):
+        urls.extend(link.get("href", "") for link in entry.get("links", []))
+    for item in document.get("items", []):
+        urls.extend(link.get("URL", "") for link in item.get("umm", {}).get("RelatedUrls", []))
+    return urls
+
+
+class GranuleCatalog:
+    """
+    Per-collection index of date -> granule file name, persisted as JSON.
+
+    A month is "listed" once its complete set of granules is known (from a
+    directory listing); only then does a missing day mean the archive has no
+    granule for it. Manifests add granules without marking months listed.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._granules = {}  # collection -> {"YYYY-MM-DD": (stream, name)}
+        self._listed = {}    # collection -> {"YYYY-MM": listing time}
+        self._failed = set()  # (collection, "YYYY-MM") listings that failed in this process
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  - Ignoring unreadable granule catalog {self.path}: {e}")
+            return
+        for collection, entry in payload.get("collections", {}).items():
+            granules = self._granules.setdefault(collection, {})
+            for name in entry.get("granules", {}).values():
+                self._add(granules, name)
+            self._listed.setdefault(collection, {}).update(entry.get("listed", {}))
+
+    def save(self):
+        with self._lock:
+            payload = {
+                "collections": {
+                    collection: {
+                        "granules": {date: name for date, (_, name) in sorted(granules.items())},
+                        "listed": self._listed.get(collection, {}),
+                    }
+                    for collection, granules in self._granules.items()
+                }
+            }
+            for collection, listed in self._listed.items():
+                payload["collections"].setdefault(collection, {"granules": {}, "listed": listed})
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            _atomic_write_json(self.path, payload)
+
+    @staticmethod
+    def _add(granules: dict, name: str) -> bool:
+        parsed = parse_granule_name(name)
+        if parsed is None:
+            return False
+        stream, date = parsed
+        key = date.isoformat()
+        # A reprocessed granule (higher stream, e.g. 401) supersedes the original
+        if key not in granules or granules[key][0] < stream:
+            granules[key] = (stream, name)
+        return True
+
+    def add(self, collection: str, names) -> int:
+        """Record granule file names for a collection; returns how many were recognized."""
+        with self._lock:
+            granules = self._granules.setdefault(collection, {})
+            return sum(self._add(granules, name) for name in names)
+
+    def ingest_manifest(self, text: str, collection: str | None = None) -> int:
+        """
+        Add every granule URL of a manifest, filed under the collection named in its
+        URL path (or `collection` when the URL has none). Returns the number added.
+        """
+        by_collection = {}
+        for url in manifest_urls(text):
+            match = COLLECTION_NAME.search(url)
+            name = url.split("?", 1)[0].rsplit("/", 1)[-1]
+            key = match.group(1) if match else collection
+            if key:
+                by_collection.setdefault(key, []).append(name)
+        added = sum(self.add(key, names) for key, names in by_collection.items())
+        self.save()
+        return added
+
+    def lookup(self, collection: str, date: datetime.date):
+        """File name of the granule for a date, or None if the catalog does not have it."""
+        entry = self._granules.get(collection, {}).get(date.isoformat())
+        return entry[1] if entry else None
+
+    def is_listed(self, collection: str, year: int, month: int) -> bool:
+        """Whether the catalog holds a current listing of the whole month."""
+        listed_at = self._listed.get(collection, {}).get(f"{year}-{month:02d}")
+        if listed_at is None:
+            return False
+        month_end = datetime.date(year + month // 12, month % 12 + 1, 1)
+        recent = (datetime.date.today() - month_end).days < RECENT_MONTH_DAYS
+        return not recent or time.time() - listed_at < LISTING_TTL
+
+    def list_month(self, session, base_url: str, collection: str, year: int, month: int) -> bool:
+        """
+        Fetch the archive's directory listing of one month and record every granule
+        in it. Concurrent callers for the same month wait for one listing; a failed
+        listing is not retried in this process. Returns whether the month is listed.
+        """
+        month_key = f"{year}-{month:02d}"
+        with self._lock:
+            if (collection, month_key) in self._failed:
+                return False
+        # One listing at a time keeps concurrent fetch threads from repeating it
+        with _listing_lock:
+            if self.is_listed(collection, year, month):
+                return True
+            url = f"{base_url.rstrip('/')}/{year}/{month:02d}/"
+            try:
+                response = session.get(url, timeout=(10, 60))
+                response.raise_for_status()
+            except Exception as e:
+                print(f"  - Could not list {url}: {e}")
+                with self._lock:
+                    self._failed.add((collection, month_key))
+                return False
+            names = _LISTING_HREF.findall(response.text)
+            self.add(collection, names)
+            with self._lock:
+                self._listed.setdefault(collection, {})[month_key] = time.time()
+            self.save()
+            return True
+
+
+_listing_lock = threading.Lock()
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_granule_catalog():
+    """Process-wide GranuleCatalog at GRANULE_CATALOG_PATH, or None when disabled."""
+    global _catalog
+    if not GRANULE_CATALOG_PATH:
+        return None
+    with _catalog_lock:
+        if _catalog is None or _catalog.path != GRANULE_CATALOG_PATH:
+            _catalog = GranuleCatalog(GRANULE_CATALOG_PATH)
+        return _catalog
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest a granule manifest into the local catalog.")
+    parser.add_argument("--manifest", required=True, help="URL list or CMR granule-search JSON")
+    parser.add_argument("--collection", default=None, help="collection for URLs that do not name one")
+    args = parser.parse_args(argv)
+    catalog = get_granule_catalog()
+    if catalog is None:
+        parser.error("GRANULE_CATALOG_PATH is empty; the catalog is disabled")
+    with open(args.manifest) as f:
+        added = catalog.ingest_manifest(f.read(), collection=args.collection)
+    print(f"Added {added} granules to {catalog.path}")
+
+
+if __name__ == "__main__":
+    main()
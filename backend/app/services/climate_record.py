@@ -0,0 +1,279 @@
+# backend/app/services/climate_record.py
+
+"""
+Climate records: the baseline period as a query parameter instead of a rebuild.
+
+For sources whose values are worth keeping (the live archive), every year
+fetched for a (grid cell, calendar day, window, variable) is appended to a
+ClimateRecord (app/storage/store.py) of running sums and sorted samples. A query
+for 1991-2020 fetches and stores those 30 years; a later one for 1980-2024 only
+downloads 1980-1990 and 2021-2024, and every sub-period after that is
+summarized from the stored aggregates without a download:
+
+    series = period_series(get_data_source(), cell, 7, 15, ["max_temp_c"], period=(1980, 2024))
+    # {"max_temp_c": Sample(values=<sorted float32>, mean=..., std=...)}
+
+/analyze, /analyze/stream (through PeriodStream) and analyze jobs all read and
+extend the same records.
+
+`update_records` extends every stored record the same way, e.g. once GES DISC
+has published another year:
+
+    python -m app.services.climate_record --end-year 2025
+"""
+
+import argparse
+import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+import nasa_data_fetcher
+from app.services.data_access import get_data_source, ordered_series
+from app.services.datasets import cell_from_index
+from app.services.stats import VARIABLE_DETAILS, Sample
+from app.storage.store import get_climate_record_store
+
+
+def _settled_years(month: int, day: int, window_days: int, years) -> list:
+    """
+    The years a record can cover now: those whose window is published, and
+    those in which the date does not exist or that MERRA-2 does not reach, which
+    are covered without values. Years still to be published are left out.
+    """
+    latest = nasa_data_fetcher.latest_available_date()
+    settled = []
+    for year in years:
+        try:
+            anchor = datetime.date(year, month, day)
+        except ValueError:
+            settled.append(year)
+            continue
+        if anchor + datetime.timedelta(days=window_days) <= latest:
+            settled.append(year)
+    return settled
+
+
+def _runs(years) -> list:
+    """Consecutive runs of sorted years as (first, last) pairs."""
+    runs = []
+    for year in years:
+        if runs and runs[-1][1] == year - 1:
+            runs[-1][1] = year
+        else:
+            runs.append([year, year])
+    return [tuple(run) for run in runs]
+
+
+class _Plan(NamedTuple):
+    records: dict      # {variable: ClimateRecord} as stored
+    missing: list      # settled years of the period some variable's record lacks
+    anchors: dict      # {date: year} of the missing years' dates
+    unavailable: set   # of those dates, the ones the granule catalog lists without a granule
+
+
+def _plan(store, cell, month: int, day: int, variables, window_days: int, period: tuple) -> _Plan:
+    records = store.get_many(cell.index, month, day, window_days, variables)
+    wanted = _settled_years(month, day, window_days, range(period[0], period[1] + 1))
+    missing = sorted({year for var in variables for year in records[var].missing(wanted)})
+    if not missing:
+        return _Plan(records, missing, {}, set())
+    anchors = {date: year for (year, _), date in
+               nasa_data_fetcher.climate_dates(month, day, window_days, (missing[0], missing[-1])).items()
+               if year in missing}
+    unavailable = {date for date in anchors if nasa_data_fetcher.granule_missing(date)}
+    return _Plan(records, missing, anchors, unavailable)
+
+
+def _fetch_missing(store, source, cell, month: int, day: int, variables, window_days: int, plan: _Plan,
+                   max_workers: int | None = None):
+    """
+    Download the dates of the plan's missing years, yielding each (dates,
+    {variable: [values]}) chunk of source.stream_cell_series as it arrives. When
+    the downloads end, also if the consumer stops early, every year whose dates
+    all have a value for a variable is appended to that variable's record. Years
+    with no date left to download (all unpublished, or the date does not exist)
+    are recorded without a download.
+    """
+    by_year = {var: {year: [] for year in plan.missing} for var in variables}
+    to_fetch = set(plan.anchors) - plan.unavailable
+    pending = {var: set(to_fetch) for var in variables}
+    try:
+        for first, last in _runs(sorted({plan.anchors[date] for date in to_fetch})):
+            for dates, values in source.stream_cell_series(cell, month, day, variables, max_workers, window_days,
+                                                           (first, last)):
+                for var in variables:
+                    series = values.get(var, [])
+                    # Values can only be matched to dates where there is one per date
+                    if len(series) != len(dates):
+                        continue
+                    for date, value in zip(dates, series):
+                        if date in pending[var]:
+                            pending[var].discard(date)
+                            by_year[var][plan.anchors[date]].append(value)
+                yield dates, values
+    finally:
+        added = {}
+        for var, years in by_year.items():
+            unfinished = {plan.anchors[date] for date in pending[var]}
+            added[var] = {year: values for year, values in years.items() if year not in unfinished}
+        store.add_years(cell.index, month, day, window_days, added)
+
+
+def extend_records(store, source, cell, month: int, day: int, variables, window_days: int, period: tuple,
+                   max_workers: int | None = None) -> tuple:
+    """
+    Fetch the years of `period` that the cell's records lack and append them.
+    Returns ({variable: ClimateRecord}, number of years added). When the records
+    cover the period the source is not called at all. A year is only recorded for
+    a variable once every one of its dates has a value, so a failed download is
+    retried by the next query rather than stored as a gap; dates the granule
+    catalog lists without a granule are never published and count as done.
+    """
+    plan = _plan(store, cell, month, day, variables, window_days, period)
+    if not plan.missing:
+        return plan.records, 0
+    for _ in _fetch_missing(store, source, cell, month, day, variables, window_days, plan, max_workers):
+        pass
+    return store.get_many(cell.index, month, day, window_days, variables), len(plan.missing)
+
+
+def _samples(records: dict, variables, period: tuple) -> dict:
+    """{variable: Sample of the period from its record}; [] for variables without a record."""
+    series = {var: [] for var in variables}
+    for var, record in records.items():
+        values, mean, std = record.period(*period)
+        series[var] = Sample(values, mean, std) if len(values) else values
+    return series
+
+
+def period_series(source, cell, month: int, day: int, variables, max_workers: int | None = None,
+                  window_days: int = 0, period: tuple | None = None) -> dict:
+    """
+    cell_series over `period` (default: the configured climate period), through
+    the climate records when they are enabled and the source is worth storing:
+    {variable: Sample of the period's sorted values with their mean and std}.
+    Otherwise (or for variables the source does not know) plain cell_series.
+    """
+    period = period or nasa_data_fetcher.climate_period()
+    store = get_climate_record_store() if source.prefetchable else None
+    if store is None:
+        return source.cell_series(cell, month, day, variables, max_workers, window_days, period)
+
+    known = [var for var in dict.fromkeys(variables) if var in VARIABLE_DETAILS]
+    records, _ = extend_records(store, source, cell, month, day, known, window_days, period, max_workers)
+    return _samples(records, variables, period)
+
+
+class PeriodStream:
+    """
+    period_series in pieces, for /analyze/stream and analyze jobs: the same
+    records are read and extended, so every endpoint fetches the same years and
+    ends with the same statistics.
+
+    Iterating yields the (dates, {variable: [values]}) chunks still to download,
+    as they arrive. `done` counts the dates answered before any download (those
+    of the years already recorded), so_far() gives {variable: values} received
+    so far, stored years included, for provisional statistics, and result(),
+    once iterated, gives what period_series would. Without records it streams
+    source.stream_cell_series, and result() orders the chunks like cell_series.
+    """
+
+    def __init__(self, source, cell, month: int, day: int, variables, max_workers: int | None = None,
+                 window_days: int = 0, period: tuple | None = None):
+        self.period = period or nasa_data_fetcher.climate_period()
+        self.variables = tuple(variables)
+        self.chunks = []
+        self.done = 0
+        self._query = (cell, month, day, window_days)
+        self._store = get_climate_record_store() if source.prefetchable else None
+        self._known = [var for var in dict.fromkeys(variables) if var in VARIABLE_DETAILS]
+        self._stored = {}
+        if self._store is None:
+            self._stream = source.stream_cell_series(cell, month, day, self.variables, max_workers, window_days,
+                                                     self.period) if self.variables else iter(())
+            return
+
+        plan = self._plan = _plan(self._store, cell, month, day, self._known, window_days, self.period)
+        self._stored = {var: record.period(*self.period)[0] for var, record in plan.records.items()}
+        total = len(nasa_data_fetcher.climate_dates(month, day, window_days, self.period))
+        self.done = total - len(set(plan.anchors) - plan.unavailable)
+        self._stream = _fetch_missing(self._store, source, cell, month, day, self._known, window_days, plan,
+                                      max_workers) if plan.missing else iter(())
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                self.chunks.append(chunk)
+                yield chunk
+        finally:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+
+    def so_far(self) -> dict:
+        if self._store is None:
+            return ordered_series(self.chunks, self.variables)
+        # A year can be downloaded for one variable while another already has it stored
+        covered = {var: set(record.years.tolist()) for var, record in self._plan.records.items()}
+        received = {var: [] for var in self._known}
+        for dates, values in self.chunks:
+            for var in self._known:
+                series = values.get(var, [])
+                if len(series) == len(dates):
+                    received[var].extend(value for date, value in zip(dates, series)
+                                         if self._plan.anchors.get(date) not in covered[var])
+        series = {var: [] for var in self.variables}
+        for var in self._known:
+            series[var] = np.concatenate([self._stored[var], np.asarray(received[var], dtype=np.float32)])
+        return series
+
+    def result(self) -> dict:
+        if self._store is None:
+            return ordered_series(self.chunks, self.variables)
+        cell, month, day, window_days = self._query
+        records = self._store.get_many(cell.index, month, day, window_days, self._known)
+        return _samples(records, self.variables, self.period)
+
+
+def update_records(start_year: int | None = None, end_year: int | None = None, source=None,
+                   max_workers: int | None = None) -> dict:
+    """
+    Extend every stored record to cover start_year (default: its own first year)
+    through end_year (default: the latest published year), fetching only the
+    years it lacks. Returns {"records": records checked, "years": years fetched}.
+    """
+    store = get_climate_record_store()
+    totals = {"records": 0, "years": 0}
+    if store is None:
+        return totals
+    source = source or get_data_source()
+    end = nasa_data_fetcher.latest_available_date().year if end_year is None else end_year
+    for (lat_index, lon_index, month, day, window_days), variables in store.keys().items():
+        cell = cell_from_index(lat_index, lon_index)
+        records = store.get_many(cell.index, month, day, window_days, variables)
+        first = start_year
+        if first is None:
+            first = min((int(record.years[0]) for record in records.values() if len(record.years)),
+                        default=nasa_data_fetcher.CLIMATE_START_YEAR)
+        _, fetched = extend_records(store, source, cell, month, day, variables, window_days,
+                                    nasa_data_fetcher.climate_period(first, end), max_workers)
+        totals["records"] += len(variables)
+        totals["years"] += fetched
+        if fetched:
+            print(f"  + {cell.latitude}, {cell.longitude} {month:02d}-{day:02d}: {fetched} new years")
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append newly published years to the stored climate records.")
+    parser.add_argument("--start-year", type=int, default=None, help="also fill years back to this one")
+    parser.add_argument("--end-year", type=int, default=None, help="default: the latest published year")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+    totals = update_records(args.start_year, args.end_year, max_workers=args.workers)
+    print(f"Checked {totals['records']} records, fetched {totals['years']} years.")
+
+
+if __name__ == "__main__":
+    main()
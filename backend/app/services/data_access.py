@@ -0,0 +1,318 @@
+# backend/app/services/data_access.py
+
+"""
+Pluggable sources of historical daily values.
+
+The API asks a DataSource for the climate-period series of a grid cell (or of
+many cells and days at once) and does not care where they come from:
+
+    opendap    live GES DISC downloads (nasa_data_fetcher), with its caches
+    netcdf     a local NetCDF mirror of MERRA-2 fields, e.g. offline_merra2.nc4
+    simulator  deterministic synthetic values (data_simulator), generated for
+               every point, year and variable in one vectorized call; meant for
+               demos and load tests that should not touch NASA
+
+The source is chosen by config.DATA_SOURCE; see get_data_source.
+"""
+
+import os
+import threading
+from functools import lru_cache
+
+import h5py
+import numpy as np
+import xarray as xr
+
+import data_simulator
+import nasa_data_fetcher
+from app import config
+from app.services.datasets import MERRA2_LAT_STEP, MERRA2_LON_STEP
+from app.services.granule_reader import GranuleReader
+
+
+class DataSource:
+    """
+    Interface of a data source. Both methods return values in year order, like
+    nasa_data_fetcher; unknown variables map to empty lists. `period` (start_year,
+    end_year) picks the climate period of a series; None is the configured one.
+    """
+
+    name = "base"
+    description = ""
+    # Whether fetched values outlive the request (worth pre-warming in the background)
+    prefetchable = False
+
+    def cell_series(self, cell, month: int, day: int, variables, max_workers: int | None = None,
+                    window_days: int = 0, period: tuple | None = None) -> dict:
+        """{variable: [values]} for one grid cell and calendar day (±window_days)."""
+        raise NotImplementedError
+
+    def stream_cell_series(self, cell, month: int, day: int, variables, max_workers: int | None = None,
+                           window_days: int = 0, period: tuple | None = None):
+        """
+        cell_series in pieces, for streaming: yields (dates, {variable: [values]})
+        chunks, each covering the listed datetime.dates. This default yields the
+        whole series as one chunk.
+        """
+        dates = list(nasa_data_fetcher.climate_dates(month, day, window_days, period).values())
+        yield dates, self.cell_series(cell, month, day, variables, max_workers, window_days, period)
+
+    def daily_values(self, cell, month: int, day: int, variables, max_workers: int | None = None,
+                     window_days: int = 0, period: tuple | None = None):
+        """
+        The values of cell_series with their dates, for exports: yields (date,
+        {variable: value}) for every climate date in date order, leaving out the
+        variables that have no value that day. This default takes the chunks of
+        stream_cell_series, whose values can be matched to dates only where a
+        variable has one value per date of the chunk.
+        """
+        by_date = {}
+        for dates, values in self.stream_cell_series(cell, month, day, variables, max_workers, window_days,
+                                                     period):
+            for date in dates:
+                by_date.setdefault(date, {})
+            for var, series in values.items():
+                if len(series) == len(dates):
+                    for date, value in zip(dates, series):
+                        by_date[date][var] = value
+        yield from sorted(by_date.items())
+
+    def batch_series(self, cells, days, variables, max_workers: int | None = None) -> dict:
+        """{(cell index, month, day): {variable: [values]}} for every cell and (month, day)."""
+        results = {}
+        for cell in dict.fromkeys(cells):
+            for month, day in dict.fromkeys(days):
+                results[(cell.index, month, day)] = self.cell_series(cell, month, day, variables, max_workers)
+        return results
+
+    def area_series(self, mask, month: int, day: int, variables, max_workers: int | None = None,
+                    window_days: int = 0, period: tuple | None = None) -> dict:
+        """
+        {variable: [area-weighted values]} over an AOI (app.services.aoi.AOIMask).
+        This default reads every overlapping cell and assumes their series line up
+        date for date, which holds when all cells come from the same files.
+        """
+        values = {var: [] for var in variables}
+        cells = mask.cells()
+        series = [self.cell_series(cell, month, day, variables, max_workers, window_days, period)
+                  for cell, _ in cells]
+        for var in values:
+            width = max((len(s[var]) for s in series), default=0)
+            if width == 0:
+                continue
+            block = np.full((width,) + mask.weights.shape, np.nan)
+            for (cell, _), s in zip(cells, series):
+                block[:len(s[var]), cell.lat_index - mask.lat_start, cell.lon_index - mask.lon_start] = s[var]
+            combined = mask.apply(block)
+            values[var] = combined[np.isfinite(combined)].tolist()
+        return values
+
+
+class OpendapSource(DataSource):
+    """Live MERRA-2 granules from GES DISC, through the point cache and climatology cube."""
+
+    name = "opendap"
+    description = "NASA MERRA-2 M2T1NXSLV.5.12.4 via GES DISC OPe_NDAP"
+    prefetchable = True
+
+    def cell_series(self, cell, month, day, variables, max_workers=None, window_days=0, period=None):
+        return nasa_data_fetcher.get_cell_data_multi(cell, month, day, tuple(variables), max_workers, window_days,
+                                                     period)
+
+    def stream_cell_series(self, cell, month, day, variables, max_workers=None, window_days=0, period=None):
+        # One chunk per granule as it completes
+        for _, date, values in nasa_data_fetcher.iter_cell_data(cell, month, day, variables, max_workers,
+                                                                window_days, period):
+            yield [date], {var: [value] for var, value in values.items()}
+
+    def batch_series(self, cells, days, variables, max_workers=None):
+        return nasa_data_fetcher.get_batch_data(cells, days, variables, max_workers)
+
+    def area_series(self, mask, month, day, variables, max_workers=None, window_days=0, period=None):
+        return nasa_data_fetcher.get_area_data(mask, month, day, tuple(variables), max_workers, window_days, period)
+
+
+class NetCDFMirrorSource(DataSource):
+    """
+    A local NetCDF file holding hourly MERRA-2 fields (T2M, PRECTOTCORR, U10M,
+    V10M, DUSMASS) on (time, lat, lon), with real timestamps. Days, cells or
+    fields the file does not cover are simply missing from the series.
+
+    NetCDF-4 files are read chunk by chunk with a GranuleReader, so a cell's
+    series only decompresses the chunks holding it, and those are shared through
+    the process-wide chunk cache; other formats go through xarray.
+    """
+
+    name = "netcdf"
+    description = "Local MERRA-2 NetCDF mirror"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.description = f"Local MERRA-2 NetCDF mirror ({os.path.basename(path)})"
+        self._ds = None
+        self._reader = GranuleReader(path) if h5py.is_hdf5(path) else None
+        self._open_lock = threading.Lock()
+        self._point_series = lru_cache(maxsize=256)(self._load_point)
+
+    def _dataset(self) -> xr.Dataset:
+        with self._open_lock:
+            if self._ds is None:
+                with nasa_data_fetcher._HDF5_LOCK:
+                    ds = xr.open_dataset(self.path)
+                if not np.issubdtype(ds["time"].dtype, np.datetime64):
+                    ds.close()
+                    raise ValueError(f"{self.path}: time coordinate has no dates")
+                self._ds = ds
+            return self._ds
+
+    def _load_point(self, cell):
+        """(day numbers, {field: hourly values}) at a cell, or None outside the file's grid."""
+        ds = self._dataset()
+        if self._reader is not None:
+            fields = [name for name in ds.data_vars if ds[name].dims == ("time", "lat", "lon")]
+            series = self._reader.read_points(fields, [cell.latitude], [cell.longitude])
+            if all(np.isnan(values).all() for values in series.values()):
+                return None
+            return ds["time"].values.astype("datetime64[D]"), {name: values[:, 0] for name, values in series.items()}
+
+        with nasa_data_fetcher._HDF5_LOCK:
+            point = ds.sel(lat=cell.latitude, lon=cell.longitude, method="nearest")
+            if (abs(float(point["lat"]) - cell.latitude) > MERRA2_LAT_STEP / 2
+                    or abs(float(point["lon"]) - cell.longitude) > MERRA2_LON_STEP / 2):
+                return None
+            fields = [name for name in point.data_vars if point[name].dims == ("time",)]
+            series = {name: point[name].values for name in fields}
+            days = point["time"].values.astype("datetime64[D]")
+        return days, series
+
+    def cell_series(self, cell, month, day, variables, max_workers=None, window_days=0, period=None):
+        values = {var: [] for var in variables}
+        for _, day_values in self.daily_values(cell, month, day, variables, max_workers, window_days, period):
+            for var, value in day_values.items():
+                values[var].append(value)
+        return values
+
+    def daily_values(self, cell, month, day, variables, max_workers=None, window_days=0, period=None):
+        point = self._point_series(cell)
+        if point is None:
+            return
+        days, series = point
+        for date in nasa_data_fetcher.climate_dates(month, day, window_days, period).values():
+            # Time is sorted, so each day is one contiguous run of hours
+            target = np.datetime64(date, "D")
+            start, stop = np.searchsorted(days, target, "left"), np.searchsorted(days, target, "right")
+            if start == stop:
+                yield date, {}
+                continue
+            hours = {name: field[start:stop] for name, field in series.items()}
+            values = {}
+            for var in variables:
+                sources = nasa_data_fetcher.SOURCE_VARIABLES.get(var)
+                if sources and all(name in hours for name in sources):
+                    value = nasa_data_fetcher._reduce_series(hours, var)
+                    if value is not None and np.isfinite(value):
+                        values[var] = float(value)
+            yield date, values
+
+
+class SimulatorSource(DataSource):
+    """Seeded synthetic values; the same (cell, date, variable) always gets the same value."""
+
+    name = "simulator"
+    description = "Simulated data (not NASA observations)"
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def _simulate(self, indices, dates, variables) -> np.ndarray:
+        """(cells, dates, variables) array for cell index pairs and datetime.dates."""
+        cells = np.asarray(indices, dtype=np.int64).reshape(-1, 2)
+        stamps = np.array([(d.year, d.month, d.day) for d in dates], dtype=np.int64).reshape(-1, 3)
+        keys = np.concatenate([
+            np.broadcast_to(cells[:, None, :], (len(cells), len(stamps), 2)),
+            np.broadcast_to(stamps[None, :, :], (len(cells), len(stamps), 3)),
+        ], axis=2)
+        return data_simulator.simulate(keys, variables, self.seed)
+
+    def cell_series(self, cell, month, day, variables, max_workers=None, window_days=0, period=None):
+        known = [var for var in variables if var in data_simulator.SIMULATION_PARAMS]
+        dates = list(nasa_data_fetcher.climate_dates(month, day, window_days, period).values())
+        values = {var: [] for var in variables}
+        if known and dates:
+            block = self._simulate([cell.index], dates, known)[0]
+            for k, var in enumerate(known):
+                values[var] = block[:, k].tolist()
+        return values
+
+    def batch_series(self, cells, days, variables, max_workers=None):
+        cells = list(dict.fromkeys(cells))
+        days = list(dict.fromkeys(days))
+        known = [var for var in variables if var in data_simulator.SIMULATION_PARAMS]
+        results = {(cell.index, month, day): {var: [] for var in variables} for cell in cells for month, day in days}
+        if not known or not cells:
+            return results
+
+        # Every (cell, year, day, variable) in one call; days absent in a year (Feb 29) are dropped
+        dates, owner = [], []
+        for n, (month, day) in enumerate(days):
+            for date in nasa_data_fetcher.climate_dates(month, day).values():
+                dates.append(date)
+                owner.append(n)
+        owner = np.asarray(owner)
+        block = self._simulate([cell.index for cell in cells], dates, known)
+        for n, (month, day) in enumerate(days):
+            columns = block[:, owner == n, :]
+            for c, cell in enumerate(cells):
+                series = results[(cell.index, month, day)]
+                for k, var in enumerate(known):
+                    series[var] = columns[c, :, k].tolist()
+        return results
+
+    def area_series(self, mask, month, day, variables, max_workers=None, window_days=0, period=None):
+        known = [var for var in variables if var in data_simulator.SIMULATION_PARAMS]
+        dates = list(nasa_data_fetcher.climate_dates(month, day, window_days, period).values())
+        values = {var: [] for var in variables}
+        if known and dates:
+            # The whole (lat, lon) block at once; cells outside the AOI weigh nothing
+            lat_grid, lon_grid = np.meshgrid(mask.lat_indices, mask.lon_indices, indexing="ij")
+            block = self._simulate(np.stack([lat_grid, lon_grid], axis=-1), dates, known)
+            block = block.reshape(mask.weights.shape + (len(dates), len(known)))
+            combined = mask.apply(np.moveaxis(block, (0, 1), (-2, -1)))
+            for k, var in enumerate(known):
+                values[var] = np.round(combined[:, k], 2).tolist()
+        return values
+
+
+def ordered_series(chunks, variables) -> dict:
+    """
+    Join (dates, {variable: [values]}) chunks from stream_cell_series, which arrive
+    in completion order, into {variable: [values]} in date order.
+    """
+    chunks = sorted(chunks, key=lambda chunk: chunk[0][:1])
+    return {var: [value for _, values in chunks for value in values.get(var, [])] for var in variables}
+
+
+def create_data_source(kind: str, path: str | None = None, seed: int | None = None) -> DataSource:
+    if kind == "opendap":
+        return OpendapSource()
+    if kind == "netcdf":
+        return NetCDFMirrorSource(path or config.DATA_SOURCE_PATH)
+    if kind == "simulator":
+        return SimulatorSource(config.SIMULATOR_SEED if seed is None else seed)
+    raise ValueError(f"Unknown DATA_SOURCE {kind!r}; expected opendap, netcdf or simulator")
+
+
+_source = None
+_source_key = None
+_source_lock = threading.Lock()
+
+
+def get_data_source() -> DataSource:
+    """Process-wide source for config.DATA_SOURCE (rebuilt when the config changes)."""
+    global _source, _source_key
+    key = (config.DATA_SOURCE, config.DATA_SOURCE_PATH, config.SIMULATOR_SEED)
+    with _source_lock:
+        if _source is None or _source_key != key:
+            _source = create_data_source(*key)
+            _source_key = key
+        return _source
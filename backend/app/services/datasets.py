@@ -0,0 +1,50 @@
+# backend/app/services/datasets.py
+
+"""
+Dataset descriptions and coordinate canonicalization for MERRA-2.
+
+Every lat/lon that enters the backend is snapped to its MERRA-2 grid cell up
+front, so points that resolve to the same cell share cache entries and data
+lookups (37.74/-119.59 and 37.60/-119.50 are the same cell).
+"""
+
+import math
+from typing import NamedTuple
+
+# MERRA-2 native grid: 361 latitudes from -90 by 0.5°, 576 longitudes from -180 by 0.625°
+MERRA2_LAT_START, MERRA2_LAT_STEP, MERRA2_NLAT = -90.0, 0.5, 361
+MERRA2_LON_START, MERRA2_LON_STEP, MERRA2_NLON = -180.0, 0.625, 576
+
+
+class GridCell(NamedTuple):
+    """A MERRA-2 grid cell: its (lat, lon) indices and center coordinates."""
+    lat_index: int
+    lon_index: int
+    latitude: float
+    longitude: float
+
+    @property
+    def index(self) -> tuple[int, int]:
+        return self.lat_index, self.lon_index
+
+
+def cell_from_index(lat_index: int, lon_index: int) -> GridCell:
+    """GridCell for a (lat, lon) index pair; longitudes wrap around the dateline."""
+    lat_index = min(max(int(lat_index), 0), MERRA2_NLAT - 1)
+    lon_index = int(lon_index) % MERRA2_NLON
+    return GridCell(
+        lat_index,
+        lon_index,
+        MERRA2_LAT_START + MERRA2_LAT_STEP * lat_index,
+        MERRA2_LON_START + MERRA2_LON_STEP * lon_index,
+    )
+
+
+def snap_to_grid(latitude: float, longitude: float) -> GridCell:
+    """
+    The MERRA-2 grid cell nearest to a point. Like `.sel(method="nearest")`,
+    a point exactly halfway between two cells goes to the higher index.
+    """
+    lat_index = math.floor((latitude - MERRA2_LAT_START) / MERRA2_LAT_STEP + 0.5)
+    lon_index = math.floor((longitude - MERRA2_LON_START) / MERRA2_LON_STEP + 0.5)
+    return cell_from_index(lat_index, lon_index)
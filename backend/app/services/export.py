@@ -0,0 +1,268 @@
+# backend/app/services/export.py
+
+"""
+Bulk exports of the historical daily values behind a query, streamed as CSV or NetCDF.
+
+An export covers points x calendar days: one row (NetCDF record) per point and
+climate date, with the point's grid cell, the date, one column per variable and
+the granule the values come from. Rows are produced one (point, day) series at
+a time from the data source, so its caches and stores answer what they can and
+memory stays the same however many rows the export has:
+
+    for chunk in export_csv(source, [(37.74, -119.59)], [(7, 15)], ["max_temp_c"]):
+        response.write(chunk)
+
+Every export carries app.utils.provenance: a "#" comment header in CSV, global
+attributes in NetCDF, including the dataset DOI and the NASA non-endorsement notice.
+
+NetCDF files are written directly in the classic 64-bit offset format (CDF-2):
+the number of records is known up front, so the header can be sent first and
+the records after it, without a temporary file or the HDF5 library.
+"""
+
+import csv
+import datetime
+import io
+import struct
+
+import numpy as np
+
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+from app.services.stats import VARIABLE_DETAILS
+from app.utils.provenance import granule_reference, provenance
+
+# Bytes buffered before a chunk is handed to the response
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = ["point", "latitude", "longitude", "cell_latitude", "cell_longitude", "month", "day", "date"]
+
+_EPOCH = datetime.date(1970, 1, 1)
+# NetCDF classic format (https://docs.unidata.ucar.edu/netcdf-c/current/file_format_specifications.html)
+_NC_DIMENSION, _NC_VARIABLE, _NC_ATTRIBUTE = 0x0A, 0x0B, 0x0C
+_NC_CHAR, _NC_INT, _NC_FLOAT, _NC_DOUBLE = 2, 4, 5, 6
+_NC_SIZES = {_NC_CHAR: 1, _NC_INT: 4, _NC_FLOAT: 4, _NC_DOUBLE: 8}
+_NC_FORMATS = {_NC_INT: "i", _NC_FLOAT: "f", _NC_DOUBLE: "d"}
+# Default fill value of NC_FLOAT; readers mask it
+NC_FILL_FLOAT = 9.969209968386869e36
+
+
+def export_rows(source, points, days, variables, window_days: int = 0):
+    """
+    Yields (point number, cell, month, day, date, {variable: value}) for every
+    point, calendar day and climate date, in that order. Variables without a
+    value on a date are left out of its dict.
+    """
+    for n, (latitude, longitude) in enumerate(points):
+        cell = snap_to_grid(latitude, longitude)
+        for month, day in days:
+            dates = nasa_data_fetcher.climate_dates(month, day, window_days).values()
+            if not dates:
+                continue
+            values = dict(source.daily_values(cell, month, day, variables, None, window_days))
+            for date in dates:
+                yield n, cell, month, day, date, values.get(date, {})
+
+
+def export_size(days, points: int, window_days: int = 0) -> int:
+    """Rows (records) in an export of `points` points over `days`."""
+    return points * sum(len(nasa_data_fetcher.climate_dates(month, day, window_days)) for month, day in days)
+
+
+def _granules(source, days, window_days: int) -> dict:
+    """{date: granule reference} for every date of the export (bounded by its days, not its points)."""
+    path = getattr(source, "path", None)
+    references = {}
+    for month, day in days:
+        for date in nasa_data_fetcher.climate_dates(month, day, window_days).values():
+            if date not in references:
+                references[date] = granule_reference(source.name, date, path)
+    return references
+
+
+def _query(points, days, variables, window_days: int) -> dict:
+    return {
+        "points": " ".join(f"{lat},{lon}" for lat, lon in points),
+        "days": " ".join(f"{month:02d}-{day:02d}" for month, day in days),
+        "variables": ",".join(variables),
+        "window_days": window_days,
+    }
+
+
+def export_csv(source, points, days, variables, window_days: int = 0):
+    """The export as CSV text chunks (bytes): a "#" provenance header, a column header, then rows."""
+    variables = [var for var in dict.fromkeys(variables) if var in VARIABLE_DETAILS]
+    granules = _granules(source, days, window_days)
+    buffer = io.StringIO()
+    for name, value in provenance(source.description, _query(points, days, variables, window_days)).items():
+        buffer.write(f"# {name}: {value}\n")
+    buffer.write("# units: " + ", ".join(f"{var}={VARIABLE_DETAILS[var]['unit']}" for var in variables) + "\n")
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS + variables + ["granule"])
+
+    for n, cell, month, day, date, values in export_rows(source, points, days, variables, window_days):
+        latitude, longitude = points[n]
+        writer.writerow([
+            n, latitude, longitude, cell.latitude, cell.longitude, month, day, date.isoformat(),
+            *(f"{values[var]:.6g}" if var in values else "" for var in variables),
+            granules.get(date, ""),
+        ])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _nc_name(name: str) -> bytes:
+    encoded = name.encode()
+    return struct.pack(">i", len(encoded)) + _pad(encoded)
+
+
+def _nc_attributes(attributes: dict) -> bytes:
+    if not attributes:
+        return struct.pack(">ii", 0, 0)
+    parts = [struct.pack(">ii", _NC_ATTRIBUTE, len(attributes))]
+    for name, value in attributes.items():
+        if isinstance(value, str):
+            data = value.encode()
+            parts.append(_nc_name(name) + struct.pack(">ii", _NC_CHAR, len(data)) + _pad(data))
+        elif isinstance(value, int):
+            parts.append(_nc_name(name) + struct.pack(">iii", _NC_INT, 1, value))
+        else:
+            parts.append(_nc_name(name) + struct.pack(">iif", _NC_FLOAT, 1, value))
+    return b"".join(parts)
+
+
+class NetCDFStreamWriter:
+    """
+    Minimal writer of a CDF-2 file whose sizes are known up front, produced as
+    a byte stream: `header()`, then the fixed-size variables' data from
+    `fixed_data()`, then `record()` once per record, in the order the variables
+    were added. Variables are (name, nc type, dimension names, attributes).
+    """
+
+    def __init__(self, dimensions: dict, record_dimension: str, numrecs: int, attributes: dict):
+        self.dimensions = dimensions
+        self.record_dimension = record_dimension
+        self.numrecs = numrecs
+        self.attributes = attributes
+        self.fixed = []
+        self.records = []
+
+    def add_variable(self, name: str, nc_type: int, dims: tuple, attributes: dict | None = None):
+        (self.records if dims and dims[0] == self.record_dimension else self.fixed).append(
+            (name, nc_type, dims, attributes or {}))
+
+    def _size(self, nc_type: int, dims: tuple) -> int:
+        """Bytes of a fixed variable, or of one record of a record variable, before padding."""
+        count = 1
+        for dim in dims:
+            if dim != self.record_dimension:
+                count *= self.dimensions[dim]
+        return count * _NC_SIZES[nc_type]
+
+    def header(self) -> bytes:
+        names = list(self.dimensions)
+        dim_list = struct.pack(">ii", _NC_DIMENSION, len(names)) + b"".join(
+            _nc_name(name) + struct.pack(">i", 0 if name == self.record_dimension else self.dimensions[name])
+            for name in names
+        )
+        variables = self.fixed + self.records
+
+        def var_list(offsets):
+            parts = [struct.pack(">ii", _NC_VARIABLE, len(variables))]
+            for (name, nc_type, dims, attributes), begin in zip(variables, offsets):
+                parts.append(
+                    _nc_name(name) + struct.pack(">i", len(dims))
+                    + b"".join(struct.pack(">i", names.index(dim)) for dim in dims)
+                    + _nc_attributes(attributes)
+                    + struct.pack(">iiq", nc_type, -(-self._size(nc_type, dims) // 4) * 4, begin)
+                )
+            return b"".join(parts)
+
+        # Offsets do not change the header's length, so size it once with zeros
+        start = len(b"CDF\x02") + 4 + len(dim_list) + len(_nc_attributes(self.attributes)) \
+            + len(var_list([0] * len(variables)))
+        offsets = []
+        for name, nc_type, dims, _ in self.fixed:
+            offsets.append(start)
+            start += -(-self._size(nc_type, dims) // 4) * 4
+        for name, nc_type, dims, _ in self.records:
+            offsets.append(start)
+            start += -(-self._size(nc_type, dims) // 4) * 4
+        return (b"CDF\x02" + struct.pack(">i", self.numrecs) + dim_list
+                + _nc_attributes(self.attributes) + var_list(offsets))
+
+    def fixed_data(self, values: dict) -> bytes:
+        """Data of the fixed-size variables, from {name: array}."""
+        parts = []
+        for name, nc_type, dims, _ in self.fixed:
+            data = np.asarray(values[name], dtype=">" + _NC_FORMATS[nc_type]).tobytes()
+            parts.append(_pad(data))
+        return b"".join(parts)
+
+    def record(self, values: dict) -> bytes:
+        """One record, from {name: value}; char variables take a str, padded or cut to their length."""
+        parts = []
+        for name, nc_type, dims, _ in self.records:
+            if nc_type == _NC_CHAR:
+                size = self._size(nc_type, dims)
+                parts.append(_pad(values[name].encode()[:size].ljust(size, b"\0")))
+            else:
+                parts.append(struct.pack(">" + _NC_FORMATS[nc_type], values[name]))
+        return b"".join(parts)
+
+
+def export_netcdf(source, points, days, variables, window_days: int = 0):
+    """The export as a NetCDF (CDF-2) byte stream, CF-style with provenance as global attributes."""
+    variables = [var for var in dict.fromkeys(variables) if var in VARIABLE_DETAILS]
+    granules = _granules(source, days, window_days)
+    cells = [snap_to_grid(lat, lon) for lat, lon in points]
+    attributes = {"Conventions": "CF-1.8", "featureType": "timeSeries",
+                  **provenance(source.description, _query(points, days, variables, window_days))}
+    writer = NetCDFStreamWriter(
+        {"point": len(points), "record": None, "nchar": max((len(g) for g in granules.values()), default=0) or 1},
+        "record", export_size(days, len(points), window_days), attributes,
+    )
+    writer.add_variable("latitude", _NC_DOUBLE, ("point",), {"units": "degrees_north", "long_name": "requested latitude"})
+    writer.add_variable("longitude", _NC_DOUBLE, ("point",), {"units": "degrees_east", "long_name": "requested longitude"})
+    writer.add_variable("cell_latitude", _NC_DOUBLE, ("point",),
+                        {"units": "degrees_north", "long_name": "MERRA-2 grid cell center latitude"})
+    writer.add_variable("cell_longitude", _NC_DOUBLE, ("point",),
+                        {"units": "degrees_east", "long_name": "MERRA-2 grid cell center longitude"})
+    writer.add_variable("point_index", _NC_INT, ("record",), {"long_name": "index along the point dimension"})
+    writer.add_variable("query_month", _NC_INT, ("record",), {"long_name": "calendar month of the query"})
+    writer.add_variable("query_day", _NC_INT, ("record",), {"long_name": "calendar day of the query"})
+    writer.add_variable("time", _NC_DOUBLE, ("record",),
+                        {"units": "days since 1970-01-01", "calendar": "standard", "long_name": "date"})
+    for var in variables:
+        writer.add_variable(var, _NC_FLOAT, ("record",),
+                            {"units": VARIABLE_DETAILS[var]["unit"], "long_name": var.replace("_", " "),
+                             "_FillValue": NC_FILL_FLOAT, "coordinates": "time"})
+    writer.add_variable("granule", _NC_CHAR, ("record", "nchar"), {"long_name": "source granule"})
+
+    yield writer.header() + writer.fixed_data({
+        "latitude": [lat for lat, _ in points],
+        "longitude": [lon for _, lon in points],
+        "cell_latitude": [cell.latitude for cell in cells],
+        "cell_longitude": [cell.longitude for cell in cells],
+    })
+    buffer = []
+    size = 0
+    for n, _, month, day, date, values in export_rows(source, points, days, variables, window_days):
+        record = writer.record({
+            "point_index": n, "query_month": month, "query_day": day,
+            "time": float((date - _EPOCH).days), "granule": granules.get(date, ""),
+            **{var: values.get(var, NC_FILL_FLOAT) for var in variables},
+        })
+        buffer.append(record)
+        size += len(record)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    yield b"".join(buffer)
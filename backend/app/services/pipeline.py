@@ -0,0 +1,441 @@
+# backend/app/services/pipeline.py
+
+"""
+Heavy work outside the request path: the day-of-year climatology cube, and
+background analysis jobs.
+
+The builder streams through the archive (or a local mirror of granules), reduces
+every granule over a window of the MERRA-2 grid to daily values, and writes them
+into a ClimatologyCube (see app/storage/store.py). /analyze can then answer a
+query with one slice read instead of downloading 30 granules.
+
+Day slots are built in parallel worker processes, each owning its own chunk file,
+and progress is tracked per (day slot, year) so an interrupted build resumes
+where it stopped. Example:
+
+    python -m app.services.pipeline --cube-dir data-cache/cube \\
+        --bbox 32 -125 42 -114 --mirror /data/merra2 --processes 8
+
+Jobs (POST /jobs/analyze, /jobs/batch) run on a pool of JOB_PROCESSES spawned
+worker processes, so decoding granules for several jobs uses several cores and
+never blocks the API. Identical queries (same grid cells, dates and variables)
+share one job, and workers write progress, partial and final results to the
+JobStore, where they outlive both the worker and the API process.
+"""
+
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import requests
+import xarray as xr
+
+import nasa_data_fetcher
+from app import config
+from app.models.schemas import AnalysisRequest, AnalysisResponse, BatchAnalysisRequest, GridCellInfo, VariableResult
+from app.services.climate_record import PeriodStream
+from app.services.data_access import get_data_source
+from app.services.datasets import MERRA2_LAT_STEP, MERRA2_LON_STEP, cell_from_index, snap_to_grid
+from app.services.granule_reader import GranuleReader
+from app.services.stats import VARIABLE_DETAILS, summarize_many
+from app.storage import store
+from app.storage.store import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_RUNNING,
+    STATUS_DONE,
+    STATUS_MISSING,
+    STATUS_PENDING,
+    ClimatologyCube,
+    JobStore,
+    day_slot,
+)
+from app.utils.metrics import REGISTRY
+
+
+def all_calendar_days():
+    """Every (month, day) of a leap year, i.e. one per cube day slot."""
+    dates = [datetime.date(2000, 1, 1) + datetime.timedelta(days=n) for n in range(366)]
+    return [(date.month, date.day) for date in dates]
+
+
+def mirror_granule_path(mirror_dir: str, year: int, month: int, day: int):
+    """Path of a granule in a local mirror laid out like the archive (YYYY/MM/<file>), or None."""
+    name = nasa_data_fetcher.granule_url(year, month, day).rsplit("/", 1)[-1]
+    path = os.path.join(mirror_dir, f"{year}", f"{month:02d}", name)
+    if os.path.exists(path):
+        return path
+    # Reprocessed granules carry a different stream number (e.g. MERRA2_401)
+    matches = sorted(glob.glob(os.path.join(
+        mirror_dir, f"{year}", f"{month:02d}", f"MERRA2_*.tavg1_2d_slv_Nx.{year}{month:02d}{day:02d}.nc4"
+    )))
+    return matches[-1] if matches else None
+
+
+def _window(cube: ClimatologyCube):
+    """(latitudes, longitudes, source fields) of the cube window."""
+    lats = [cell_from_index(cube.lat_index0 + i, 0).latitude for i in range(cube.nlat)]
+    lons = [cell_from_index(0, cube.lon_index0 + j).longitude for j in range(cube.nlon)]
+    fields = sorted({name for var in cube.variables for name in nasa_data_fetcher.SOURCE_VARIABLES[var]})
+    return lats, lons, fields
+
+
+def _reduce_window(ds: xr.Dataset, cube: ClimatologyCube) -> np.ndarray:
+    """Reduce one granule to a (lat, lon, variable) block of daily values over the cube window."""
+    lats, lons, fields = _window(cube)
+    present = [name for name in fields if name in ds]
+    region = ds[present].sel(lat=lats, lon=lons, method="nearest").load()
+    series = {name: region[name].transpose("time", "lat", "lon").values for name in present}
+    return _reduce_block(series, cube)
+
+
+def _reduce_mirror_window(path: str, cube: ClimatologyCube) -> np.ndarray:
+    """_reduce_window for a granule on disk, decompressing only the chunks under the window."""
+    lats, lons, fields = _window(cube)
+    with GranuleReader(path) as reader:
+        return _reduce_block(reader.read_block(fields, lats, lons), cube)
+
+
+def _reduce_block(series: dict, cube: ClimatologyCube) -> np.ndarray:
+    """{field: (time, lat, lon) hourly values} to the (lat, lon, variable) block of daily values."""
+    block = np.full((cube.nlat, cube.nlon, len(cube.variables)), np.nan, dtype=np.float32)
+    for v, var in enumerate(cube.variables):
+        if all(name in series for name in nasa_data_fetcher.SOURCE_VARIABLES[var]):
+            block[:, :, v] = nasa_data_fetcher._reduce_series(series, var, axis=0)
+    return block
+
+
+def _build_day(cube_dir: str, month: int, day: int, mirror_dir) -> dict:
+    """Fill every pending year of one day slot. Runs in a worker process."""
+    cube = ClimatologyCube(cube_dir, writable=True)
+    slot = day_slot(month, day)
+    counts = {"done": 0, "missing": 0, "failed": 0}
+    pending = [y for n, y in enumerate(cube.years) if cube.status[slot, n] == STATUS_PENDING]
+    if not pending:
+        return counts
+
+    chunk = cube.chunk(slot, writable=True)
+    session = None
+    for year in pending:
+        row = year - cube.years[0]
+        try:
+            datetime.date(year, month, day)
+        except ValueError:
+            # Feb 29 outside leap years
+            cube.status[slot, row] = STATUS_MISSING
+            counts["missing"] += 1
+            continue
+
+        try:
+            if mirror_dir:
+                path = mirror_granule_path(mirror_dir, year, month, day)
+                if path is None:
+                    raise FileNotFoundError(f"{year}-{month:02d}-{day:02d} not in mirror")
+                block = _reduce_mirror_window(path, cube)
+            else:
+                if session is None:
+                    session = nasa_data_fetcher.get_session()
+                url = nasa_data_fetcher.resolve_granule_url(year, month, day)
+                response = session.get(url, timeout=(10, 300))
+                response.raise_for_status()
+                with nasa_data_fetcher.open_granule(response.content) as ds:
+                    block = _reduce_window(ds, cube)
+        except FileNotFoundError:
+            # Not in the mirror, or the granule catalog knows the archive has no such granule
+            cube.status[slot, row] = STATUS_MISSING
+            counts["missing"] += 1
+            continue
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                cube.status[slot, row] = STATUS_MISSING
+                counts["missing"] += 1
+            else:
+                print(f"  - HTTP Error for {year}-{month:02d}-{day:02d}: {e}")
+                counts["failed"] += 1
+            continue
+        except Exception as e:
+            print(f"  - Unexpected error for {year}-{month:02d}-{day:02d}: {e}")
+            counts["failed"] += 1
+            continue
+
+        chunk[row] = block
+        chunk.flush()
+        # Only mark the year done once its values are on disk
+        cube.status[slot, row] = STATUS_DONE
+        cube.status.flush()
+        counts["done"] += 1
+
+    cube.status.flush()
+    return counts
+
+
+def build_climatology_cube(cube_dir: str, start_year: int, end_year: int, bbox, variables=None,
+                           days=None, mirror_dir=None, processes=None) -> dict:
+    """
+    Build (or resume) a climatology cube.
+
+    bbox:        (south, west, north, east) in degrees, snapped outward to MERRA-2 cells
+    days:        (month, day) pairs to build; defaults to all 366 day slots
+    mirror_dir:  local mirror of granules; None downloads from GES DISC
+    processes:   worker processes (default: CPU count); 1 builds in-process
+
+    Returns counts of (slot, year) entries filled, missing from the archive, and
+    failed (left pending for the next run).
+    """
+    south, west, north, east = bbox
+    low, high = snap_to_grid(south, west), snap_to_grid(north, east)
+    cube = ClimatologyCube.create(
+        cube_dir,
+        start_year,
+        end_year,
+        variables or list(nasa_data_fetcher.VARIABLE_MAP),
+        lat_index0=low.lat_index,
+        nlat=high.lat_index - low.lat_index + 1,
+        lon_index0=low.lon_index,
+        nlon=high.lon_index - low.lon_index + 1,
+    )
+    days = list(days or all_calendar_days())
+    print(f"Building climatology cube in {cube.directory}: {len(days)} days x {len(cube.years)} years "
+          f"over {cube.nlat} x {cube.nlon} cells ({cube.nlat * MERRA2_LAT_STEP:g}° x {cube.nlon * MERRA2_LON_STEP:g}°)")
+
+    totals = {"done": 0, "missing": 0, "failed": 0}
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        results = [_build_day(cube.directory, month, day, mirror_dir) for month, day in days]
+    else:
+        # spawn: worker processes must not inherit HDF5 state from the parent
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            results = list(executor.map(
+                _build_day,
+                [cube.directory] * len(days),
+                [month for month, _ in days],
+                [day for _, day in days],
+                [mirror_dir] * len(days),
+            ))
+    for counts in results:
+        for key, value in counts.items():
+            totals[key] += value
+
+    print(f"...Cube build complete: {totals}")
+    return totals
+
+
+# --- Background jobs ---
+
+JOB_KINDS = ("analyze", "batch")
+
+
+def job_key(kind: str, request: dict) -> str:
+    """
+    Canonical key of a job's query: points are reduced to their grid cells and
+    variables to the sorted known ones, so equivalent submissions share a job
+    (its result echoes the query of the first submission).
+    """
+    if kind == "analyze":
+        query = AnalysisRequest(**request)
+        canonical = {
+            "cell": snap_to_grid(query.latitude, query.longitude).index,
+            "days": [(query.month, query.day)],
+            "window_days": query.window_days,
+        }
+    elif kind == "batch":
+        query = BatchAnalysisRequest(**request)
+        canonical = {
+            "cells": [snap_to_grid(point.latitude, point.longitude).index for point in query.points],
+            "days": [(date.month, date.day) for date in query.dates],
+        }
+    else:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    canonical["kind"] = kind
+    canonical["period"] = list(nasa_data_fetcher.climate_period(
+        *((query.start_year, query.end_year) if kind == "analyze" else ())))
+    canonical["variables"] = sorted({var for var in query.variables if var in VARIABLE_DETAILS})
+    canonical["data_source"] = config.DATA_SOURCE
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def _run_analyze_job(jobs: JobStore, job_id: str, request: dict) -> dict:
+    query = AnalysisRequest(**request)
+    requested = tuple(var for var in query.variables if var in VARIABLE_DETAILS)
+    cell = snap_to_grid(query.latitude, query.longitude)
+    source = get_data_source()
+    period = nasa_data_fetcher.climate_period(query.start_year, query.end_year)
+    total = len(nasa_data_fetcher.climate_dates(query.month, query.day, query.window_days, period))
+    jobs.update(job_id, total=total)
+
+    # Through the climate records, like /analyze: only the years they lack are downloaded
+    stream = PeriodStream(source, cell, query.month, query.day, requested, None, query.window_days, period)
+    done, reported = stream.done, time.monotonic()
+    for dates, values in stream:
+        done += len(dates)
+        if time.monotonic() - reported >= config.JOB_PROGRESS_INTERVAL:
+            so_far = stream.so_far()
+            provisional = summarize_many((var, so_far[var]) for var in requested)
+            results = [VariableResult(**summary).model_dump() for summary in provisional if summary is not None]
+            jobs.update(job_id, done=min(done, total), partial={"results": results})
+            reported = time.monotonic()
+
+    series = stream.result()
+    summaries = summarize_many((var, series[var]) for var in requested)
+    metadata = {**AnalysisResponse.model_fields["metadata"].default, "data_source": source.description,
+                "climate_period": f"{period[0]}-{period[1]}"}
+    response = AnalysisResponse(query=query, grid_cell=GridCellInfo(**cell._asdict()),
+                                results=[VariableResult(**summary) for summary in summaries if summary is not None],
+                                metadata=metadata)
+    return response.model_dump()
+
+
+def _run_batch_job(jobs: JobStore, job_id: str, request: dict) -> dict:
+    # The router owns the batch response layout; imported here to avoid an import cycle
+    from app.routers.query import batch_query, batch_response
+
+    query = BatchAnalysisRequest(**request)
+    requested, cells, days = batch_query(query)
+    source = get_data_source()
+    jobs.update(job_id, total=len(days))
+
+    # One calendar day at a time (each still fetches every granule once for all
+    # points), so finished days can be reported as partial results
+    response = None
+    for n, date in enumerate(query.dates):
+        series = source.batch_series(cells, [days[n]], requested) if requested else {}
+        part = batch_response(query.model_copy(update={"dates": [date]}), series, source.description)
+        part = part.model_dump()
+        if response is None:
+            response = part
+        else:
+            for name, values in part["results"].items():
+                response["results"][name].extend(values)
+        jobs.update(job_id, done=n + 1, partial=response)
+
+    # Same row order as /analyze/batch: by point, then date, then variable
+    columns = response["results"]
+    order = sorted(range(len(columns["point"])), key=lambda row: columns["point"][row])
+    response["results"] = {name: [values[row] for row in order] for name, values in columns.items()}
+    return response
+
+
+def run_job(store_path: str, job_id: str) -> str:
+    """
+    Execute one stored job and record its outcome. Runs in a job worker process
+    (or thread); returns the final status.
+    """
+    jobs = JobStore(store_path)
+    job = jobs.get(job_id)
+    if job is None:
+        return JOB_FAILED
+    jobs.update(job_id, status=JOB_RUNNING)
+    try:
+        runner = _run_analyze_job if job["kind"] == "analyze" else _run_batch_job
+        result = runner(jobs, job_id, job["request"])
+    except Exception as e:
+        print(f"  - Job {job_id} failed: {e}")
+        jobs.update(job_id, status=JOB_FAILED, error=str(e))
+        return JOB_FAILED
+    latest = jobs.get(job_id)
+    jobs.update(job_id, status=JOB_DONE, done=latest["total"], partial=None, result=result)
+    return JOB_DONE
+
+
+class JobQueue:
+    """Submits de-duplicated jobs to a local worker pool; see the module docstring."""
+
+    def __init__(self, jobs: JobStore, processes: int | None = None):
+        self.jobs = jobs
+        self.processes = config.JOB_PROCESSES if processes is None else processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.processes > 0:
+                    # spawn: workers must not inherit HDF5 state or the API's threads
+                    context = multiprocessing.get_context("spawn")
+                    self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="job")
+            return self._executor
+
+    def submit(self, kind: str, request: dict) -> dict:
+        """The job answering a query: an existing live or finished one, else a new queued job."""
+        job, created = self.jobs.create(job_key(kind, request), kind, request, config.JOB_STALE_SECONDS)
+        if created:
+            future = self._pool().submit(run_job, self.jobs.path, job["id"])
+            future.add_done_callback(lambda done, job_id=job["id"]: self._check(done, job_id))
+        return job
+
+    def _check(self, future, job_id: str):
+        # A worker that crashed (or a pool shut down) never records the failure itself
+        if future.cancelled() or future.exception() is not None:
+            error = "cancelled" if future.cancelled() else str(future.exception())
+            print(f"  - Job {job_id} did not run: {error}")
+            self.jobs.update(job_id, status=JOB_FAILED, error=error)
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide JobQueue storing jobs at store.JOB_STORE_PATH."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None or _job_queue.jobs.path != store.JOB_STORE_PATH:
+            if _job_queue is not None:
+                _job_queue.shutdown()
+            _job_queue = JobQueue(JobStore(store.JOB_STORE_PATH))
+        return _job_queue
+
+
+def shutdown_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is not None:
+            _job_queue.shutdown()
+            _job_queue = None
+
+
+@REGISTRY.collector
+def _job_metrics():
+    if _job_queue is None:
+        return
+    counts = _job_queue.jobs.counts()
+    yield ("terraclime_jobs", "gauge", "Background jobs on record, by status.",
+           [({"status": status}, count) for status, count in sorted(counts.items())])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the MERRA-2 day-of-year climatology cube.")
+    parser.add_argument("--cube-dir", required=True)
+    parser.add_argument("--start-year", type=int, default=nasa_data_fetcher.CLIMATE_START_YEAR)
+    parser.add_argument("--end-year", type=int, default=nasa_data_fetcher.CLIMATE_END_YEAR)
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("SOUTH", "WEST", "NORTH", "EAST"), required=True)
+    parser.add_argument("--variables", nargs="+", default=None)
+    parser.add_argument("--mirror", default=None, help="local mirror of granules laid out as YYYY/MM/<file>")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args(argv)
+    build_climatology_cube(args.cube_dir, args.start_year, args.end_year, args.bbox,
+                           variables=args.variables, mirror_dir=args.mirror, processes=args.processes)
+
+
+if __name__ == "__main__":
+    main()
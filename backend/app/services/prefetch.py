@@ -0,0 +1,169 @@
+# backend/app/services/prefetch.py
+
+"""
+Background pre-warming of the point cache.
+
+The first query for a location pays the full cold fetch. The Prefetcher runs
+inside the API process and fetches, ahead of time, the coming calendar days for
+a hot list of grid cells: the example locations plus the most queried cells in
+the query log. It is deliberately low priority: one item at a time by default,
+few download threads per item, and it pauses whenever live queries are running
+or have run within the last PREFETCH_IDLE_SECONDS. It downloads with the
+configured Earthdata credentials, so it only starts when PREFETCH_ENABLED=1.
+"""
+
+import asyncio
+import datetime
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import nasa_data_fetcher
+from app import config
+from app.services.datasets import cell_from_index, snap_to_grid
+from app.storage.store import get_point_cache
+
+
+class TrafficMonitor:
+    """Counts live requests so background work can stay out of their way."""
+
+    def __init__(self):
+        self.active = 0
+        self.last_seen = 0.0
+
+    @contextmanager
+    def track(self):
+        self.active += 1
+        self.last_seen = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.last_seen = time.monotonic()
+
+    def idle_for(self) -> float:
+        """Seconds since the last live request finished; 0 while one is running."""
+        if self.active:
+            return 0.0
+        return time.monotonic() - self.last_seen
+
+
+# Process-wide monitor shared by every live endpoint
+live_traffic = TrafficMonitor()
+
+
+class Prefetcher:
+    """
+    Pre-warms (cell, month, day) queries for the hot list over upcoming dates.
+
+    fetch:  async callable (cell, month, day, variables) doing the actual fetch;
+            the API passes its single-flight fetch, so a live query for an item
+            being prefetched joins it instead of downloading twice
+    today:  callable returning the current date (for tests)
+    """
+
+    def __init__(self, fetch, traffic: TrafficMonitor = live_traffic, locations=None,
+                 days_ahead: int | None = None, popular_cells: int | None = None,
+                 concurrency: int | None = None, idle_seconds: float | None = None,
+                 interval: float | None = None, variables=None, today=datetime.date.today):
+        self.fetch = fetch
+        self.traffic = traffic
+        self.locations = config.EXAMPLE_LOCATIONS if locations is None else locations
+        self.days_ahead = config.PREFETCH_DAYS_AHEAD if days_ahead is None else days_ahead
+        self.popular_cells = config.PREFETCH_POPULAR_CELLS if popular_cells is None else popular_cells
+        self.concurrency = max(1, config.PREFETCH_CONCURRENCY if concurrency is None else concurrency)
+        self.idle_seconds = config.PREFETCH_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.interval = config.PREFETCH_INTERVAL if interval is None else interval
+        self.variables = tuple(sorted(variables or nasa_data_fetcher.VARIABLE_MAP))
+        self.today = today
+        self._queue = deque()
+        self._current = []
+        self._task = None
+        self._counts = {"planned": 0, "done": 0, "failed": 0, "pauses": 0, "rounds": 0}
+        self.state = "stopped"
+
+    def hot_cells(self) -> list:
+        """Grid cells of the example locations, then the most queried cells; no duplicates."""
+        cells = [snap_to_grid(lat, lon) for _, lat, lon in self.locations]
+        cache = get_point_cache()
+        if cache is not None and self.popular_cells:
+            cells += [cell_from_index(*index) for index in cache.popular_cells(self.popular_cells)]
+        return list(dict.fromkeys(cells))
+
+    def plan(self) -> int:
+        """Refill the queue: nearest dates first, every hot cell for each date."""
+        start = self.today()
+        days = [start + datetime.timedelta(days=n) for n in range(self.days_ahead)]
+        cells = self.hot_cells()
+        self._queue = deque((cell, date.month, date.day) for date in days for cell in cells)
+        self._counts.update(planned=len(self._queue), done=0, failed=0)
+        return len(self._queue)
+
+    async def _wait_for_idle(self):
+        paused = False
+        while self.traffic.idle_for() < self.idle_seconds:
+            if not paused:
+                self._counts["pauses"] += 1
+                self.state = "paused"
+                paused = True
+            await asyncio.sleep(min(0.5, max(self.idle_seconds, 0.05)))
+        self.state = "running"
+
+    async def _worker(self):
+        while self._queue:
+            await self._wait_for_idle()
+            if not self._queue:
+                break
+            item = self._queue.popleft()
+            self._current.append(item)
+            try:
+                await self.fetch(*item, self.variables)
+                self._counts["done"] += 1
+            except Exception as e:
+                cell, month, day = item
+                print(f"  - Prefetch failed for {cell.latitude}/{cell.longitude} {month:02d}-{day:02d}: {e}")
+                self._counts["failed"] += 1
+            finally:
+                self._current.remove(item)
+
+    async def run_once(self):
+        """Plan and work through one round of the hot list."""
+        self.plan()
+        self.state = "running"
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        self._counts["rounds"] += 1
+
+    async def run(self):
+        while True:
+            await self.run_once()
+            self.state = "sleeping"
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.state = "stopped"
+
+    def status(self) -> dict:
+        counts = dict(self._counts)
+        finished = counts["done"] + counts["failed"]
+        return {
+            "state": self.state,
+            "queue_depth": len(self._queue),
+            "in_progress": [
+                {"latitude": cell.latitude, "longitude": cell.longitude, "month": month, "day": day}
+                for cell, month, day in self._current
+            ],
+            "progress": finished / counts["planned"] if counts["planned"] else 0.0,
+            **counts,
+        }
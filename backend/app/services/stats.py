@@ -0,0 +1,218 @@
+# backend/app/services/stats.py
+
+"""
+Vectorized likelihood statistics.
+
+Every query (one variable at one point and date) is a row of a 2-D
+(queries x samples) array, NaN-padded to the longest series. Moments,
+exceedance probabilities, quantiles and bootstrap confidence intervals are
+computed for all rows at once, so a batch or multi-variable request costs one
+NumPy pass instead of a Python loop per item.
+"""
+
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+from scipy.stats import norm
+
+# Units and the "uncomfortable" threshold each variable is tested against
+VARIABLE_DETAILS = {
+    "max_temp_c": {"unit": "°C", "threshold": 32},
+    "min_temp_c": {"unit": "°C", "threshold": 0},
+    "precipitation_mm": {"unit": "mm", "threshold": 1},
+    "wind_speed_kph": {"unit": "kph", "threshold": 40},
+    "dust_ug_m3": {"unit": "µg/m³", "threshold": 150},
+}
+# Variables whose likelihood is the empirical share of event days rather than a normal fit
+EVENT_VARIABLES = {"precipitation_mm"}
+
+QUANTILES = (0.1, 0.5, 0.9)
+BOOTSTRAP_RESAMPLES = 200
+CONFIDENCE_LEVEL = 0.95
+# Fixed seed: identical queries get identical intervals
+BOOTSTRAP_SEED = 0
+# Resampled values held in memory at once; larger batches are bootstrapped in row blocks
+BOOTSTRAP_BLOCK_SIZE = 4_000_000
+# Stand-in scale for the normal fit of a constant series
+MIN_SCALE = 0.01
+
+
+class Sample(NamedTuple):
+    """A series whose mean and (population) std are already known, e.g. from stored running sums."""
+    values: np.ndarray
+    mean: float
+    std: float
+
+
+def pad_series(series) -> np.ndarray:
+    """Stack 1-D series of different lengths into a (queries, samples) float64 array padded with NaN."""
+    series = [np.asarray(values, dtype=np.float64).ravel() for values in series]
+    width = max((len(values) for values in series), default=0)
+    samples = np.full((len(series), width), np.nan)
+    for row, values in enumerate(series):
+        samples[row, :len(values)] = values
+    return samples
+
+
+def _normal_exceedance(threshold, mean, std):
+    return norm.sf(threshold, loc=mean, scale=np.where(std > 0, std, MIN_SCALE))
+
+
+def _bootstrap(samples, counts, thresholds, empirical, resamples, confidence, rng):
+    """Percentile-bootstrap interval of each row's reported probability."""
+    queries, width = samples.shape
+    low = np.full(queries, np.nan)
+    high = np.full(queries, np.nan)
+    if queries == 0 or width == 0:
+        return low, high
+
+    tail = (1 - confidence) / 2 * 100
+    block = max(1, BOOTSTRAP_BLOCK_SIZE // (resamples * width))
+    for start in range(0, queries, block):
+        rows = slice(start, start + block)
+        s, c, t, e = samples[rows], counts[rows], thresholds[rows], empirical[rows]
+        n = np.maximum(c, 1)
+        # Draw positions among each row's valid (left-packed) samples
+        picks = (rng.random((len(s), resamples, width)) * c[:, None, None]).astype(np.intp)
+        valid = np.arange(width)[None, None, :] < c[:, None, None]
+        draws = np.where(valid, s[np.arange(len(s))[:, None, None], picks], 0.0)
+
+        mean = draws.sum(axis=2) / n[:, None]
+        var = (np.where(valid, draws - mean[:, :, None], 0.0) ** 2).sum(axis=2) / n[:, None]
+        p_normal = _normal_exceedance(t[:, None], mean, np.sqrt(var))
+        p_empirical = ((draws > t[:, None, None]) & valid).sum(axis=2) / n[:, None]
+        p = np.where(e[:, None], p_empirical, p_normal)
+
+        lo, hi = np.percentile(p, [tail, 100 - tail], axis=1)
+        low[rows] = np.where(c > 0, lo, np.nan)
+        high[rows] = np.where(c > 0, hi, np.nan)
+    return low, high
+
+
+def describe(samples, thresholds, empirical=None, quantiles=QUANTILES,
+             resamples: int = BOOTSTRAP_RESAMPLES, confidence: float = CONFIDENCE_LEVEL,
+             seed: int = BOOTSTRAP_SEED, moments=None) -> dict:
+    """
+    Statistics of every row of a (queries, samples) array; NaN marks missing samples.
+
+    thresholds:  one threshold per row
+    empirical:   per-row flag choosing the empirical (True) or normal-fit (False)
+                 exceedance as the reported `probability` (default all False)
+    resamples:   bootstrap resamples for the confidence interval (0 skips it)
+    moments:     optional (means, stds) per row known beforehand; NaN entries
+                 are computed from the samples
+
+    Returns a dict of arrays, one entry per row: count, mean, std (population),
+    normal_exceedance, empirical_exceedance, probability, ci_low, ci_high, and
+    quantiles with shape (queries, len(quantiles)). Rows without samples are NaN.
+    """
+    samples = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+    queries = samples.shape[0]
+    thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), (queries,))
+    empirical = np.zeros(queries, dtype=bool) if empirical is None else np.broadcast_to(np.asarray(empirical, dtype=bool), (queries,))
+
+    # Left-pack valid samples so row i's data is samples[i, :count[i]]
+    finite = np.isfinite(samples)
+    order = np.argsort(~finite, axis=1, kind="stable")
+    samples = np.take_along_axis(np.where(finite, samples, np.nan), order, axis=1)
+    finite = np.take_along_axis(finite, order, axis=1)
+
+    counts = finite.sum(axis=1)
+    n = np.maximum(counts, 1)
+    zeroed = np.where(finite, samples, 0.0)
+    mean = zeroed.sum(axis=1) / n
+    std = np.sqrt((np.where(finite, samples - mean[:, None], 0.0) ** 2).sum(axis=1) / n)
+    if moments is not None:
+        known_mean, known_std = (np.broadcast_to(np.asarray(m, dtype=np.float64), (queries,)) for m in moments)
+        mean = np.where(np.isnan(known_mean), mean, known_mean)
+        std = np.where(np.isnan(known_std), std, known_std)
+    normal = _normal_exceedance(thresholds, mean, std)
+    exceed = (np.where(finite, samples, -np.inf) > thresholds[:, None]).sum(axis=1) / n
+
+    with warnings.catch_warnings():
+        # All-NaN rows have no quantiles
+        warnings.simplefilter("ignore", RuntimeWarning)
+        qs = np.nanquantile(samples, quantiles, axis=1).T if samples.shape[1] else np.full((queries, len(quantiles)), np.nan)
+
+    if resamples:
+        ci_low, ci_high = _bootstrap(samples, counts, thresholds, empirical, resamples, confidence,
+                                     np.random.default_rng(seed))
+    else:
+        ci_low = ci_high = np.full(queries, np.nan)
+
+    empty = counts == 0
+    result = {
+        "count": counts,
+        "mean": mean,
+        "std": std,
+        "normal_exceedance": normal,
+        "empirical_exceedance": exceed,
+        "probability": np.where(empirical, exceed, normal),
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "quantiles": qs,
+    }
+    for key in ("mean", "std", "normal_exceedance", "empirical_exceedance", "probability"):
+        result[key] = np.where(empty, np.nan, result[key])
+    return result
+
+
+def summarize_many(items) -> list:
+    """
+    Summaries of many (variable, historical values) pairs with one `describe` call.
+    Values may be a Sample, whose mean and std are then used as they are.
+
+    Returns one entry per item, in order: None when the variable is unknown or has
+    no data, else a dict shaped like the /analyze VariableResult.
+    """
+    items = [(var, values) for var, values in items]
+    rows = [n for n, (var, values) in enumerate(items) if var in VARIABLE_DETAILS
+            and len(values.values if isinstance(values, Sample) else values)]
+    summaries = [None] * len(items)
+    if not rows:
+        return summaries
+
+    variables = [items[n][0] for n in rows]
+    series = [items[n][1] for n in rows]
+    moments = None
+    if any(isinstance(values, Sample) for values in series):
+        moments = (
+            [values.mean if isinstance(values, Sample) else np.nan for values in series],
+            [values.std if isinstance(values, Sample) else np.nan for values in series],
+        )
+    stats = describe(
+        pad_series([values.values if isinstance(values, Sample) else values for values in series]),
+        [VARIABLE_DETAILS[var]["threshold"] for var in variables],
+        empirical=[var in EVENT_VARIABLES for var in variables],
+        moments=moments,
+    )
+
+    for k, (n, var) in enumerate(zip(rows, variables)):
+        interval = [float(stats["ci_low"][k]), float(stats["ci_high"][k])]
+        if var in EVENT_VARIABLES:
+            likelihood = {"probability_of_event": float(stats["probability"][k])}
+        else:
+            likelihood = {
+                "probability_exceeding": float(stats["probability"][k]),
+                "empirical_probability_exceeding": float(stats["empirical_exceedance"][k]),
+            }
+        likelihood["confidence_interval"] = interval
+        summaries[n] = {
+            "variable": var,
+            "unit": VARIABLE_DETAILS[var]["unit"],
+            "mean": round(float(stats["mean"][k]), 2),
+            "std_dev": round(float(stats["std"][k]), 2),
+            "likelihood": likelihood,
+            "percentiles": {
+                f"p{round(q * 100)}": round(float(value), 2)
+                for q, value in zip(QUANTILES, stats["quantiles"][k])
+            },
+            "raw_data_points": int(stats["count"][k]),
+        }
+    return summaries
+
+
+def summarize(variable: str, historical_data) -> dict | None:
+    """Summary of a single variable's series; see summarize_many."""
+    return summarize_many([(variable, historical_data)])[0]
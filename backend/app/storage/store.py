@@ -0,0 +1,1091 @@
+# backend/app/storage/store.py
+
+"""
+Persistent storage for extracted MERRA-2 values.
+
+PointCache: persistent cache of extracted point values.
+
+Each row is the daily value of one derived variable (e.g. "max_temp_c") at one
+MERRA-2 grid cell on one date. The cache lives in a SQLite database in WAL mode,
+so several uvicorn workers (processes) can read and write it concurrently and
+every write is an atomic transaction. Size is bounded by evicting the least
+recently used rows, and hit/miss/eviction counters are kept in the database so
+they add up across processes and restarts.
+
+The same database keeps a short log of recent queries (grid cell and calendar
+day), which the background prefetcher uses to find popular locations.
+
+SeriesStore: the same daily values as memory-mapped float32 arrays, one
+contiguous (cells, years, day-of-year) block per file, for compact storage and
+zero-copy reads. When enabled it replaces the point cache as the value store.
+
+JobStore: status, progress and results of background analysis jobs, in their
+own SQLite database so that worker processes can report into it.
+
+ClimateRecordStore: every fetched year of a (grid cell, calendar day, window,
+variable) series as a ClimateRecord of running sums and sorted samples, from
+which statistics of any sub-period are read without the daily values.
+
+ClimatologyCube: read side of the precomputed day-of-year cube written by
+`app.services.pipeline.build_climatology_cube`.
+"""
+
+import datetime
+import glob
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.utils.metrics import REGISTRY
+
+CACHE_DIR = os.getenv("CACHE_DIR", "data-cache")
+# Empty string disables the persistent cache
+POINT_CACHE_PATH = os.getenv("POINT_CACHE_PATH", os.path.join(CACHE_DIR, "points.sqlite"))
+# ~60 bytes per row on disk, so the default bound is roughly 120 MB
+POINT_CACHE_MAX_ENTRIES = int(os.getenv("POINT_CACHE_MAX_ENTRIES", "2000000"))
+# When the bound is exceeded, evict down to this fraction of it
+EVICT_TO_FRACTION = 0.9
+# Queries older than this are dropped from the query log
+QUERY_LOG_RETENTION = 30 * 24 * 3600
+# Columnar series store; empty disables it (values then go to the point cache)
+SERIES_STORE_DIR = os.getenv("SERIES_STORE_DIR", os.path.join(CACHE_DIR, "series"))
+# Each series file holds SERIES_BLOCK_YEARS years of SERIES_GROUP_CELLS cells
+SERIES_BLOCK_YEARS = 10
+SERIES_GROUP_CELLS = 256
+# Series files kept memory-mapped at once
+SERIES_OPEN_FILES = 512
+# Bound on the disk space of the series store; least recently used blocks are evicted
+SERIES_STORE_MAX_BYTES = int(float(os.getenv("SERIES_STORE_MAX_MB", "2048")) * 2**20)
+# Seconds between writing a process's hit/miss counts and block access times to the index
+SERIES_SYNC_INTERVAL = 1.0
+# Background job records; finished jobs are dropped after JOB_RETENTION seconds
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(CACHE_DIR, "jobs.sqlite"))
+JOB_RETENTION = 7 * 24 * 3600
+# Climate records (app/services/climate_record.py); "" disables them
+CLIMATE_RECORD_PATH = os.getenv("CLIMATE_RECORD_PATH", os.path.join(CACHE_DIR, "records.sqlite"))
+# Directory of a climatology cube; empty disables answering from the cube
+CLIMATOLOGY_CUBE_DIR = os.getenv("CLIMATOLOGY_CUBE_DIR", "")
+
+# Day-of-year slots follow a leap year so that Feb 29 has its own slot and a
+# calendar date maps to the same slot in every year
+CUBE_DAY_SLOTS = 366
+STATUS_PENDING, STATUS_DONE, STATUS_MISSING = 0, 1, 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS point_values (
+    lat_index INTEGER NOT NULL,
+    lon_index INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    date TEXT NOT NULL,
+    value REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (lat_index, lon_index, variable, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS point_values_accessed ON point_values (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_log (
+    lat_index INTEGER NOT NULL,
+    lon_index INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    queried REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS query_log_queried ON query_log (queried);
+"""
+
+
+class PointCache:
+    """
+    Size-bounded, multi-process-safe cache of (grid cell, variable, date) -> value.
+
+    `cell` arguments are (lat_index, lon_index) pairs on the MERRA-2 grid and
+    dates are ISO strings ("YYYY-MM-DD").
+    """
+
+    def __init__(self, path: str, max_entries: int = POINT_CACHE_MAX_ENTRIES):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+        with self._transaction() as conn:
+            # The row count is kept in `counters` by put_many; caches from before it was are counted once
+            if conn.execute("SELECT 1 FROM counters WHERE name = 'entries'").fetchone() is None:
+                conn.execute("INSERT INTO counters (name, value) SELECT 'entries', COUNT(*) FROM point_values")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def get_many(self, cell, variables, dates) -> dict:
+        """Return {(variable, date): value} for the cached subset of variables x dates."""
+        variables, dates = list(variables), list(dates)
+        if not variables or not dates:
+            return {}
+        lat_index, lon_index = cell
+        var_marks = ",".join("?" * len(variables))
+        date_marks = ",".join("?" * len(dates))
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT variable, date, value FROM point_values "
+                f"WHERE lat_index = ? AND lon_index = ? "
+                f"AND variable IN ({var_marks}) AND date IN ({date_marks})",
+                [lat_index, lon_index, *variables, *dates],
+            ).fetchall()
+            found = {(variable, date): value for variable, date, value in rows}
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE point_values SET accessed = ? "
+                    "WHERE lat_index = ? AND lon_index = ? AND variable = ? AND date = ?",
+                    [(now, lat_index, lon_index, variable, date) for variable, date in found],
+                )
+            self._bump(conn, hits=len(found), misses=len(variables) * len(dates) - len(found))
+        return found
+
+    def put_many(self, cell, values: dict):
+        """Store {(variable, date): value} for one cell and evict if over the size bound."""
+        if not values:
+            return
+        lat_index, lon_index = cell
+        now = time.time()
+        rows = [(float(value), now, lat_index, lon_index, variable, date) for (variable, date), value in values.items()]
+        with self._transaction() as conn:
+            # New rows are counted from the inserts, so the size bound needs no COUNT(*) scan
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO point_values "
+                "(value, accessed, lat_index, lon_index, variable, date) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            added = conn.total_changes - before
+            if added < len(rows):
+                conn.executemany(
+                    "UPDATE point_values SET value = ?, accessed = ? "
+                    "WHERE lat_index = ? AND lon_index = ? AND variable = ? AND date = ?",
+                    rows,
+                )
+            self._bump(conn, entries=added)
+            entries = conn.execute("SELECT value FROM counters WHERE name = 'entries'").fetchone()[0]
+            if entries > self.max_entries:
+                evicted = conn.execute(
+                    "DELETE FROM point_values WHERE (lat_index, lon_index, variable, date) IN ("
+                    "SELECT lat_index, lon_index, variable, date FROM point_values "
+                    "ORDER BY accessed LIMIT ?)",
+                    (entries - int(self.max_entries * EVICT_TO_FRACTION),),
+                ).rowcount
+                self._bump(conn, evictions=evicted, entries=-evicted)
+
+    def log_query(self, cell, month: int, day: int):
+        """Record a live query for a (lat_index, lon_index) cell; old entries are pruned."""
+        lat_index, lon_index = cell
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO query_log (lat_index, lon_index, month, day, queried) VALUES (?, ?, ?, ?, ?)",
+                (lat_index, lon_index, month, day, now),
+            )
+            conn.execute("DELETE FROM query_log WHERE queried < ?", (now - QUERY_LOG_RETENTION,))
+
+    def popular_cells(self, limit: int, since: float | None = None) -> list:
+        """Most queried (lat_index, lon_index) cells since a timestamp, most popular first."""
+        since = time.time() - QUERY_LOG_RETENTION if since is None else since
+        rows = self._connection().execute(
+            "SELECT lat_index, lon_index, COUNT(*) AS n FROM query_log WHERE queried >= ? "
+            "GROUP BY lat_index, lon_index ORDER BY n DESC, MAX(queried) DESC LIMIT ?",
+            (since, limit),
+        ).fetchall()
+        return [(lat_index, lon_index) for lat_index, lon_index, _ in rows]
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction totals across all processes, plus the current entry count."""
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": counters.get("entries", 0),
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    @staticmethod
+    def _bump(conn, **deltas):
+        conn.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [(name, delta) for name, delta in deltas.items() if delta],
+        )
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK; taking the write lock up front avoids upgrade deadlocks."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+_point_cache = None
+_point_cache_lock = threading.Lock()
+
+
+def get_point_cache():
+    """Process-wide PointCache at POINT_CACHE_PATH, or None when the cache is disabled."""
+    global _point_cache
+    if not POINT_CACHE_PATH:
+        return None
+    with _point_cache_lock:
+        if _point_cache is None or _point_cache.path != POINT_CACHE_PATH:
+            _point_cache = PointCache(POINT_CACHE_PATH)
+        return _point_cache
+
+
+@REGISTRY.collector
+def _point_cache_metrics():
+    cache = get_point_cache()
+    if cache is None:
+        return
+    stats = cache.stats()
+    yield ("terraclime_point_cache_hits_total", "counter",
+           "Point values served from the persistent cache (all processes).", [({}, stats["hits"])])
+    yield ("terraclime_point_cache_misses_total", "counter",
+           "Point values not found in the persistent cache (all processes).", [({}, stats["misses"])])
+    yield ("terraclime_point_cache_hit_ratio", "gauge",
+           "Share of point-value lookups served from the persistent cache.", [({}, stats["hit_ratio"])])
+    yield ("terraclime_point_cache_entries", "gauge",
+           "Values held in the persistent point cache.", [({}, stats["entries"])])
+    yield ("terraclime_point_cache_evictions_total", "counter",
+           "Values evicted from the persistent point cache.", [({}, stats["evictions"])])
+
+
+_SERIES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cells (
+    row INTEGER PRIMARY KEY,
+    lat_index INTEGER NOT NULL,
+    lon_index INTEGER NOT NULL,
+    UNIQUE (lat_index, lon_index)
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    name TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS blocks_accessed ON blocks (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_SERIES_SHAPE = (SERIES_GROUP_CELLS, SERIES_BLOCK_YEARS, CUBE_DAY_SLOTS)
+
+
+class SeriesStore:
+    """
+    Daily values of (grid cell, variable) as memory-mapped float32 arrays.
+
+    On disk:
+        index.sqlite                    (lat_index, lon_index) -> row, assigned on first write;
+                                        block sizes and access times; hit/miss/eviction counters
+        <variable>/<year>_<group>.f32   float32 (SERIES_GROUP_CELLS, SERIES_BLOCK_YEARS, 366)
+                                        for the cells of one row group and a block of years
+        <variable>/<year>_<group>.mask  uint8, same shape: 1 where a value is stored
+
+    Days sit in leap-year day slots (see day_slot), so a calendar day across the
+    years of a block is one strided slice: `series` returns it as a zero-copy view
+    of the mapped file when every value in it is stored. A value takes 4 bytes
+    (and a mask byte), against ~32 for a float in a Python list. Files are created
+    sparse at their full size and never resized, so only the pages holding values
+    take disk space, and several processes can map and write them at once.
+
+    Disk use is bounded by max_bytes: blocks are evicted least recently used
+    first, down to EVICT_TO_FRACTION of the bound. Counters and access times are
+    kept in the index, so they add up across processes; `series` writes its share
+    at most every SERIES_SYNC_INTERVAL seconds, get_many/put_many/stats on every call.
+
+    get_many/put_many take and return the same {(variable, ISO date): value}
+    dicts as PointCache; values are stored with float32 precision.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = SERIES_STORE_MAX_BYTES):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SERIES_SCHEMA)
+        self._rows = {}
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {"hits": 0, "misses": 0}
+        self._touched = {}
+        self._synced = time.monotonic()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, cell, create: bool = False):
+        """Row of a (lat_index, lon_index) cell, or None if it has none and `create` is false."""
+        cell = tuple(int(index) for index in cell)
+        row = self._rows.get(cell)
+        if row is None:
+            conn = self._connection()
+            if create:
+                conn.execute("INSERT OR IGNORE INTO cells (lat_index, lon_index) VALUES (?, ?)", cell)
+            found = conn.execute("SELECT row FROM cells WHERE lat_index = ? AND lon_index = ?", cell).fetchone()
+            if found is None:
+                return None
+            row = self._rows[cell] = found[0] - 1
+        return row
+
+    @staticmethod
+    def _name(variable: str, first_year: int, group: int) -> str:
+        return f"{variable}/{first_year}_{group:05d}"
+
+    def _map(self, path: str, dtype, create: bool):
+        """Map a block file, creating it sparse (all zeros) at full size if asked."""
+        size = int(np.prod(_SERIES_SHAPE)) * np.dtype(dtype).itemsize
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        try:
+            fd = os.open(path, flags, 0o644)
+        except FileNotFoundError:
+            return None
+        try:
+            # Never shrinks or clears a file another process created first
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        return inode, np.memmap(path, dtype=dtype, mode="r+", shape=_SERIES_SHAPE)
+
+    def _block(self, variable: str, first_year: int, group: int, create: bool = False):
+        """(values, mask) maps of a variable, year block and row group; None if absent and not created."""
+        name = self._name(variable, first_year, group)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            mapped = self._maps.get(name)
+        if mapped is not None:
+            try:
+                current = os.stat(f"{path}.f32").st_ino
+            except FileNotFoundError:
+                current = None
+            if current == mapped[0]:
+                with self._lock:
+                    self._maps.move_to_end(name)
+                self._touch(name)
+                return mapped[1:]
+            # Evicted (and maybe recreated) by another process since it was mapped
+            with self._lock:
+                self._maps.pop(name, None)
+
+        if create:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        values = self._map(f"{path}.f32", np.float32, create)
+        if values is None:
+            return None
+        mask = self._map(f"{path}.mask", np.uint8, True)
+        mapped = (values[0], values[1], mask[1])
+        with self._lock:
+            mapped = self._maps.setdefault(name, mapped)
+            while len(self._maps) > SERIES_OPEN_FILES:
+                self._maps.popitem(last=False)
+        if create:
+            self._connection().execute(
+                "INSERT OR IGNORE INTO blocks (name, bytes, accessed) VALUES (?, 0, ?)", (name, time.time()))
+        self._touch(name)
+        return mapped[1:]
+
+    @staticmethod
+    def _locate(dates):
+        """Year block, year offset and day slot of each datetime.date."""
+        years = np.array([date.year for date in dates], dtype=np.int64)
+        first_years = years - years % SERIES_BLOCK_YEARS
+        slots = np.array([day_slot(date.month, date.day) for date in dates], dtype=np.int64)
+        return first_years, years - first_years, slots
+
+    def series(self, cell, variable: str, dates) -> np.ndarray:
+        """
+        float32 values of a variable at a cell on datetime.dates, NaN where not
+        stored. One calendar day over consecutive years of one block, all stored,
+        is returned as a read-only view of the mapped file; otherwise gathered.
+        """
+        dates = list(dates)
+        values = np.full(len(dates), np.nan, dtype=np.float32)
+        row = self._row(cell)
+        if row is None or not dates:
+            self._count(values)
+            return values
+        group, offset = divmod(row, SERIES_GROUP_CELLS)
+        first_years, year_offsets, slots = self._locate(dates)
+
+        if (first_years == first_years[0]).all() and (slots == slots[0]).all() \
+                and (np.diff(year_offsets) == 1).all():
+            block = self._block(variable, int(first_years[0]), group)
+            if block is not None:
+                data, mask = block
+                years = slice(year_offsets[0], year_offsets[-1] + 1)
+                view = data[offset, years, slots[0]].view(np.ndarray)
+                present = mask[offset, years, slots[0]].astype(bool)
+                if present.all():
+                    view.flags.writeable = False
+                    self._count(view)
+                    return view
+                values = np.where(present, view, np.float32(np.nan))
+                self._count(values)
+                return values
+
+        for first_year in np.unique(first_years):
+            block = self._block(variable, int(first_year), group)
+            if block is not None:
+                data, mask = block
+                picked = first_years == first_year
+                stored = data[offset, year_offsets[picked], slots[picked]]
+                present = mask[offset, year_offsets[picked], slots[picked]].astype(bool)
+                values[picked] = np.where(present, stored, np.nan)
+        self._count(values)
+        return values
+
+    def _count(self, values: np.ndarray):
+        found = int(np.isfinite(values).sum())
+        with self._lock:
+            self._pending["hits"] += found
+            self._pending["misses"] += len(values) - found
+        self._sync()
+
+    def _touch(self, name: str):
+        with self._lock:
+            self._touched[name] = time.time()
+
+    def _sync(self, force: bool = False):
+        """Write this process's pending counts and access times to the index."""
+        with self._lock:
+            if not force and time.monotonic() - self._synced < SERIES_SYNC_INTERVAL:
+                return
+            pending, touched = self._pending, self._touched
+            self._pending, self._touched = {"hits": 0, "misses": 0}, {}
+            self._synced = time.monotonic()
+        with _Transaction(self._connection()) as conn:
+            PointCache._bump(conn, **pending)
+            conn.executemany("UPDATE blocks SET accessed = MAX(accessed, ?) WHERE name = ?",
+                             [(accessed, name) for name, accessed in touched.items()])
+
+    def get_many(self, cell, variables, dates) -> dict:
+        """Return {(variable, date): value} for the stored subset of variables x ISO dates."""
+        dates = list(dates)
+        parsed = [datetime.date.fromisoformat(date) for date in dates]
+        found = {}
+        for var in variables:
+            values = self.series(cell, var, parsed)
+            for date, value in zip(dates, values):
+                if np.isfinite(value):
+                    found[(var, date)] = float(value)
+        self._sync(force=True)
+        return found
+
+    def put_many(self, cell, values: dict):
+        """Store {(variable, ISO date): value} for one cell and evict if over the size bound."""
+        if not values:
+            return
+        row = self._row(cell, create=True)
+        group, offset = divmod(row, SERIES_GROUP_CELLS)
+        by_var = {}
+        for (var, date), value in values.items():
+            by_var.setdefault(var, []).append((datetime.date.fromisoformat(date), value))
+        written = set()
+        for var, items in by_var.items():
+            first_years, year_offsets, slots = self._locate([date for date, _ in items])
+            column = np.array([value for _, value in items], dtype=np.float32)
+            for first_year in np.unique(first_years):
+                data, mask = self._block(var, int(first_year), group, create=True)
+                picked = first_years == first_year
+                data[offset, year_offsets[picked], slots[picked]] = column[picked]
+                data.flush()
+                # The mask goes last: a value is never marked stored before it is written
+                mask[offset, year_offsets[picked], slots[picked]] = 1
+                mask.flush()
+                written.add(self._name(var, int(first_year), group))
+
+        self._sync(force=True)
+        with _Transaction(self._connection()) as conn:
+            conn.executemany("UPDATE blocks SET bytes = ?, accessed = ? WHERE name = ?",
+                             [(self._allocated(name), time.time(), name) for name in written])
+            self._evict(conn)
+
+    def _allocated(self, name: str) -> int:
+        """Disk space actually taken by a block's (sparse) files."""
+        total = 0
+        for suffix in (".f32", ".mask"):
+            try:
+                total += os.stat(os.path.join(self.directory, name + suffix)).st_blocks * 512
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _evict(self, conn):
+        """Delete least recently used blocks until the store is within EVICT_TO_FRACTION of max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM blocks").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for name, size in conn.execute("SELECT name, bytes FROM blocks ORDER BY accessed").fetchall():
+            if total <= self.max_bytes * EVICT_TO_FRACTION:
+                break
+            conn.execute("DELETE FROM blocks WHERE name = ?", (name,))
+            for suffix in (".f32", ".mask"):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self._maps.pop(name, None)
+            total -= size
+            evicted += 1
+        PointCache._bump(conn, evictions=evicted)
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction totals across all processes, plus cells, blocks and disk use."""
+        self._sync(force=True)
+        conn = self._connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        blocks, used = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM blocks").fetchone()
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "cells": conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0],
+            "files": blocks,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_series_store = None
+_series_store_lock = threading.Lock()
+
+
+def get_series_store():
+    """Process-wide SeriesStore at SERIES_STORE_DIR, or None when it is disabled."""
+    global _series_store
+    if not SERIES_STORE_DIR:
+        return None
+    with _series_store_lock:
+        if _series_store is None or _series_store.directory != SERIES_STORE_DIR:
+            _series_store = SeriesStore(SERIES_STORE_DIR)
+        return _series_store
+
+
+def get_value_store():
+    """Where extracted daily values are kept: the series store, else the point cache; None if neither."""
+    store = get_series_store()
+    return store if store is not None else get_point_cache()
+
+
+@REGISTRY.collector
+def _series_store_metrics():
+    store = get_series_store()
+    if store is None:
+        return
+    stats = store.stats()
+    yield ("terraclime_series_store_hits_total", "counter",
+           "Daily values read from the series store (all processes).", [({}, stats["hits"])])
+    yield ("terraclime_series_store_misses_total", "counter",
+           "Daily values looked up but not in the series store (all processes).", [({}, stats["misses"])])
+    yield ("terraclime_series_store_evictions_total", "counter",
+           "Series blocks evicted to keep the store within its size bound.", [({}, stats["evictions"])])
+    yield ("terraclime_series_store_cells", "gauge", "Grid cells with values in the series store.",
+           [({}, stats["cells"])])
+    yield ("terraclime_series_store_bytes", "gauge", "Disk space taken by the series store's value files.",
+           [({}, stats["bytes"])])
+
+
+_JOB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created);
+"""
+
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = "queued", "running", "done", "failed"
+_JOB_JSON_FIELDS = ("request", "partial", "result")
+
+
+class JobStore:
+    """
+    Background job records, shared by the API process and its job workers.
+
+    A job is identified by a random id and carries the canonical key of its
+    query; `create` returns the live or finished job for a key instead of
+    adding a second one, which is how identical submissions are de-duplicated.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_JOB_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(cursor, row) -> dict:
+        job = {column[0]: value for column, value in zip(cursor.description, row)}
+        for name in _JOB_JSON_FIELDS:
+            if job.get(name) is not None:
+                job[name] = json.loads(job[name])
+        return job
+
+    def create(self, key: str, kind: str, request: dict, stale_after: float) -> tuple:
+        """
+        (job, created): the newest queued, running or done job for `key`, or a new
+        queued job. Failed jobs and unfinished ones not updated for `stale_after`
+        seconds (their worker died) do not count.
+        """
+        now = time.time()
+        with _Transaction(self._connection()) as conn:
+            cursor = conn.execute(
+                "SELECT * FROM jobs WHERE key = ? AND (status = ? OR (status IN (?, ?) AND updated >= ?)) "
+                "ORDER BY created DESC LIMIT 1",
+                (key, JOB_DONE, JOB_QUEUED, JOB_RUNNING, now - stale_after),
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                return self._row(cursor, row), False
+            job_id = secrets.token_hex(8)
+            conn.execute(
+                "INSERT INTO jobs (id, key, kind, request, status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, kind, json.dumps(request), JOB_QUEUED, now, now),
+            )
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?",
+                         (JOB_DONE, JOB_FAILED, now - JOB_RETENTION))
+        return self.get(job_id), True
+
+    def get(self, job_id: str):
+        cursor = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        return self._row(cursor, row) if row is not None else None
+
+    def update(self, job_id: str, **fields):
+        """Set columns of a job (partial/result are stored as JSON) and touch its update time."""
+        for name in _JOB_JSON_FIELDS:
+            if name in fields and fields[name] is not None:
+                fields[name] = json.dumps(fields[name])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with _Transaction(self._connection()) as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+
+    def counts(self) -> dict:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED)} | dict(rows)
+
+
+class ClimateRecord:
+    """
+    The values of one variable at one grid cell and calendar day (± a window),
+    for every year fetched so far:
+
+        years         int16 (years,) years covered, ascending; a year counts once
+                      fetched, also if it has no values (Feb 29 in other years)
+        sums          float64 (years, 3) running count, sum and sum of squares of
+                      value - offset, up to and including each covered year
+        samples       float32 values in ascending order, sample_years their years
+
+    A period's count, mean and std are differences of two rows of the running
+    sums, and its values (already sorted, for quantiles) a mask over the samples,
+    so adding years never requires the earlier values again. `offset` (the first
+    stored value) keeps the sums of squares free of cancellation.
+    """
+
+    def __init__(self, years=(), sums=None, offset: float = 0.0, samples=(), sample_years=()):
+        self.years = np.asarray(years, dtype=np.int16)
+        self.sums = np.zeros((0, 3)) if sums is None else np.asarray(sums, dtype=np.float64).reshape(-1, 3)
+        self.offset = float(offset)
+        self.samples = np.asarray(samples, dtype=np.float32)
+        self.sample_years = np.asarray(sample_years, dtype=np.int16)
+
+    def missing(self, years) -> list:
+        """The years of `years` not covered yet."""
+        covered = set(self.years.tolist())
+        return [year for year in years if year not in covered]
+
+    def add(self, values_by_year: dict):
+        """Merge {year: [values]} into the record; years already covered are ignored."""
+        covered = set(self.years.tolist())
+        added = {year: np.asarray(values, dtype=np.float32)
+                 for year, values in values_by_year.items() if year not in covered}
+        if not added:
+            return
+        if not self.sums.size or self.sums[-1, 0] == 0:
+            first = next((values[0] for values in added.values() if len(values)), None)
+            self.offset = float(first) if first is not None else self.offset
+
+        # Back to per-year totals, merged in year order and summed up again
+        totals = np.diff(self.sums, axis=0, prepend=np.zeros((1, 3)))
+        for year, values in added.items():
+            shifted = values.astype(np.float64) - self.offset
+            totals = np.vstack([totals, [len(values), shifted.sum(), (shifted ** 2).sum()]])
+        years = np.concatenate([self.years, np.array(list(added), dtype=np.int16)])
+        order = np.argsort(years, kind="stable")
+        self.years = years[order]
+        self.sums = np.cumsum(totals[order], axis=0)
+
+        # New values are sorted on their own and inserted into the sorted samples
+        values = np.concatenate(list(added.values()))
+        value_years = np.concatenate([np.full(len(v), year, dtype=np.int16) for year, v in added.items()])
+        order = np.argsort(values, kind="stable")
+        positions = np.searchsorted(self.samples, values[order], side="right")
+        self.samples = np.insert(self.samples, positions, values[order])
+        self.sample_years = np.insert(self.sample_years, positions, value_years[order])
+
+    def period(self, start_year: int, end_year: int) -> tuple:
+        """(sorted float32 values, mean, population std) over the covered years in [start_year, end_year]."""
+        lo, hi = np.searchsorted(self.years, [start_year, end_year + 1])
+        running = np.vstack([np.zeros((1, 3)), self.sums])
+        count, total, squares = running[hi] - running[lo]
+        values = self.samples[(self.sample_years >= start_year) & (self.sample_years <= end_year)]
+        if count == 0:
+            return values, float("nan"), float("nan")
+        mean = total / count
+        return values, float(self.offset + mean), float(np.sqrt(max(squares / count - mean ** 2, 0.0)))
+
+
+_RECORD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS climate_records (
+    lat_index INTEGER NOT NULL,
+    lon_index INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    window_days INTEGER NOT NULL,
+    variable TEXT NOT NULL,
+    offset REAL NOT NULL,
+    years BLOB NOT NULL,
+    sums BLOB NOT NULL,
+    samples BLOB NOT NULL,
+    sample_years BLOB NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (lat_index, lon_index, month, day, window_days, variable)
+) WITHOUT ROWID;
+"""
+
+
+class ClimateRecordStore:
+    """
+    ClimateRecords by (grid cell, month, day, window_days, variable), one SQLite
+    row each. `add_years` reads, merges and writes in one transaction, so workers
+    appending to the same record concurrently do not lose each other's years.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_RECORD_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _load(conn, cell, month: int, day: int, window_days: int, variables) -> dict:
+        variables = list(variables)
+        records = {var: ClimateRecord() for var in variables}
+        if not variables:
+            return records
+        rows = conn.execute(
+            f"SELECT variable, offset, years, sums, samples, sample_years FROM climate_records "
+            f"WHERE lat_index = ? AND lon_index = ? AND month = ? AND day = ? AND window_days = ? "
+            f"AND variable IN ({','.join('?' * len(variables))})",
+            [*cell, month, day, window_days, *variables],
+        ).fetchall()
+        for variable, offset, years, sums, samples, sample_years in rows:
+            records[variable] = ClimateRecord(
+                np.frombuffer(years, dtype=np.int16), np.frombuffer(sums, dtype=np.float64), offset,
+                np.frombuffer(samples, dtype=np.float32), np.frombuffer(sample_years, dtype=np.int16),
+            )
+        return records
+
+    def get_many(self, cell, month: int, day: int, window_days: int, variables) -> dict:
+        """{variable: ClimateRecord} for a (lat_index, lon_index) cell; empty records where none is stored."""
+        return self._load(self._connection(), tuple(cell), month, day, window_days, variables)
+
+    def add_years(self, cell, month: int, day: int, window_days: int, values: dict) -> dict:
+        """Merge {variable: {year: [values]}} into the stored records and return them."""
+        cell = tuple(cell)
+        now = time.time()
+        with _Transaction(self._connection()) as conn:
+            records = self._load(conn, cell, month, day, window_days, values)
+            for var, by_year in values.items():
+                record = records[var]
+                record.add(by_year)
+                conn.execute(
+                    "INSERT OR REPLACE INTO climate_records (lat_index, lon_index, month, day, window_days, "
+                    "variable, offset, years, sums, samples, sample_years, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*cell, month, day, window_days, var, record.offset, record.years.tobytes(),
+                     record.sums.tobytes(), record.samples.tobytes(), record.sample_years.tobytes(), now),
+                )
+        return records
+
+    def keys(self) -> dict:
+        """{(lat_index, lon_index, month, day, window_days): [variables]} of every stored record."""
+        keys = {}
+        rows = self._connection().execute(
+            "SELECT lat_index, lon_index, month, day, window_days, variable FROM climate_records "
+            "ORDER BY lat_index, lon_index, month, day, window_days"
+        ).fetchall()
+        for *key, variable in rows:
+            keys.setdefault(tuple(key), []).append(variable)
+        return keys
+
+    def stats(self) -> dict:
+        records, samples = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(samples)), 0) / 4 FROM climate_records").fetchone()
+        return {"records": records, "samples": samples}
+
+
+_record_store = None
+_record_store_lock = threading.Lock()
+
+
+def get_climate_record_store():
+    """Process-wide ClimateRecordStore at CLIMATE_RECORD_PATH, or None when it is disabled."""
+    global _record_store
+    if not CLIMATE_RECORD_PATH:
+        return None
+    with _record_store_lock:
+        if _record_store is None or _record_store.path != CLIMATE_RECORD_PATH:
+            _record_store = ClimateRecordStore(CLIMATE_RECORD_PATH)
+        return _record_store
+
+
+@REGISTRY.collector
+def _climate_record_metrics():
+    store = get_climate_record_store()
+    if store is None:
+        return
+    stats = store.stats()
+    yield ("terraclime_climate_records", "gauge", "Stored climate records (cell, day, window, variable).",
+           [({}, stats["records"])])
+    yield ("terraclime_climate_record_samples", "gauge", "Daily values held in the climate records.",
+           [({}, stats["samples"])])
+
+
+def day_slot(month: int, day: int) -> int:
+    """Cube slot (0-365) of a calendar date."""
+    return datetime.date(2000, month, day).timetuple().tm_yday - 1
+
+
+def _atomic_write_json(path: str, payload: dict):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ClimatologyCube:
+    """
+    Memory-mapped cube of daily values indexed by (day-of-year, year, lat, lon, variable)
+    over a window of the MERRA-2 grid.
+
+    On disk:
+        manifest.json   grid window, years and variables
+        status.npy      uint8 (366, years): pending / done / missing granule per slot and year
+        doy_NNN.npy     float32 (years, lat, lon, variables), one chunk per day slot
+
+    The status table is what makes builds resumable: a (slot, year) is only marked
+    done after its values have been flushed to the chunk.
+    """
+
+    def __init__(self, directory: str, writable: bool = False):
+        self.directory = str(directory)
+        self.writable = writable
+        with open(os.path.join(self.directory, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.years = list(range(self.manifest["start_year"], self.manifest["end_year"] + 1))
+        self.variables = list(self.manifest["variables"])
+        self.lat_index0, self.nlat = self.manifest["lat_index0"], self.manifest["nlat"]
+        self.lon_index0, self.nlon = self.manifest["lon_index0"], self.manifest["nlon"]
+        self._status = None
+
+    @classmethod
+    def create(cls, directory: str, start_year: int, end_year: int, variables,
+               lat_index0: int, nlat: int, lon_index0: int, nlon: int) -> "ClimatologyCube":
+        """Create an empty cube, or reopen an existing one with the same layout to resume it."""
+        manifest = {
+            "start_year": start_year,
+            "end_year": end_year,
+            "variables": list(variables),
+            "lat_index0": lat_index0,
+            "nlat": nlat,
+            "lon_index0": lon_index0,
+            "nlon": nlon,
+        }
+        directory = str(directory)
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                existing = json.load(f)
+            if existing != manifest:
+                raise ValueError(f"Cube at {directory} has a different layout: {existing}")
+        else:
+            status = np.zeros((CUBE_DAY_SLOTS, end_year - start_year + 1), dtype=np.uint8)
+            tmp_path = os.path.join(directory, f"status.tmp-{os.getpid()}.npy")
+            np.save(tmp_path, status)
+            os.replace(tmp_path, os.path.join(directory, "status.npy"))
+            _atomic_write_json(manifest_path, manifest)
+        return cls(directory, writable=True)
+
+    @property
+    def status(self) -> np.ndarray:
+        if self._status is None:
+            self._status = np.load(os.path.join(self.directory, "status.npy"), mmap_mode="r+" if self.writable else "r")
+        return self._status
+
+    def chunk_path(self, slot: int) -> str:
+        return os.path.join(self.directory, f"doy_{slot + 1:03d}.npy")
+
+    def chunk(self, slot: int, writable: bool = False):
+        """Memory-map the chunk of one day slot; writable chunks are created (NaN-filled) on demand."""
+        path = self.chunk_path(slot)
+        if writable and not os.path.exists(path):
+            tmp_path = os.path.join(self.directory, f"doy_{slot + 1:03d}.tmp-{os.getpid()}.npy")
+            shape = (len(self.years), self.nlat, self.nlon, len(self.variables))
+            data = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=shape)
+            data[:] = np.nan
+            data.flush()
+            del data
+            os.replace(tmp_path, path)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r+" if writable else "r")
+
+    def cell_offset(self, lat_index: int, lon_index: int):
+        """Position of a grid cell inside the cube window, or None if outside it."""
+        i, j = lat_index - self.lat_index0, lon_index - self.lon_index0
+        if 0 <= i < self.nlat and 0 <= j < self.nlon:
+            return i, j
+        return None
+
+    def _read(self, cell, month: int, day: int, variables, years):
+        """(status, (years, variables) block) of a cell and day, or None when not fully covered."""
+        offset = self.cell_offset(*cell)
+        if offset is None or not years or years[0] < self.years[0] or years[-1] > self.years[-1]:
+            return None
+        if any(var not in self.variables for var in variables):
+            return None
+        slot = day_slot(month, day)
+        rows = [year - self.years[0] for year in years]
+        status = np.asarray(self.status[slot, rows])
+        if (status == STATUS_PENDING).any():
+            return None
+        chunk = self.chunk(slot)
+        if chunk is None:
+            return None
+        i, j = offset
+        block = np.asarray(chunk[:, i, j, :])[rows]
+        return status, block[:, [self.variables.index(var) for var in variables]]
+
+    def sample(self, cell, month: int, day: int, variables, years):
+        """
+        Values of `variables` at a (lat_index, lon_index) cell for `years`, read with one
+        slice of the day's chunk. Returns {variable: [values in year order]} with missing
+        granules left out, or None when the cube cannot fully answer the query.
+        """
+        read = self._read(cell, month, day, variables, list(years))
+        if read is None:
+            return None
+        status, block = read
+        result = {}
+        for k, var in enumerate(variables):
+            column = block[:, k]
+            keep = (status == STATUS_DONE) & np.isfinite(column)
+            result[var] = [float(value) for value in column[keep]]
+        return result
+
+    def sample_years(self, cell, month: int, day: int, variables, years):
+        """sample, by year: {year: {variable: value}} without missing values, or None."""
+        years = list(years)
+        read = self._read(cell, month, day, variables, years)
+        if read is None:
+            return None
+        status, block = read
+        return {
+            year: {var: float(block[n, k]) for k, var in enumerate(variables) if np.isfinite(block[n, k])}
+            for n, year in enumerate(years) if status[n] == STATUS_DONE
+        }
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_climatology_cube():
+    """Process-wide ClimatologyCube at CLIMATOLOGY_CUBE_DIR, or None when not configured."""
+    global _cube
+    if not CLIMATOLOGY_CUBE_DIR or not os.path.exists(os.path.join(CLIMATOLOGY_CUBE_DIR, "manifest.json")):
+        return None
+    with _cube_lock:
+        if _cube is None or _cube.directory != CLIMATOLOGY_CUBE_DIR:
+            _cube = ClimatologyCube(CLIMATOLOGY_CUBE_DIR)
+        return _cube
@@ -0,0 +1,179 @@
+# backend/app/utils/metrics.py
+
+"""
+Minimal Prometheus instrumentation: counters, histograms and scrape-time collectors
+rendered in the Prometheus text exposition format (served on /metrics).
+
+Pipeline stages are timed with `time_stage`, so a slow query can be attributed
+to auth, URL resolution, the GES DISC download, netCDF decode, selection and
+reduction, or the statistics:
+
+    with time_stage("download"):
+        content = session.get(url).content
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; stages range from sub-millisecond lookups to multi-minute downloads
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labelnames, values, extra=()) -> str:
+    pairs = [*zip(labelnames, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for n, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][n] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[2] if series else 0
+
+    def total(self, **labels) -> float:
+        """Sum of all observed values for a label set."""
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[1] if series else 0.0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    labels = _label_text(self.labelnames, key, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics plus collectors. A collector is a callable run at scrape time that
+    yields (name, type, documentation, [(labels dict, value), ...]) for values
+    owned elsewhere, such as the point cache's hit/miss counters.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                print(f"  - Metrics collector {getattr(collect, '__name__', collect)} failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    text = _label_text(list(labels), list(labels.values()))
+                    lines.append(f"{name}{text} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "terraclime_stage_seconds",
+    "Time spent in each stage of answering a query (per granule for fetch stages).",
+    ["stage"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "terraclime_request_seconds", "End-to-end time of analysis requests.", ["endpoint"],
+))
+DOWNLOAD_BYTES = REGISTRY.register(Counter(
+    "terraclime_download_bytes_total", "Bytes downloaded from the archive.", ["mode"],
+))
+GRANULES = REGISTRY.register(Counter(
+    "terraclime_granules_total", "Granules processed, by outcome (ok, missing, error).", ["outcome"],
+))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def time_stage(stage: str):
+    """Context manager recording the duration of one pipeline stage."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def render() -> str:
+    return REGISTRY.render()
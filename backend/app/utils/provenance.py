@@ -0,0 +1,81 @@
+# backend/app/utils/provenance.py
+
+"""
+Provenance of exported data: which dataset, which granules, which software.
+
+docs/Compliance.md requires the NASA non-endorsement notice and the dataset
+DOIs in every download; each export embeds `provenance(...)` (as a CSV comment
+header or as NetCDF global attributes) and names the granule of every value
+with `granule_reference`.
+"""
+
+import datetime
+import platform
+from importlib import metadata
+
+import nasa_data_fetcher
+
+APP_NAME = "TerraClime Planner API"
+DATASET_SHORT_NAME = "M2T1NXSLV"
+DATASET_VERSION = "5.12.4"
+DATASET_TITLE = ("MERRA-2 tavg1_2d_slv_Nx: 2d,1-Hourly,Time-Averaged,Single-Level,"
+                 "Assimilation,Single-Level Diagnostics V5.12.4")
+DATASET_DOI = "10.5067/VJAFPLI1CSIV"
+DATASET_CITATION = (
+    "Global Modeling and Assimilation Office (GMAO) (2015), MERRA-2 tavg1_2d_slv_Nx: "
+    "2d,1-Hourly,Time-Averaged,Single-Level,Assimilation,Single-Level Diagnostics V5.12.4, "
+    "Greenbelt, MD, USA, Goddard Earth Sciences Data and Information Services Center "
+    f"(GES DISC), Accessed: {{accessed}}, https://doi.org/{DATASET_DOI}"
+)
+NON_ENDORSEMENT_NOTICE = (
+    "This product uses data from NASA but is not endorsed or certified by NASA. "
+    "The use of NASA data does not imply NASA endorsement of this product."
+)
+# Packages whose versions shape the exported numbers
+SOFTWARE_PACKAGES = ("numpy", "xarray", "netCDF4", "h5py", "fastapi")
+
+
+def software_versions() -> dict:
+    versions = {"python": platform.python_version()}
+    for package in SOFTWARE_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass
+    return versions
+
+
+def granule_reference(source: str, date: datetime.date, path: str | None = None) -> str:
+    """
+    Where a day's values come from: the GES DISC granule URL for the live source
+    (nasa_data_fetcher.known_granule_url, the same URLs the fetcher uses, never
+    by listing the archive), the mirror file name for a local mirror, and "" for
+    simulated data.
+    """
+    if source == "netcdf":
+        return path or ""
+    if source != "opendap":
+        return ""
+    return nasa_data_fetcher.known_granule_url(date)
+
+
+def provenance(data_source: str, query: dict | None = None) -> dict:
+    """Flat {name: text} record of an export, suitable for CSV comments and NetCDF attributes."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    record = {
+        "title": f"{APP_NAME} export",
+        "source": data_source,
+        "dataset": f"{DATASET_SHORT_NAME}.{DATASET_VERSION}",
+        "dataset_title": DATASET_TITLE,
+        "dataset_doi": DATASET_DOI,
+        "dataset_url": f"https://doi.org/{DATASET_DOI}",
+        "granule_base_url": nasa_data_fetcher.OPENDAP_BASE_URL,
+        "climate_period": f"{nasa_data_fetcher.CLIMATE_START_YEAR}-{nasa_data_fetcher.CLIMATE_END_YEAR}",
+        "citation": DATASET_CITATION.format(accessed=now.date().isoformat()),
+        "date_created": now.isoformat(),
+        "software": ", ".join(f"{name} {version}" for name, version in software_versions().items()),
+        "notice": NON_ENDORSEMENT_NOTICE,
+    }
+    if query:
+        record["query"] = "; ".join(f"{name}={value}" for name, value in query.items())
+    return record
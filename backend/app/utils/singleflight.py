@@ -0,0 +1,55 @@
+# backend/app/utils/singleflight.py
+
+"""
+In-process single-flight: concurrent requests for the same keys share one fetch.
+
+Keys are canonical query parts, e.g. (grid cell, month, day, variable). A request
+whose keys are already being fetched awaits that fetch instead of starting its
+own; a request that overlaps only partly starts a fetch for the remaining keys.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, keys, fetch) -> dict:
+        """
+        Return {key: value} for every key.
+
+        `fetch(keys)` is an async callable returning {key: value} for the keys it
+        was given; it is only called for keys not already in flight. The fetch runs
+        as its own task, so a cancelled caller does not cancel it for the others.
+        """
+        keys = list(dict.fromkeys(keys))
+        leading = [key for key in keys if key not in self._inflight]
+        if leading:
+            task = asyncio.ensure_future(fetch(leading))
+            self.started += 1
+            for key in leading:
+                self._inflight[key] = task
+            task.add_done_callback(lambda done, owned=tuple(leading): self._release(done, owned))
+        self.coalesced += len(keys) - len(leading)
+
+        tasks = {}
+        for key in keys:
+            tasks.setdefault(self._inflight[key], []).append(key)
+
+        results = {}
+        for task, task_keys in tasks.items():
+            values = await asyncio.shield(task)
+            for key in task_keys:
+                results[key] = values.get(key)
+        return results
+
+    def _release(self, task, keys):
+        for key in keys:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
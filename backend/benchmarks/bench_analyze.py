@@ -0,0 +1,193 @@
+# backend/benchmarks/bench_analyze.py
+
+"""
+End-to-end benchmark: /analyze against a local stand-in for GES DISC.
+
+Starts a FakeGesDisc server (synthetic MERRA-2-shaped tavg1_2d_slv_Nx granules
+with configurable latency and bandwidth) in a separate process, so encoding the
+responses does not compete with the code under test, points the fetcher at it,
+and drives the API in-process at several concurrency levels. Every request asks for a
+different grid cell and date, so each one pays a cold fetch. Reports latency
+percentiles, throughput, bytes transferred and where the time went per stage.
+No network access is needed.
+
+The fake server encodes every subset response on the fly, one at a time, and
+tops out at about 30 five-variable subsets per second, i.e. 30 / --years
+requests per second. Throughput near that ceiling measures the server, not the
+API; use --latency to model the real archive, whose round trips dominate.
+
+    python benchmarks/bench_analyze.py
+    python benchmarks/bench_analyze.py --latency 0.2 --bandwidth 2 --concurrency 1 8 32
+    python benchmarks/bench_analyze.py --json results.json --max-p95 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import numpy as np
+
+import main
+import nasa_auth
+import nasa_data_fetcher
+from app.services import catalog
+from app.storage import store
+from app.utils.metrics import STAGE_SECONDS
+from fake_gesdisc import DEFAULT_LAT, DEFAULT_LON
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("auth", "resolve", "download", "hdf5_lock_wait", "decode", "select_reduce", "cache_lookup", "statistics")
+VARIABLES = ["max_temp_c", "min_temp_c", "precipitation_mm", "wind_speed_kph", "dust_ug_m3"]
+
+
+def make_queries(count: int, seed: int) -> list[dict]:
+    """Distinct (cell, date) queries inside the fake server's window."""
+    rng = np.random.default_rng(seed)
+    cells = [(lat, lon) for lat in DEFAULT_LAT[1:-1] for lon in DEFAULT_LON[1:-1]]
+    order = rng.permutation(len(cells))
+    queries = []
+    for n in range(count):
+        lat, lon = cells[order[n % len(cells)]]
+        month, day = 1 + (n // len(cells)) % 12, 1 + (n * 7) % 28
+        queries.append({"latitude": float(lat), "longitude": float(lon), "month": month, "day": day,
+                        "variables": VARIABLES})
+    return queries
+
+
+async def run_level(queries: list[dict], concurrency: int) -> list[float]:
+    """Send all queries with at most `concurrency` in flight; returns per-request seconds."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as http:
+        async def one(query):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await http.post("/analyze", json=query)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(query) for query in queries))
+    return latencies
+
+
+@contextmanager
+def fake_server(latency: float, bandwidth: float | None):
+    """Run fake_gesdisc.py in a child process; yields (base_url, stats callable)."""
+    command = [sys.executable, os.path.join(BACKEND_DIR, "fake_gesdisc.py"), "--latency", str(latency)]
+    if bandwidth:
+        command += ["--bandwidth", str(bandwidth)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = process.stdout.readline().strip()
+        if not base_url:
+            raise RuntimeError("fake GES DISC server did not start")
+        root = base_url.split("/data/", 1)[0]
+        yield base_url, lambda: httpx.get(f"{root}/_stats").json()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def configure(base_url: str, years: int):
+    """Point the fetcher at the fake server with every cache that could hide a cold fetch disabled."""
+    os.environ.setdefault("EARTHDATA_USERNAME", "bench")
+    os.environ.setdefault("EARTHDATA_PASSWORD", "bench")
+    nasa_auth._session_manager = nasa_auth.SessionManager()
+    nasa_data_fetcher.OPENDAP_BASE_URL = base_url
+    nasa_data_fetcher.CLIMATE_END_YEAR = 2020
+    nasa_data_fetcher.CLIMATE_START_YEAR = 2020 - years + 1
+    store.POINT_CACHE_PATH = ""
+    store.SERIES_STORE_DIR = ""
+    store._series_store = None
+    store.CLIMATE_RECORD_PATH = ""
+    store._record_store = None
+    store.CLIMATOLOGY_CUBE_DIR = ""
+    catalog.GRANULE_CATALOG_PATH = ""
+
+
+def benchmark(concurrency_levels, requests_per_level: int, latency: float, bandwidth_mb: float | None,
+              years: int, seed: int = 0) -> list[dict]:
+    bandwidth = bandwidth_mb * 1e6 if bandwidth_mb else None
+    results = []
+    with fake_server(latency, bandwidth) as (base_url, server_stats):
+        configure(base_url, years)
+        queries = make_queries(requests_per_level * len(concurrency_levels), seed)
+        for n, concurrency in enumerate(concurrency_levels):
+            level_queries = queries[n * requests_per_level:(n + 1) * requests_per_level]
+            nasa_data_fetcher.get_cell_data_multi.cache_clear()
+            before = server_stats()
+            stages_before = {stage: STAGE_SECONDS.total(stage=stage) for stage in STAGES}
+
+            started = time.perf_counter()
+            latencies = np.array(asyncio.run(run_level(level_queries, concurrency)))
+            wall = time.perf_counter() - started
+            after = server_stats()
+
+            results.append({
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "p50_s": float(np.percentile(latencies, 50)),
+                "p95_s": float(np.percentile(latencies, 95)),
+                "p99_s": float(np.percentile(latencies, 99)),
+                "throughput_rps": len(latencies) / wall,
+                "wall_s": wall,
+                "bytes": after["bytes_sent"] - before["bytes_sent"],
+                "granule_requests": after["requests"] - before["requests"],
+                "stage_seconds": {
+                    stage: STAGE_SECONDS.total(stage=stage) - stages_before[stage] for stage in STAGES
+                },
+            })
+    return results
+
+
+def print_report(results: list[dict]):
+    print(f"{'conc':>5}{'reqs':>6}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'req/s':>9}{'MB':>9}{'granules':>10}")
+    for r in results:
+        print(f"{r['concurrency']:>5}{r['requests']:>6}{r['p50_s']:>9.3f}{r['p95_s']:>9.3f}{r['p99_s']:>9.3f}"
+              f"{r['throughput_rps']:>9.2f}{r['bytes'] / 1e6:>9.2f}{r['granule_requests']:>10}")
+    print("\nStage time (summed over threads, seconds):")
+    print(f"{'conc':>5}" + "".join(f"{stage:>15}" for stage in STAGES))
+    for r in results:
+        print(f"{r['concurrency']:>5}" + "".join(f"{r['stage_seconds'][stage]:>15.3f}" for stage in STAGES))
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level")
+    parser.add_argument("--years", type=int, default=10, help="climate-period length (granules per query)")
+    parser.add_argument("--latency", type=float, default=0.05, help="server latency per request, seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="server bandwidth, MB/s (default unthrottled)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="exit with status 1 if any level's p95 latency exceeds this many seconds")
+    args = parser.parse_args(argv)
+
+    print(f"Benchmark: {args.requests} requests per level, {args.years} granules per query, "
+          f"latency {args.latency * 1000:.0f} ms, bandwidth "
+          f"{f'{args.bandwidth:g} MB/s' if args.bandwidth else 'unthrottled'}")
+    results = benchmark(args.concurrency, args.requests, args.latency, args.bandwidth, args.years, args.seed)
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    if args.max_p95 is not None and any(r["p95_s"] > args.max_p95 for r in results):
+        print(f"FAIL: p95 latency above {args.max_p95} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
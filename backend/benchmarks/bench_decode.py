@@ -0,0 +1,137 @@
+# backend/benchmarks/bench_decode.py
+
+"""
+Micro-benchmark: per-granule decode latency of the open_granule modes.
+
+Times "open the downloaded bytes + select one cell + reduce every variable",
+i.e. everything _fetch_year does after the download, for each decode mode.
+
+    python benchmarks/bench_decode.py                # small synthetic window
+    python benchmarks/bench_decode.py --full-grid    # real 361 x 576 grid (~100 MB raw)
+
+--processes 0 2 4 8 additionally measures throughput: granules/s decoded by
+NASA_FETCH_WORKERS threads through _reduce_granule with that many decode
+processes (0 = in-process behind the HDF5 lock), i.e. the fetch path with the
+downloads already done.
+
+The chunk reader section times point reads from the granule on disk, chunked
+like the archive (one hour by a tile of cells), through GranuleReader: cold
+(an empty chunk cache per query) and warm (the shared cache), with the bytes
+decompressed per query.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+from app.services.granule_reader import ChunkCache, GranuleReader
+from fake_gesdisc import MERRA2_LAT, MERRA2_LON, granule_bytes, granule_dataset
+
+MODES = ("tempfile", "netcdf4-memory", "h5netcdf-memory")
+VARIABLES = tuple(nasa_data_fetcher.VARIABLE_MAP)
+
+
+def time_mode(content: bytes, mode: str, repeats: int) -> list[float]:
+    cell = snap_to_grid(37.74, -119.59)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with nasa_data_fetcher.open_granule(content, mode) as ds:
+            nasa_data_fetcher._extract_values(ds, cell, VARIABLES)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_chunk_reader(path: str, repeats: int, warm: bool) -> tuple:
+    """(timings, decompressed bytes per query) of single-cell reads of every source field."""
+    cell = snap_to_grid(37.74, -119.59)
+    fields = sorted({name for var in VARIABLES for name in nasa_data_fetcher.SOURCE_VARIABLES[var]})
+    shared = ChunkCache(256 * 2**20)
+    if warm:
+        with GranuleReader(path, shared) as reader:
+            reader.read_points(fields, [cell.latitude], [cell.longitude])
+    timings, decompressed = [], []
+    for _ in range(repeats):
+        cache = shared if warm else ChunkCache(256 * 2**20)
+        before = cache.stats()["decompressed_bytes"]
+        start = time.perf_counter()
+        with GranuleReader(path, cache) as reader:
+            series = reader.read_points(fields, [cell.latitude], [cell.longitude])
+            for var in VARIABLES:
+                nasa_data_fetcher._reduce_series({name: values[:, 0] for name, values in series.items()}, var)
+        timings.append(time.perf_counter() - start)
+        decompressed.append(cache.stats()["decompressed_bytes"] - before)
+    return timings, statistics.mean(decompressed)
+
+
+def throughput(content: bytes, processes: int, granules: int) -> float:
+    """Granules per second through _reduce_granule with `processes` decode processes."""
+    cell = snap_to_grid(37.74, -119.59)
+    nasa_data_fetcher.DECODE_PROCESSES = processes
+    try:
+        def reduce(_):
+            return nasa_data_fetcher._reduce_granule(content, nasa_data_fetcher._extract_values, cell, VARIABLES)
+
+        with ThreadPoolExecutor(max_workers=nasa_data_fetcher.FETCH_WORKERS) as executor:
+            list(executor.map(reduce, range(max(processes, 1))))  # start the pool
+            start = time.perf_counter()
+            list(executor.map(reduce, range(granules)))
+            return granules / (time.perf_counter() - start)
+    finally:
+        nasa_data_fetcher.shutdown_decode_pool()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--full-grid", action="store_true", help="use the full MERRA-2 grid")
+    parser.add_argument("--processes", type=int, nargs="*", default=[],
+                        help="decode process counts to measure throughput for")
+    parser.add_argument("--granules", type=int, default=200, help="granules per throughput run")
+    args = parser.parse_args(argv)
+
+    if args.full_grid:
+        ds = granule_dataset(2011, 7, 15, lat=MERRA2_LAT, lon=MERRA2_LON)
+    else:
+        ds = granule_dataset(2011, 7, 15)
+    content = granule_bytes(ds)
+    print(f"Granule: {len(content) / 1e6:.1f} MB compressed, {ds.nbytes / 1e6:.1f} MB decoded, "
+          f"{args.repeats} repeats per mode")
+
+    print(f"{'mode':<16}{'median ms':>12}{'p95 ms':>12}{'min ms':>12}")
+    for mode in MODES:
+        timings = np.array(time_mode(content, mode, args.repeats)) * 1000
+        print(f"{mode:<16}{statistics.median(timings):>12.2f}{np.percentile(timings, 95):>12.2f}"
+              f"{timings.min():>12.2f}")
+
+    tile = (1, 91, 144) if args.full_grid else (1, 8, 8)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "granule.nc4")
+        encoding = {name: {"zlib": True, "shuffle": True, "chunksizes": tile} for name in ds.data_vars}
+        ds.to_netcdf(path, engine="netcdf4", encoding=encoding)
+        print(f"\nChunk reader, {tile} chunks ({ds.nbytes / 1e6:.1f} MB decoded in total)")
+        print(f"{'cache':<16}{'median ms':>12}{'p95 ms':>12}{'MB/query':>12}")
+        for label, warm in (("cold", False), ("warm", True)):
+            timings, decompressed = time_chunk_reader(path, args.repeats, warm)
+            timings = np.array(timings) * 1000
+            print(f"{label:<16}{statistics.median(timings):>12.2f}{np.percentile(timings, 95):>12.2f}"
+                  f"{decompressed / 1e6:>12.3f}")
+
+    if args.processes:
+        print(f"\n{'processes':<16}{'granules/s':>12}")
+        for processes in args.processes:
+            print(f"{processes:<16}{throughput(content, processes, args.granules):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # backend/data_simulator.py
 
 import numpy as np
+from scipy.special import ndtri
 
 # Define some baseline climate characteristics for our simulation
 # In a real app, this would be derived from actual climate data.
@@ -12,24 +13,65 @@ SIMULATION_PARAMS = {
     "wind_speed_kph": (15, 7),
     "dust_ug_m3": (50, 25),
 }
+# Variables that cannot go below zero
+NON_NEGATIVE = {"precipitation_mm", "dust_ug_m3"}
 
-def get_historical_data(variable: str, num_years: int = 30) -> list[float]:
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer applied elementwise (uint64 arithmetic wraps)."""
+    x = x + _GOLDEN
+    x = (x ^ (x >> np.uint64(30))) * _MIX1
+    x = (x ^ (x >> np.uint64(27))) * _MIX2
+    return x ^ (x >> np.uint64(31))
+
+
+def simulate(keys, variables, seed: int = 0) -> np.ndarray:
+    """
+    Simulated daily values for many samples and variables in one vectorized call.
+
+    keys:  integer array (..., k); each row identifies one sample, e.g.
+           (lat index, lon index, year, month, day)
+    Returns a float64 array (..., len(variables)) rounded to 2 decimals; unknown
+    variables are NaN. A value depends only on (seed, key row, variable), so the
+    same sample is identical whichever batch it is generated in.
+    """
+    keys = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+    h = np.full(keys.shape[:-1], seed, dtype=np.uint64)
+    for column in np.moveaxis(keys, -1, 0):
+        h = _splitmix64(h ^ column)
+
+    codes = np.arange(1, len(variables) + 1, dtype=np.uint64)
+    bits = _splitmix64(h[..., None] ^ (codes * _GOLDEN))
+    # Top 53 bits -> uniform in (0, 1) -> standard normal
+    z = ndtri(((bits >> np.uint64(11)).astype(np.float64) + 0.5) * 2.0 ** -53)
+
+    params = np.array([SIMULATION_PARAMS.get(var, (np.nan, np.nan)) for var in variables], dtype=np.float64)
+    values = params[:, 0] + params[:, 1] * z
+    floor = np.array([0.0 if var in NON_NEGATIVE else -np.inf for var in variables])
+    return np.round(np.maximum(values, floor), 2)
+
+
+def get_historical_data(variable: str, num_years: int = 30, seed: int | None = None) -> list[float]:
     """
     Simulates fetching 30 years of historical data for a given variable
-    on a specific day of the year.
+    on a specific day of the year. Pass a seed for repeatable values.
     """
     if variable not in SIMULATION_PARAMS:
         return []
 
     mean, std_dev = SIMULATION_PARAMS[variable]
-    
+
     # Generate random data following a normal (Gaussian) distribution
     # This mimics the natural variation of weather data.
-    simulated_data = np.random.normal(loc=mean, scale=std_dev, size=num_years)
-    
+    simulated_data = np.random.default_rng(seed).normal(loc=mean, scale=std_dev, size=num_years)
+
     # Ensure physical constraints (e.g., precipitation can't be negative)
-    if "precipitation" in variable or "dust" in variable:
+    if variable in NON_NEGATIVE:
         simulated_data = np.maximum(0, simulated_data) # Set any negative values to 0
 
     # Return as a list of floating-point numbers rounded to 2 decimal places
-    return [round(val, 2) for val in simulated_data]
\ No newline at end of file
+    return np.round(simulated_data, 2).tolist()
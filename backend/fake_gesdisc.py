@@ -0,0 +1,461 @@
+# backend/fake_gesdisc.py
+
+"""
+A local stand-in for the GES DISC MERRA-2 archive, used by tests and benchmarks.
+
+It serves synthetic `tavg1_2d_slv_Nx` granules under the same URL layout as
+`nasa_data_fetcher.OPENDAP_BASE_URL`, so the fetcher can be pointed at it
+without any network access. Granules cover a small window of the real
+MERRA-2 0.5° x 0.625° grid, which keeps them small while still matching the
+real cell coordinates.
+
+Run it standalone (e.g. for benchmarks, so the server's CPU time is not
+charged to the process under test) with `python fake_gesdisc.py --port 8081`;
+GET /_stats then returns its request and byte counters as JSON.
+
+Like Hyrax, the same granules are also answered under `/opendap/` for DAP2
+(`<granule>.nc4?T2M[0:1:23][i:1:i][j:1:j],...`) and DAP4
+(`<granule>.dap.nc4?dap4.ce=/T2M[0:1:23][i][j];...`) subset requests, with
+lat/lon hyperslabs given as indices into the global MERRA-2 grid.
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import os
+import secrets
+import re
+import tempfile
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs, quote, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import xarray as xr
+
+COLLECTION_PATH = "/data/MERRA2/M2T1NXSLV.5.12.4"
+OPENDAP_PATH = "/opendap/MERRA2/M2T1NXSLV.5.12.4"
+URS_LOGIN_PATH = "/urs/oauth/authorize"
+URS_COOKIE = "urs_session"
+GRANULE_VARIABLES = ("T2M", "PRECTOTCORR", "U10M", "V10M", "DUSMASS")
+
+# Default window: California / Nevada on the real MERRA-2 grid
+DEFAULT_LAT = np.arange(30.0, 45.0 + 0.25, 0.5)
+DEFAULT_LON = -180.0 + 0.625 * np.arange(88, 113)
+MERRA2_LAT = np.linspace(-90.0, 90.0, 361)
+MERRA2_LON = -180.0 + 0.625 * np.arange(576)
+
+_HYPERSLAB = re.compile(r"/?(\w+)((?:\[[^\]]*\])+)")
+_NETCDF4_LOCK = threading.Lock()
+
+
+def granule_dataset(year: int, month: int, day: int, lat=DEFAULT_LAT, lon=DEFAULT_LON) -> xr.Dataset:
+    """Build a deterministic MERRA-2-shaped daily granule for a date."""
+    date = datetime.date(year, month, day)
+    hours = np.arange(24)
+    time_index = np.array(
+        [np.datetime64(f"{date.isoformat()}T00:30") + np.timedelta64(int(h), "h") for h in hours]
+    )
+
+    h = hours[:, None, None].astype(np.float64)
+    la = np.asarray(lat, dtype=np.float64)[None, :, None]
+    lo = np.asarray(lon, dtype=np.float64)[None, None, :]
+    doy = date.timetuple().tm_yday
+    season = np.cos(2 * np.pi * (doy - 200) / 365.25)
+    trend = 0.05 * (year - 1990)
+    diurnal = np.sin(2 * np.pi * (h - 9) / 24)
+
+    shape = (len(hours), la.shape[1], lo.shape[2])
+    # Small seeded noise so granules compress about as poorly as real fields do
+    rng = np.random.default_rng(year * 10000 + month * 100 + day)
+
+    def grid(values):
+        noise = 1 + 1e-3 * rng.standard_normal(shape)
+        return (np.broadcast_to(values, shape) * noise).astype(np.float32)
+
+    t2m = 288.0 + 10 * season + trend + 8 * diurnal - 0.6 * (la - 37.5) + 0.05 * (lo + 117.5)
+    precip = np.clip(diurnal, 0, None) * 4e-5 * (1 + ((year + doy) % 4 == 0))
+    u10m = 3.0 + 2 * diurnal + 0.1 * (la - 37.5)
+    v10m = -1.5 + np.cos(2 * np.pi * h / 24) + 0.05 * (lo + 117.5)
+    dust = (20.0 + 5 * season + 0.2 * (year % 7) + 0.5 * (la - 30)) * 1e-9
+
+    dims = ("time", "lat", "lon")
+    return xr.Dataset(
+        {
+            "T2M": (dims, grid(t2m)),
+            "PRECTOTCORR": (dims, grid(precip)),
+            "U10M": (dims, grid(u10m)),
+            "V10M": (dims, grid(v10m)),
+            "DUSMASS": (dims, grid(dust)),
+        },
+        coords={
+            "time": time_index,
+            "lat": np.asarray(lat, dtype=np.float64),
+            "lon": np.asarray(lon, dtype=np.float64),
+        },
+        attrs={
+            "title": "Synthetic MERRA2 tavg1_2d_slv_Nx granule",
+            "description": "Generated by fake_gesdisc for offline testing",
+        },
+    )
+
+
+def granule_bytes(ds: xr.Dataset, engine: str = "h5netcdf") -> bytes:
+    """
+    Encode a dataset as NetCDF-4 (HDF5) bytes, compressed like the real archive.
+
+    The default h5netcdf engine goes through h5py, which serializes its own HDF5
+    calls, so the handler threads can encode while the fetcher decodes granules
+    in the same process. "netcdf4" is about four times faster but not thread
+    safe; encodes are then serialized here, and it is only for a server running
+    in its own process (see `main`).
+    """
+    encoding = {name: {"zlib": True, "complevel": 4} for name in ds.data_vars}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "granule.nc4")
+        if engine == "netcdf4":
+            with _NETCDF4_LOCK:
+                ds.to_netcdf(path, engine="netcdf4", encoding=encoding)
+        else:
+            ds.to_netcdf(path, engine=engine, encoding=encoding)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def default_stream(year: int) -> str:
+    """Processing stream of the original MERRA-2 production for a year."""
+    return "100" if year <= 1991 else "200" if year <= 2000 else "300" if year <= 2010 else "400"
+
+
+def granule_name(year: int, month: int, day: int, stream: str) -> str:
+    return f"MERRA2_{stream}.tavg1_2d_slv_Nx.{year}{month:02d}{day:02d}.nc4"
+
+
+def parse_granule_path(path: str):
+    """Return (year, month, day) for a granule path, or None if it is not one."""
+    if not path.startswith((COLLECTION_PATH + "/", OPENDAP_PATH + "/")):
+        return None
+    name = path.rsplit("/", 1)[-1]
+    parts = name.split(".")
+    if len(parts) < 4 or not parts[0].startswith("MERRA2_") or parts[1] != "tavg1_2d_slv_Nx":
+        return None
+    stamp = parts[2]
+    try:
+        return int(stamp[:4]), int(stamp[4:6]), int(stamp[6:8])
+    except ValueError:
+        return None
+
+
+def parse_constraint(query: str) -> dict:
+    """
+    Parse a DAP2 projection or DAP4 `dap4.ce=` query into
+    {name: [index ranges per dimension]}, each range a (start, stride, stop) tuple.
+    """
+    query = unquote(query)
+    if query.startswith("dap4.ce="):
+        query = query[len("dap4.ce="):]
+    projections = {}
+    for name, brackets in _HYPERSLAB.findall(query):
+        ranges = []
+        for spec in re.findall(r"\[([^\]]*)\]", brackets):
+            parts = [int(p) for p in spec.split(":")]
+            if len(parts) == 1:
+                ranges.append((parts[0], 1, parts[0]))
+            elif len(parts) == 2:
+                ranges.append((parts[0], 1, parts[1]))
+            else:
+                ranges.append((parts[0], parts[1], parts[2]))
+        projections[name] = ranges
+    return projections
+
+
+def subset_dataset(ds: xr.Dataset, projections: dict) -> xr.Dataset:
+    """Apply global-grid hyperslabs to a windowed granule; raises KeyError outside the window."""
+    def positions(coord, grid, spec):
+        start, stride, stop = spec
+        wanted = grid[start:stop + 1:stride]
+        found = [int(np.argmin(np.abs(coord - value))) for value in wanted]
+        if not np.allclose(coord[found], wanted):
+            raise KeyError("hyperslab outside the served window")
+        return found
+
+    lat, lon = ds["lat"].values, ds["lon"].values
+    fields = {}
+    for name, ranges in projections.items():
+        if name in ("time", "lat", "lon"):
+            continue
+        t, i, j = ranges
+        fields[name] = ds[name].isel(
+            time=slice(t[0], t[2] + 1, t[1]),
+            lat=positions(lat, MERRA2_LAT, i),
+            lon=positions(lon, MERRA2_LON, j),
+        )
+    return xr.Dataset(fields, attrs=ds.attrs)
+
+
+class FakeGesDisc:
+    """
+    Threaded HTTP server answering granule requests from synthetic data.
+
+    latency:        seconds slept before answering each request
+    bandwidth:      bytes per second granule bodies are streamed at (None: unthrottled)
+    missing_years:  years answered with 404, like gaps in the real archive
+    opendap:        whether /opendap/ subset requests are served (else 501)
+    streams:        {(year, month, day): stream} for reprocessed granules, e.g. "401";
+                    requests naming any other stream for those days get 404
+    urs:            emulate the Earthdata login: requests without a valid session
+                    cookie are redirected to a login endpoint that checks Basic
+                    `credentials` and sets the cookie (else 401)
+    engine:         granule encoder, see `granule_bytes`
+    """
+
+    def __init__(self, latency: float = 0.0, missing_years=(), lat=DEFAULT_LAT, lon=DEFAULT_LON,
+                 opendap: bool = True, bandwidth: float | None = None, urs: bool = False, credentials=("tester", "secret"), streams=None,
+                 engine: str = "h5netcdf"):
+        self.latency = latency
+        self.engine = engine
+        self.bandwidth = bandwidth
+        self.missing_years = set(missing_years)
+        self.lat = lat
+        self.lon = lon
+        self.opendap = opendap
+        self.streams = dict(streams or {})
+        self.listing_requests = 0
+        self.urs = urs
+        self.credentials = tuple(credentials)
+        self.logins = 0
+        self._urs_tokens = set()
+        self.requests = 0
+        self.subset_requests = 0
+        self.bytes_sent = 0
+        self._datasets = {}
+        self._granules = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{COLLECTION_PATH}"
+
+    def dataset(self, year: int, month: int, day: int) -> xr.Dataset:
+        key = (year, month, day)
+        with self._lock:
+            cached = self._datasets.get(key)
+        if cached is None:
+            cached = granule_dataset(year, month, day, self.lat, self.lon)
+            with self._lock:
+                self._datasets[key] = cached
+        return cached
+
+    def granule(self, year: int, month: int, day: int) -> bytes:
+        key = (year, month, day)
+        with self._lock:
+            cached = self._granules.get(key)
+        if cached is None:
+            cached = granule_bytes(self.dataset(year, month, day), self.engine)
+            with self._lock:
+                self._granules[key] = cached
+        return cached
+
+    def subset(self, year: int, month: int, day: int, query: str) -> bytes:
+        subset = subset_dataset(self.dataset(year, month, day), parse_constraint(query))
+        return granule_bytes(subset, self.engine)
+
+    def stream(self, year: int, month: int, day: int) -> str:
+        return self.streams.get((year, month, day), default_stream(year))
+
+    def listing(self, year: int, month: int) -> bytes:
+        """An Apache-style directory listing of one month, like the archive's."""
+        rows = []
+        for day in range(1, 32):
+            try:
+                datetime.date(year, month, day)
+            except ValueError:
+                break
+            if year in self.missing_years:
+                continue
+            name = granule_name(year, month, day, self.stream(year, month, day))
+            rows.append(f'<tr><td><a href="{name}">{name}</a></td></tr>')
+            rows.append(f'<tr><td><a href="{name}.xml">{name}.xml</a></td></tr>')
+        body = f"<html><body><h1>Index of {year}/{month:02d}</h1><table>{''.join(rows)}</table></body></html>"
+        return body.encode()
+
+    def expire_sessions(self):
+        """Invalidate every URS session cookie handed out so far."""
+        with self._lock:
+            self._urs_tokens.clear()
+
+    def _login(self, authorization: str):
+        """A new session token for valid Basic credentials, else None."""
+        scheme, _, encoded = (authorization or "").partition(" ")
+        if scheme.lower() != "basic":
+            return None
+        try:
+            username, _, password = base64.b64decode(encoded).decode().partition(":")
+        except ValueError:
+            return None
+        if (username, password) != self.credentials:
+            return None
+        token = secrets.token_hex(8)
+        with self._lock:
+            self._urs_tokens.add(token)
+            self.logins += 1
+        return token
+
+    def _has_session(self, cookie_header: str) -> bool:
+        morsel = SimpleCookie(cookie_header or "").get(URS_COOKIE)
+        with self._lock:
+            return morsel is not None and morsel.value in self._urs_tokens
+
+    def _send(self, wfile, body: bytes, chunk_size: int = 64 * 1024):
+        """Write a response body, throttled to `bandwidth` when set."""
+        if not self.bandwidth:
+            wfile.write(body)
+            return
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            wfile.write(chunk)
+            time.sleep(len(chunk) / self.bandwidth)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "subset_requests": self.subset_requests,
+                "bytes_sent": self.bytes_sent,
+                "listing_requests": self.listing_requests,
+                "logins": self.logins,
+            }
+
+    def _record(self, nbytes: int, subset: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.subset_requests += int(subset)
+            self.bytes_sent += nbytes
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                path, _, query = self.path.partition("?")
+                if path == "/_stats":
+                    body = json.dumps(fake.stats()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if fake.urs and path == URS_LOGIN_PATH:
+                    token = fake._login(self.headers.get("Authorization"))
+                    if token is None:
+                        self.send_error(401)
+                        return
+                    self.send_response(302)
+                    self.send_header("Set-Cookie", f"{URS_COOKIE}={token}; Path=/")
+                    self.send_header("Location", parse_qs(query)["redirect"][0])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if fake.urs and not fake._has_session(self.headers.get("Cookie")):
+                    self.send_response(302)
+                    self.send_header("Location", f"{URS_LOGIN_PATH}?redirect={quote(self.path, safe='')}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                is_subset = path.startswith(OPENDAP_PATH + "/")
+                if is_subset and not fake.opendap:
+                    fake._record(0, subset=True)
+                    self.send_error(501)
+                    return
+                if is_subset:
+                    # Hyrax response suffixes: .nc4 (DAP2 fileout) or .dap.nc4 (DAP4)
+                    suffix = ".dap.nc4" if path.endswith(".dap.nc4") else ".nc4"
+                    path = path.removesuffix(suffix)
+                month_dir = re.fullmatch(re.escape(COLLECTION_PATH) + r"/(\d{4})/(\d{2})/", path)
+                if month_dir:
+                    body = fake.listing(int(month_dir.group(1)), int(month_dir.group(2)))
+                    with fake._lock:
+                        fake.listing_requests += 1
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                date = parse_granule_path(path)
+                if date is not None and path.rsplit("/", 1)[-1][7:10] != fake.stream(*date):
+                    date = None
+                if date is None or date[0] in fake.missing_years:
+                    fake._record(0, subset=is_subset)
+                    self.send_error(404)
+                    return
+                try:
+                    body = fake.subset(*date, query) if is_subset else fake.granule(*date)
+                except (KeyError, ValueError) as e:
+                    fake._record(0, subset=is_subset)
+                    self.send_error(400, str(e))
+                    return
+                fake._record(len(body), subset=is_subset)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-netcdf4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                fake._send(self.wfile, body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, port: int = 0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic MERRA-2 granules like GES DISC.")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes per second")
+    parser.add_argument("--missing-years", type=int, nargs="*", default=())
+    parser.add_argument("--engine", choices=("netcdf4", "h5netcdf"), default="netcdf4",
+                        help="granule encoder; netcdf4 is faster but must not share a process with the fetcher")
+    args = parser.parse_args(argv)
+
+    server = FakeGesDisc(latency=args.latency, bandwidth=args.bandwidth, missing_years=args.missing_years,
+                         engine=args.engine)
+    server.start(args.port)
+    # The first line tells a parent process where to point the fetcher
+    print(server.base_url, flush=True)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
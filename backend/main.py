@@ -1,92 +1,338 @@
 # backend/main.py
 
-from fastapi import FastAPI
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
-import numpy as np
-from scipy.stats import norm
-from nasa_data_fetcher import get_nasa_data
+from nasa_data_fetcher import climate_dates, climate_period, shutdown_decode_pool
+from app import config
+from app.models.schemas import AnalysisRequest, AnalysisResponse, GridCellInfo, VariableResult
+from app.routers import download, metrics, query
+from app.services.aoi import aoi_mask, parse_aoi
+from app.services.climate_record import PeriodStream, period_series
+from app.services.data_access import get_data_source
+from app.services.datasets import snap_to_grid
+from app.services.pipeline import shutdown_job_queue
+from app.services.prefetch import Prefetcher, live_traffic
+from app.services.stats import VARIABLE_DETAILS, summarize_many
+from app.storage.store import get_point_cache, get_value_store
+from app.utils.metrics import REGISTRY, REQUEST_SECONDS, time_stage
+from app.utils.singleflight import SingleFlight
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-warming only pays off when fetched values outlive the request
+    if config.PREFETCH_ENABLED and get_data_source().prefetchable and get_value_store() is not None:
+        prefetcher.start()
+    yield
+    await prefetcher.stop()
+    shutdown_job_queue()
+    shutdown_decode_pool()
+
 
 app = FastAPI(
     title="TerraClime Planner API",
-    description="An API for analyzing the likelihood of weather conditions based on NASA MERRA-2 data."
+    description="An API for analyzing the likelihood of weather conditions based on NASA MERRA-2 data.",
+    lifespan=lifespan,
 )
+app.include_router(query.router)
+app.include_router(metrics.router)
+app.include_router(download.router)
 
 # THIS IS THE CRITICAL PART FOR THE BACKEND
-class AnalysisRequest(BaseModel):
-    latitude: float = Field(..., example=37.74)
-    longitude: float = Field(..., example=-119.59)
+# (AnalysisRequest and AnalysisResponse live in app.models.schemas so the routers and job workers can share them)
+
+class AreaAnalysisRequest(BaseModel):
+    """An area of interest: either a polygon ring of [lon, lat] pairs or a bbox [west, south, east, north]."""
+    polygon: Optional[List[List[float]]] = Field(None, example=[[-119.9, 37.5], [-119.2, 37.5], [-119.2, 38.2], [-119.9, 38.2]])
+    bbox: Optional[List[float]] = Field(None, example=[-119.9, 37.5, -119.2, 38.2])
     month: int = Field(..., gt=0, lt=13, example=7)
     day: int = Field(..., gt=0, lt=32, example=15)
     variables: List[str] = Field(..., example=["max_temp_c"])
+    window_days: int = Field(0, ge=0, le=15, example=0)
+    # Baseline period, as for /analyze
+    start_year: Optional[int] = Field(None, ge=1980, example=1991)
+    end_year: Optional[int] = Field(None, ge=1980, example=2020)
 
-class ThresholdAnalysis(BaseModel):
-    probability_exceeding: Optional[float] = Field(None, example=0.40)
-    probability_of_event: Optional[float] = Field(None, example=0.10)
+class AreaInfo(BaseModel):
+    """The grid cells the area covers; values are their area-weighted means."""
+    aoi_hash: str
+    area_km2: float
+    cells: int
 
-class VariableResult(BaseModel):
-    variable: str
-    unit: str
-    mean: float
-    std_dev: float
-    likelihood: ThresholdAnalysis
-    raw_data_points: int
-
-class AnalysisResponse(BaseModel):
-    query: AnalysisRequest
+class AreaAnalysisResponse(BaseModel):
+    query: AreaAnalysisRequest
+    area: AreaInfo
     results: List[VariableResult]
-    metadata: dict = {
-        "data_source": "NASA MERRA-2 M2T1NXSLV.5.12.4 via GES DISC OPe_NDAP",
-        "climate_period": "1991-2020"
-    }
+    metadata: dict = {}
+
+# Concurrent queries for the same (cell, month, day, window, variable) share one fetch
+inflight_fetches = SingleFlight()
+
+
+async def fetch_historical(cell, month: int, day: int, variables, window_days: int = 0,
+                           max_workers: int | None = None, period: tuple | None = None) -> dict:
+    """
+    Historical daily values per variable for a grid cell over `period` (default:
+    the configured climate period), off the event loop. Values come through the
+    climate records, so only years not stored yet are fetched.
+
+    Each variable is its own single-flight key, so a request for max_temp_c and
+    precipitation_mm joins an in-flight max_temp_c fetch and only starts one for
+    precipitation_mm. `max_workers` only applies if this call starts the fetch.
+    """
+    period = period or climate_period()
+
+    async def fetch(keys):
+        wanted = tuple(sorted(key[-1] for key in keys))
+        # The download blocks for up to minutes; keep it on a worker thread
+        values = await asyncio.to_thread(period_series, get_data_source(), cell, month, day, wanted,
+                                         max_workers, window_days, period)
+        return {key: values.get(key[-1], []) for key in keys}
+
+    keys = [(cell.index, month, day, window_days, period, var) for var in variables]
+    results = await inflight_fetches.run(keys, fetch)
+    return {key[-1]: value for key, value in results.items()}
+
+
+async def prefetch_item(cell, month: int, day: int, variables):
+    await fetch_historical(cell, month, day, variables, max_workers=config.PREFETCH_FETCH_WORKERS)
+
+
+# Low-priority worker pre-warming the point cache for popular locations
+prefetcher = Prefetcher(prefetch_item)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "inflight_fetches": inflight_fetches.in_flight()}
+
+
+@app.get("/prefetch/status")
+async def prefetch_status():
+    return prefetcher.status()
+
+
+@REGISTRY.collector
+def _api_metrics():
+    yield ("terraclime_singleflight_inflight", "gauge",
+           "Query keys currently being fetched.", [({}, inflight_fetches.in_flight())])
+    yield ("terraclime_singleflight_coalesced_total", "counter",
+           "Query keys that joined a fetch already in flight.", [({}, inflight_fetches.coalesced)])
+    status = prefetcher.status()
+    yield ("terraclime_prefetch_queue_depth", "gauge",
+           "Prefetch items waiting in the current round.", [({}, status["queue_depth"])])
+    yield ("terraclime_prefetch_items_total", "counter", "Prefetch items finished, by outcome.",
+           [({"outcome": "done"}, status["done"]), ({"outcome": "failed"}, status["failed"])])
+
 
 @app.post("/analyze", response_model=AnalysisResponse)
-def analyze_weather_likelihood(request: AnalysisRequest):
-    all_results = []
-    variable_details = {
-        "max_temp_c": {"unit": "°C", "threshold": 32},
-        "min_temp_c": {"unit": "°C", "threshold": 0},
-        "precipitation_mm": {"unit": "mm", "threshold": 1},
-        "wind_speed_kph": {"unit": "kph", "threshold": 40},
-        "dust_ug_m3": {"unit": "µg/m³", "threshold": 150},
-    }
-
-    for var in request.variables:
-        if var not in variable_details:
-            continue
-
-        # THIS IS ALSO CRITICAL - PASSING THE RIGHT ARGS
-        historical_data = get_nasa_data(
-            latitude=request.latitude,
-            longitude=request.longitude,
+async def analyze_weather_likelihood(request: AnalysisRequest):
+    with REQUEST_SECONDS.time(endpoint="analyze"):
+        return await _analyze(request)
+
+
+def _period(request) -> tuple:
+    try:
+        return climate_period(request.start_year, request.end_year)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _metadata(source, period: tuple) -> dict:
+    return {**AnalysisResponse.model_fields["metadata"].default, "data_source": source.description,
+            "climate_period": f"{period[0]}-{period[1]}"}
+
+
+async def _analyze(request: AnalysisRequest) -> AnalysisResponse:
+    requested = tuple(var for var in request.variables if var in VARIABLE_DETAILS)
+    cell = snap_to_grid(request.latitude, request.longitude)
+    period = _period(request)
+
+    cache = get_point_cache()
+    if cache is not None:
+        # Popular cells feed the prefetch hot list
+        await asyncio.to_thread(cache.log_query, cell.index, request.month, request.day)
+
+    # THIS IS ALSO CRITICAL - PASSING THE RIGHT ARGS
+    # One pass over the granules feeds every requested variable
+    with live_traffic.track():
+        historical_by_var = await fetch_historical(
+            cell,
             month=request.month,
             day=request.day,
-            variable=var
-        )
-        
-        if not historical_data:
-            continue
-
-        mean_val = np.mean(historical_data)
-        std_dev_val = np.std(historical_data)
-        threshold = variable_details[var]["threshold"]
-        likelihood_results = {}
-
-        if "precipitation" in var:
-            event_count = sum(1 for day_val in historical_data if day_val > threshold)
-            likelihood_results["probability_of_event"] = event_count / len(historical_data)
-        else:
-            prob = norm.sf(x=threshold, loc=mean_val, scale=std_dev_val if std_dev_val > 0 else 0.01)
-            likelihood_results["probability_exceeding"] = prob
-
-        result = VariableResult(
-            variable=var,
-            unit=variable_details[var]["unit"],
-            mean=round(mean_val, 2),
-            std_dev=round(std_dev_val, 2),
-            likelihood=ThresholdAnalysis(**likelihood_results),
-            raw_data_points=len(historical_data)
-        )
-        all_results.append(result)
+            variables=requested,
+            window_days=request.window_days,
+            period=period,
+        ) if requested else {}
+
+    # Every variable is summarized in one vectorized pass
+    with time_stage("statistics"):
+        summaries = summarize_many((var, historical_by_var.get(var, [])) for var in requested)
+    all_results = [VariableResult(**summary) for summary in summaries if summary is not None]
+
+    return AnalysisResponse(query=request, grid_cell=GridCellInfo(**cell._asdict()), results=all_results,
+                            metadata=_metadata(get_data_source(), period))
+
+
+async def _iterate_in_thread(iterator):
+    """
+    Consume a blocking iterator on a worker thread, yielding its items to the event
+    loop as they arrive. When the consumer stops early (e.g. the client hung up)
+    the iterator is closed after its current item.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def deliver(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()  # the loop is gone
+
+    def produce():
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                deliver(item)
+        except Exception as e:
+            deliver(e)
+        finally:
+            iterator.close()
+            deliver(finished)
+
+    threading.Thread(target=produce, name="analysis-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is finished:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _event(payload: dict) -> bytes:
+    return (json.dumps(payload) + "\n").encode()
+
+
+@app.post("/analyze/stream")
+async def analyze_weather_likelihood_stream(request: AnalysisRequest):
+    """
+    /analyze as newline-delimited JSON events, so a client can show progress and
+    provisional numbers long before a cold query has downloaded every year:
+
+        {"event": "start", "total": <dates to process>, "grid_cell": {...}, "variables": [...]}
+        {"event": "progress", "done": n, "total": N, "dates": [...], "values": {var: [...]},
+         "provisional": [<VariableResult over the values received so far>, ...]}
+        {"event": "result", <the /analyze response>}
 
-    return AnalysisResponse(query=request, results=all_results)
\ No newline at end of file
+    Like /analyze it goes through the climate records: only the years they lack
+    are downloaded (the dates of the others count as done from the first
+    progress event), and the result is the one /analyze gives.
+
+    A failure ends the stream with {"event": "error", "detail": "..."}.
+    """
+    return StreamingResponse(_analysis_events(request, _period(request)), media_type="application/x-ndjson")
+
+
+async def _analysis_events(request: AnalysisRequest, period: tuple):
+    started = time.perf_counter()
+    requested = tuple(var for var in request.variables if var in VARIABLE_DETAILS)
+    cell = snap_to_grid(request.latitude, request.longitude)
+    source = get_data_source()
+    total = len(climate_dates(request.month, request.day, request.window_days, period))
+    yield _event({"event": "start", "total": total, "grid_cell": GridCellInfo(**cell._asdict()).model_dump(),
+                  "variables": list(requested)})
+
+    cache = get_point_cache()
+    if cache is not None:
+        await asyncio.to_thread(cache.log_query, cell.index, request.month, request.day)
+
+    # Only the years the climate records lack are downloaded; the final statistics are those of /analyze
+    try:
+        stream = await asyncio.to_thread(PeriodStream, source, cell, request.month, request.day, requested, None,
+                                         request.window_days, period)
+        done = stream.done
+        with live_traffic.track():
+            async for dates, values in _iterate_in_thread(iter(stream)):
+                done += len(dates)
+                with time_stage("statistics"):
+                    so_far = stream.so_far()
+                    provisional = summarize_many((var, so_far[var]) for var in requested)
+                yield _event({
+                    "event": "progress",
+                    "done": min(done, total),
+                    "total": total,
+                    "dates": [date.isoformat() for date in dates],
+                    "values": values,
+                    "provisional": [summary for summary in provisional if summary is not None],
+                })
+    except Exception as e:
+        print(f"  - Streaming analysis failed: {e}")
+        yield _event({"event": "error", "detail": str(e)})
+        return
+
+    historical_by_var = stream.result()
+    with time_stage("statistics"):
+        summaries = summarize_many((var, historical_by_var[var]) for var in requested)
+    response = AnalysisResponse(
+        query=request,
+        grid_cell=GridCellInfo(**cell._asdict()),
+        results=[VariableResult(**summary) for summary in summaries if summary is not None],
+        metadata=_metadata(source, period),
+    )
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="analyze_stream")
+    yield _event({"event": "result", **response.model_dump(mode="json")})
+
+
+@app.post("/analyze/area", response_model=AreaAnalysisResponse)
+async def analyze_area(request: AreaAnalysisRequest):
+    """
+    Likelihood statistics of area-weighted values over a polygon or bbox. Each
+    year's value is the mean over the MERRA-2 cells the area covers, weighted by
+    how much of each cell lies inside it.
+    """
+    with REQUEST_SECONDS.time(endpoint="analyze_area"):
+        try:
+            # Built once per distinct shape; repeats are a cache hit
+            mask = await asyncio.to_thread(aoi_mask, parse_aoi(request.polygon, request.bbox))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        requested = tuple(var for var in request.variables if var in VARIABLE_DETAILS)
+        source = get_data_source()
+        period = _period(request)
+
+        async def fetch(keys):
+            wanted = tuple(sorted(key[-1] for key in keys))
+            values = await asyncio.to_thread(source.area_series, mask, request.month, request.day, wanted,
+                                             None, request.window_days, period)
+            return {key: values.get(key[-1], []) for key in keys}
+
+        keys = [("aoi", mask.key, request.month, request.day, request.window_days, period, var)
+                for var in requested]
+        with live_traffic.track():
+            results = await inflight_fetches.run(keys, fetch) if requested else {}
+        historical_by_var = {key[-1]: value for key, value in results.items()}
+
+        with time_stage("statistics"):
+            summaries = summarize_many((var, historical_by_var.get(var, [])) for var in requested)
+
+        return AreaAnalysisResponse(
+            query=request,
+            area=AreaInfo(aoi_hash=mask.key, area_km2=round(mask.area_km2, 1), cells=len(mask.cells())),
+            results=[VariableResult(**summary) for summary in summaries if summary is not None],
+            metadata=_metadata(source, period),
+        )
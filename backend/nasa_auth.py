@@ -3,7 +3,10 @@
 import requests
 import netrc
 import os
+import threading
+from urllib.parse import urlparse
 from requests.adapters import HTTPAdapter
+from app.utils.metrics import REGISTRY
 try:
     from urllib3.util.retry import Retry
 except Exception:
@@ -99,12 +102,45 @@ class NasaAuth(requests.auth.AuthBase):
         r.hooks["response"] = [self.handle_redirect]
         return r
 
-def create_authenticated_session():
+URS_HOST = "urs.earthdata.nasa.gov"
+# Path of the URS login redirect; a response redirected through it cost an auth round trip
+URS_LOGIN_PATH = "/oauth/authorize"
+
+
+def _retry_policy():
+    """Retry/backoff for transient timeouts and 5xx/429 errors from GES DISC endpoints."""
+    if Retry is None:
+        return 0
+    return Retry(
+        total=5,
+        connect=5,
+        read=5,
+        status=5,
+        backoff_factor=1.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+    )
+
+
+def _mount_adapter(session, pool_maxsize: int):
+    adapter = HTTPAdapter(max_retries=_retry_policy(), pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
+
+
+def create_authenticated_session(pool_maxsize: int = 10):
     """
     Create a requests.Session configured with HTTP Basic Auth for URS.
     Using Basic Auth across redirects is the recommended and most reliable
     method for GES DISC/Earthdata programmatic access.
     Adds retry/backoff to reduce transient timeouts and 5xx/429 errors.
+    `pool_maxsize` should be at least the number of threads sharing the session,
+    otherwise urllib3 discards the surplus connections instead of reusing them.
+
+    Every call resolves credentials and opens new connections; long-running code
+    should share the process-wide session from get_session() instead.
     """
     session = requests.Session()
     # Resolve credentials (env/args/netrc)
@@ -115,24 +151,197 @@ def create_authenticated_session():
     session.max_redirects = 10
 
     # Robust retries for GES DISC endpoints
-    if Retry is not None:
-        retry = Retry(
-            total=5,
-            connect=5,
-            read=5,
-            status=5,
-            backoff_factor=1.5,
-            status_forcelist=(429, 500, 502, 503, 504),
-            allowed_methods=frozenset(["GET", "HEAD"]),
-            respect_retry_after_header=True,
-        )
-        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=10)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
+    _mount_adapter(session, pool_maxsize)
 
     # Set a descriptive User-Agent (helps with server-side diagnostics)
     session.headers.update({
         "User-Agent": "TerraClime Planner/1.0 (+https://spaceapps.nasa.gov/)"
     })
 
-    return session
\ No newline at end of file
+    return session
+
+
+class EarthdataSession(requests.Session):
+    """
+    A requests.Session that keeps its Basic credentials on redirects between a
+    data host and URS (requests drops them on any host change), and hands 401
+    responses to its SessionManager for one transparent refresh-and-retry.
+    """
+    def __init__(self, manager=None):
+        super().__init__()
+        self.manager = manager
+
+    def rebuild_auth(self, prepared_request, response):
+        if "Authorization" in prepared_request.headers:
+            original = urlparse(response.request.url).hostname
+            redirect = urlparse(prepared_request.url).hostname
+            if original != redirect and URS_HOST not in (original, redirect):
+                del prepared_request.headers["Authorization"]
+
+    def request(self, method, url, *args, **kwargs):
+        generation = self.manager.generation if self.manager else None
+        response = super().request(method, url, *args, **kwargs)
+        if response.status_code == 401 and self.manager is not None:
+            # Credentials were rotated or the URS session was revoked: re-resolve and retry once
+            response.close()
+            self.manager.refresh(generation)
+            response = super().request(method, url, *args, **kwargs)
+        if self.manager is not None:
+            self.manager.record(response)
+        return response
+
+
+class SessionManager:
+    """
+    Process-wide, thread-safe owner of one long-lived Earthdata session.
+
+    Credentials are resolved once and cached. URS cookies stay in the session's
+    jar, so later granule requests skip the login redirect until the cookies
+    expire. Keep-alive connections are reused across fetches, and the pool grows
+    to the largest concurrency asked for. A 401 clears the cookies and cached
+    credentials and retries once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+        self._pool_maxsize = 0
+        self._credentials = None
+        # Connection counts of adapters replaced by a larger pool
+        self._retired = {"connections": 0, "requests": 0}
+        self.generation = 0
+        self._metrics = {
+            "sessions_created": 0,
+            "credential_lookups": 0,
+            "credential_cache_hits": 0,
+            "requests": 0,
+            "auth_round_trips": 0,
+            "auth_refreshes": 0,
+        }
+
+    def _resolve_credentials(self):
+        if self._credentials is None:
+            self._credentials = NasaAuth().find_creds()
+            self._metrics["credential_lookups"] += 1
+        else:
+            self._metrics["credential_cache_hits"] += 1
+        return self._credentials
+
+    def get_session(self, pool_maxsize: int = 10) -> EarthdataSession:
+        """The shared session, with a connection pool of at least `pool_maxsize`."""
+        with self._lock:
+            if self._session is None:
+                session = EarthdataSession(self)
+                session.auth = requests.auth.HTTPBasicAuth(*self._resolve_credentials())
+                session.max_redirects = 10
+                session.headers.update({
+                    "User-Agent": "TerraClime Planner/1.0 (+https://spaceapps.nasa.gov/)"
+                })
+                self._session = session
+                self._metrics["sessions_created"] += 1
+            else:
+                self._metrics["credential_cache_hits"] += 1
+
+            if pool_maxsize > self._pool_maxsize:
+                # Requests already running keep their connections from the old adapter
+                if self._adapter is not None:
+                    counts = self._pool_counts(self._adapter)
+                    for key in self._retired:
+                        self._retired[key] += counts[key]
+                self._adapter = _mount_adapter(self._session, pool_maxsize)
+                self._pool_maxsize = pool_maxsize
+            return self._session
+
+    def refresh(self, generation=None):
+        """Drop URS cookies and cached credentials, then resolve them again.
+
+        Threads that saw the same 401 share one refresh: a caller passing the
+        generation it started with is a no-op if another thread already refreshed.
+        """
+        with self._lock:
+            if self._session is None or (generation is not None and generation != self.generation):
+                return
+            self._session.cookies.clear()
+            self._credentials = None
+            self._session.auth = requests.auth.HTTPBasicAuth(*self._resolve_credentials())
+            self.generation += 1
+            self._metrics["auth_refreshes"] += 1
+            print("  - Earthdata session refreshed after 401")
+
+    def record(self, response):
+        logged_in = any(
+            URS_LOGIN_PATH in (r.headers.get("Location") or "")
+            for r in response.history
+        )
+        with self._lock:
+            self._metrics["requests"] += 1
+            self._metrics["auth_round_trips"] += int(logged_in)
+
+    @staticmethod
+    def _pool_counts(adapter) -> dict:
+        counts = {"connections": 0, "requests": 0}
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                counts["connections"] += pool.num_connections
+                counts["requests"] += pool.num_requests
+        return counts
+
+    def stats(self) -> dict:
+        """Counters for connection reuse and avoided credential lookups and URS logins."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            pools = self._pool_counts(self._adapter) if self._adapter is not None else {"connections": 0, "requests": 0}
+            connections = self._retired["connections"] + pools["connections"]
+            http_requests = self._retired["requests"] + pools["requests"]
+        metrics.update({
+            "pool_maxsize": self._pool_maxsize,
+            "connections_opened": connections,
+            "connections_reused": max(http_requests - connections, 0),
+            "auth_round_trips_avoided": metrics["requests"] - metrics["auth_round_trips"],
+        })
+        return metrics
+
+    def close(self):
+        """Close the shared session; the next get_session() starts a new one."""
+        with self._lock:
+            if self._adapter is not None:
+                counts = self._pool_counts(self._adapter)
+                for key in self._retired:
+                    self._retired[key] += counts[key]
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+            self._pool_maxsize = 0
+            self._credentials = None
+
+
+_session_manager = SessionManager()
+
+
+def get_session(pool_maxsize: int = 10) -> EarthdataSession:
+    """The process-wide pooled Earthdata session (see SessionManager)."""
+    return _session_manager.get_session(pool_maxsize)
+
+
+def session_stats() -> dict:
+    return _session_manager.stats()
+
+
+@REGISTRY.collector
+def _session_metrics():
+    stats = session_stats()
+    counters = {
+        "requests": "Requests made through the shared Earthdata session.",
+        "auth_round_trips": "Requests that went through the URS login redirect.",
+        "auth_round_trips_avoided": "Requests served with cached URS cookies, without a login.",
+        "auth_refreshes": "Credential refreshes after a 401.",
+        "credential_lookups": "Times credentials were resolved from env/netrc.",
+        "connections_opened": "HTTP connections opened by the shared session.",
+        "connections_reused": "HTTP requests sent over an already open connection.",
+    }
+    for key, documentation in counters.items():
+        yield f"terraclime_earthdata_{key}_total", "counter", documentation, [({}, stats[key])]
@@ -0,0 +1,95 @@
+import pytest
+
+import nasa_auth
+import nasa_data_fetcher
+from app import config
+from app.services import catalog, pipeline
+from app.storage import store
+from fake_gesdisc import FakeGesDisc, granule_bytes, granule_dataset
+
+
+@pytest.fixture(autouse=True)
+def no_point_cache(monkeypatch, tmp_path):
+    """Keep tests off the real on-disk caches; use the point_cache/granule_catalog fixtures to opt in."""
+    monkeypatch.setattr(store, "POINT_CACHE_PATH", "")
+    monkeypatch.setattr(store, "_point_cache", None)
+    monkeypatch.setattr(store, "SERIES_STORE_DIR", "")
+    monkeypatch.setattr(store, "_series_store", None)
+    monkeypatch.setattr(store, "CLIMATOLOGY_CUBE_DIR", "")
+    monkeypatch.setattr(store, "CLIMATE_RECORD_PATH", "")
+    monkeypatch.setattr(store, "_record_store", None)
+    monkeypatch.setattr(catalog, "GRANULE_CATALOG_PATH", "")
+    monkeypatch.setattr(catalog, "_catalog", None)
+    # Jobs run on threads in the test process, recorded in a throwaway store
+    monkeypatch.setattr(store, "JOB_STORE_PATH", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(config, "JOB_PROCESSES", 0)
+    yield
+    pipeline.shutdown_job_queue()
+
+
+@pytest.fixture
+def point_cache(tmp_path, monkeypatch):
+    """Enable the persistent point cache in a throwaway directory."""
+    monkeypatch.setattr(store, "POINT_CACHE_PATH", str(tmp_path / "points.sqlite"))
+    return store.get_point_cache()
+
+
+def _serve(monkeypatch, server):
+    monkeypatch.setenv("EARTHDATA_USERNAME", "tester")
+    monkeypatch.setenv("EARTHDATA_PASSWORD", "secret")
+    # A fresh process-wide session per test: no cookies or cached credentials carried over
+    monkeypatch.setattr(nasa_auth, "_session_manager", nasa_auth.SessionManager())
+    monkeypatch.setattr(nasa_data_fetcher, "OPENDAP_BASE_URL", server.base_url)
+    monkeypatch.setattr(nasa_data_fetcher, "CLIMATE_START_YEAR", 2001)
+    monkeypatch.setattr(nasa_data_fetcher, "CLIMATE_END_YEAR", 2008)
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    yield server
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    nasa_auth._session_manager.close()
+    server.stop()
+
+
+@pytest.fixture
+def series_store(tmp_path, monkeypatch):
+    """Enable the columnar series store in a throwaway directory."""
+    monkeypatch.setattr(store, "SERIES_STORE_DIR", str(tmp_path / "series"))
+    return store.get_series_store()
+
+
+@pytest.fixture
+def climate_records(tmp_path, monkeypatch):
+    """Enable the climate record store in a throwaway file."""
+    monkeypatch.setattr(store, "CLIMATE_RECORD_PATH", str(tmp_path / "records.sqlite"))
+    return store.get_climate_record_store()
+
+
+@pytest.fixture
+def granule_catalog(tmp_path, monkeypatch):
+    """Enable the granule catalog in a throwaway file."""
+    monkeypatch.setattr(catalog, "GRANULE_CATALOG_PATH", str(tmp_path / "granule_catalog.json"))
+    return catalog.get_granule_catalog()
+
+
+@pytest.fixture
+def fake_archive(monkeypatch):
+    """Point the fetcher at a local FakeGesDisc server over a short climate period."""
+    yield from _serve(monkeypatch, FakeGesDisc().start())
+
+
+@pytest.fixture
+def urs_archive(monkeypatch):
+    """Like fake_archive, behind an emulated Earthdata login."""
+    yield from _serve(monkeypatch, FakeGesDisc(urs=True).start())
+
+
+@pytest.fixture
+def granule_mirror(tmp_path):
+    """A local mirror (YYYY/MM/<granule>) of synthetic granules for July 14-16, 2001-2003."""
+    mirror = tmp_path / "mirror"
+    for year in range(2001, 2004):
+        for day in (14, 15, 16):
+            name = nasa_data_fetcher.granule_url(year, 7, day).rsplit("/", 1)[-1]
+            path = mirror / f"{year}" / "07" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(granule_bytes(granule_dataset(year, 7, day)))
+    return mirror
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import httpx
+
+import main
+from app.utils.singleflight import SingleFlight
+
+QUERY = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15, "variables": ["max_temp_c"]}
+
+
+async def post_all(queries):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(http.post("/analyze", json=q, timeout=60) for q in queries))
+
+
+def test_identical_concurrent_queries_share_one_fetch(fake_archive):
+    fake_archive.latency = 0.2
+    # A nearby point in the same grid cell is the same canonical query
+    nearby = dict(QUERY, latitude=37.60, longitude=-119.50)
+
+    responses = asyncio.run(post_all([QUERY] * 4 + [nearby]))
+
+    assert all(r.status_code == 200 for r in responses)
+    bodies = [r.json()["results"] for r in responses]
+    assert all(body == bodies[0] for body in bodies)
+    assert bodies[0][0]["raw_data_points"] == 8
+    # One granule request per year, not one per query
+    assert fake_archive.requests == 8
+
+
+def test_overlapping_keys_join_the_inflight_fetch():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(keys):
+        calls.append(sorted(keys))
+        await asyncio.sleep(0.05)
+        return {key: key.upper() for key in keys}
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.run(["a", "b"], fetch),
+            flight.run(["b", "c"], fetch),
+        )
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {"a": "A", "b": "B"}
+    assert second == {"b": "B", "c": "C"}
+    assert calls == [["a", "b"], ["c"]]
+    assert flight.coalesced == 1
+    assert flight.in_flight() == 0
+
+
+def test_failed_fetch_is_not_cached():
+    flight = SingleFlight()
+    attempts = []
+
+    async def fetch(keys):
+        attempts.append(keys)
+        if len(attempts) == 1:
+            raise RuntimeError("archive unavailable")
+        return {key: 1.0 for key in keys}
+
+    async def scenario():
+        try:
+            await flight.run(["a"], fetch)
+        except RuntimeError:
+            pass
+        return await flight.run(["a"], fetch)
+
+    assert asyncio.run(scenario()) == {"a": 1.0}
+    assert len(attempts) == 2
+
+
+def test_batch_endpoint_returns_columns_per_point_date_and_variable(fake_archive):
+    batch = {
+        "points": [
+            {"latitude": 37.74, "longitude": -119.59},
+            {"latitude": 37.60, "longitude": -119.50},
+            {"latitude": 36.0, "longitude": -118.0},
+        ],
+        "dates": [{"month": 7, "day": 15}],
+        "variables": ["max_temp_c", "precipitation_mm", "not_a_variable"],
+    }
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/analyze/batch", json=batch, timeout=60)
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    body = response.json()
+    results = body["results"]
+    assert results["point"] == [0, 0, 1, 1, 2, 2]
+    assert results["variable"] == ["max_temp_c", "precipitation_mm"] * 3
+    assert results["raw_data_points"] == [8] * 6
+    assert results["probability_exceeding"][1] is None
+    # Points 0 and 1 share a grid cell, so they share their values
+    assert results["mean"][0:2] == results["mean"][2:4]
+    assert body["points"]["cell_latitude"][:2] == [37.5, 37.5]
+    assert body["units"] == {"max_temp_c": "°C", "precipitation_mm": "mm"}
+    assert fake_archive.requests == 8
+
+    single = asyncio.run(post_all([QUERY]))[0].json()["results"][0]
+    assert single["mean"] == results["mean"][0]
+    assert single["likelihood"]["probability_exceeding"] == results["probability_exceeding"][0]
+
+
+def test_stream_reports_progress_and_matches_analyze(fake_archive):
+    query = dict(QUERY, variables=["max_temp_c", "precipitation_mm"])
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            streamed = await http.post("/analyze/stream", json=query, timeout=60)
+            plain = await http.post("/analyze", json=query, timeout=60)
+        return streamed, plain
+
+    streamed, plain = asyncio.run(scenario())
+
+    events = [json.loads(line) for line in streamed.text.splitlines()]
+    assert events[0]["event"] == "start" and events[0]["total"] == 8
+    progress = [event for event in events if event["event"] == "progress"]
+    assert [event["done"] for event in progress] == list(range(1, 9))
+    assert progress[0]["provisional"][0]["raw_data_points"] == 1
+    assert events[-1]["event"] == "result"
+    assert events[-1]["results"] == plain.json()["results"]
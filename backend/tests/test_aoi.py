@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+import main
+import nasa_data_fetcher
+from app import config
+from app.services.aoi import aoi_mask, geometry_key, parse_aoi
+from app.services.datasets import cell_from_index
+
+# Exactly the cell (255, 97): lat 37.5 ± 0.25, lon -119.375 ± 0.3125
+ONE_CELL = [-119.6875, 37.25, -119.0625, 37.75]
+# The eastern half of (255, 97) and the western half of (255, 98)
+TWO_HALVES = [-119.375, 37.25, -118.75, 37.75]
+
+
+def test_mask_weights_follow_the_overlap():
+    single = aoi_mask(parse_aoi(bbox=ONE_CELL))
+    assert [(cell.index, weight) for cell, weight in single.cells()] == [((255, 97), pytest.approx(1.0))]
+
+    halves = aoi_mask(parse_aoi(bbox=TWO_HALVES))
+    assert [(cell.index, weight) for cell, weight in halves.cells()] == [
+        ((255, 97), pytest.approx(0.5)), ((255, 98), pytest.approx(0.5)),
+    ]
+    assert halves.area_km2 == pytest.approx(0.5 * 0.625 * 111.2 ** 2 * np.cos(np.radians(37.5)), rel=0.02)
+
+
+def test_masks_are_cached_per_shape():
+    west, south, east, north = TWO_HALVES
+    ring = [[east, south], [east, north], [west, north], [west, south]]
+
+    assert geometry_key(parse_aoi(polygon=ring)) == geometry_key(parse_aoi(bbox=TWO_HALVES))
+    assert aoi_mask(parse_aoi(polygon=ring)) is aoi_mask(parse_aoi(bbox=TWO_HALVES))
+
+    with pytest.raises(ValueError):
+        parse_aoi(bbox=[-119.0, 37.0, -120.0, 38.0])
+    with pytest.raises(ValueError):
+        aoi_mask(parse_aoi(bbox=[-170.0, -60.0, 170.0, 60.0]))
+
+
+def test_area_values_are_weighted_cell_values(fake_archive):
+    mask = aoi_mask(parse_aoi(bbox=TWO_HALVES))
+    variables = ("max_temp_c", "precipitation_mm")
+
+    area = nasa_data_fetcher.get_area_data(mask, 7, 15, variables, 4)
+    # One box subset per year covers both cells
+    assert fake_archive.subset_requests == 8
+
+    west = nasa_data_fetcher.get_cell_data_multi(cell_from_index(255, 97), 7, 15, variables, 4)
+    east = nasa_data_fetcher.get_cell_data_multi(cell_from_index(255, 98), 7, 15, variables, 4)
+    for var in variables:
+        expected = 0.5 * np.array(west[var]) + 0.5 * np.array(east[var])
+        assert area[var] == pytest.approx(expected.tolist())
+        # Cached results are shared, so they cannot be changed in place
+        assert not area[var].flags.writeable
+
+    sub_period = nasa_data_fetcher.get_area_data(mask, 7, 15, variables, 4, 0, (2003, 2005))
+    assert sub_period["max_temp_c"].tolist() == area["max_temp_c"][2:5].tolist()
+    assert fake_archive.subset_requests == 8 + 2 * 8 + 3
+
+
+def test_area_endpoint(monkeypatch):
+    monkeypatch.setattr(config, "DATA_SOURCE", "simulator")
+
+    async def post(body):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/analyze/area", json=body)
+
+    body = {"bbox": TWO_HALVES, "month": 7, "day": 15, "variables": ["max_temp_c", "dust_ug_m3"]}
+    response = asyncio.run(post(body))
+
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["area"]["cells"] == 2
+    assert [r["variable"] for r in payload["results"]] == ["max_temp_c", "dust_ug_m3"]
+    assert payload["results"][0]["raw_data_points"] == 30
+
+    assert asyncio.run(post(dict(body, bbox=None))).status_code == 422
@@ -0,0 +1,67 @@
+import numpy as np
+
+import nasa_auth
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+
+CELL = snap_to_grid(37.74, -119.59)
+
+
+def fetch(day, workers=4):
+    return nasa_data_fetcher.get_cell_data_multi(CELL, 7, day, ("max_temp_c",), workers)["max_temp_c"]
+
+
+def test_shared_session_reuses_urs_cookies_and_connections(urs_archive):
+    assert len(fetch(15, workers=1)) == 8
+    assert urs_archive.logins == 1
+
+    assert len(fetch(16)) == 8
+    assert len(fetch(17)) == 8
+    # Later queries ride on the first login's cookie
+    assert urs_archive.logins == 1
+
+    stats = nasa_auth.session_stats()
+    assert stats["sessions_created"] == 1
+    assert stats["credential_lookups"] == 1
+    assert stats["requests"] == 24
+    assert stats["auth_round_trips"] == 1
+    assert stats["auth_round_trips_avoided"] == 23
+    assert stats["pool_maxsize"] == 4
+    assert stats["connections_reused"] > stats["connections_opened"]
+
+
+def test_expired_urs_session_logs_in_again_transparently(urs_archive):
+    first = fetch(15)
+    urs_archive.expire_sessions()
+
+    assert len(fetch(16, workers=1)) == 8
+    assert urs_archive.logins >= 2
+    assert np.all(np.isfinite(first))
+
+
+def test_401_refreshes_rotated_credentials_once(urs_archive, monkeypatch):
+    monkeypatch.setenv("EARTHDATA_PASSWORD", "old-password")
+    nasa_auth.get_session()
+    # The password is rotated while the process holds the old one
+    monkeypatch.setenv("EARTHDATA_PASSWORD", "secret")
+
+    assert len(fetch(15, workers=1)) == 8
+
+    stats = nasa_auth.session_stats()
+    assert stats["auth_refreshes"] == 1
+    assert stats["credential_lookups"] == 2
+
+
+def test_pool_grows_to_the_largest_concurrency(monkeypatch):
+    monkeypatch.setenv("EARTHDATA_USERNAME", "tester")
+    monkeypatch.setenv("EARTHDATA_PASSWORD", "secret")
+    manager = nasa_auth.SessionManager()
+
+    session = manager.get_session(2)
+    assert manager.get_session(8) is session
+    assert manager.get_session(4) is session
+
+    stats = manager.stats()
+    assert stats["pool_maxsize"] == 8
+    assert stats["credential_lookups"] == 1
+    assert stats["credential_cache_hits"] == 2
@@ -0,0 +1,84 @@
+import datetime
+import os
+
+import nasa_data_fetcher
+from app.services.catalog import GranuleCatalog
+from app.services.datasets import snap_to_grid
+from app.utils.provenance import granule_reference
+
+COLLECTION = "M2T1NXSLV.5.12.4"
+MANIFEST = os.path.join(os.path.dirname(__file__), "fixtures", "cmr_granules_M2T1NXSLV.json")
+CELL = snap_to_grid(37.74, -119.59)
+
+
+def read_manifest():
+    with open(MANIFEST) as f:
+        return f.read()
+
+
+def max_temps(day=15):
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    return nasa_data_fetcher.get_cell_data_multi(CELL, 7, day, ("max_temp_c",), 4)["max_temp_c"]
+
+
+def test_manifest_maps_dates_to_exact_files_and_persists(granule_catalog):
+    assert granule_catalog.ingest_manifest(read_manifest()) == 25
+
+    assert granule_catalog.lookup(COLLECTION, datetime.date(2001, 7, 14)) == "MERRA2_300.tavg1_2d_slv_Nx.20010714.nc4"
+    # The reprocessed granule supersedes the original stream
+    assert granule_catalog.lookup(COLLECTION, datetime.date(2003, 7, 15)) == "MERRA2_401.tavg1_2d_slv_Nx.20030715.nc4"
+    assert granule_catalog.lookup(COLLECTION, datetime.date(2003, 7, 17)) is None
+
+    reloaded = GranuleCatalog(granule_catalog.path)
+    assert reloaded.lookup(COLLECTION, datetime.date(2003, 7, 15)) == "MERRA2_401.tavg1_2d_slv_Nx.20030715.nc4"
+
+
+def test_plain_url_list_manifest(tmp_path):
+    catalog = GranuleCatalog(tmp_path / "catalog.json")
+    text = (
+        "# GES DISC subset list\n"
+        "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2/M2T1NXSLV.5.12.4/2020/09/MERRA2_401.tavg1_2d_slv_Nx.20200901.nc4\n"
+        "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2/M2T1NXSLV.5.12.4/2020/09/MERRA2_400.tavg1_2d_slv_Nx.20200902.nc4.xml\n"
+    )
+
+    assert catalog.ingest_manifest(text) == 1
+    assert catalog.lookup(COLLECTION, datetime.date(2020, 9, 1)) == "MERRA2_401.tavg1_2d_slv_Nx.20200901.nc4"
+
+
+def test_reprocessed_granule_is_lost_without_the_catalog(fake_archive):
+    fake_archive.streams = {(2003, 7, 15): "401"}
+
+    assert len(max_temps()) == 7
+
+
+def test_catalog_resolves_reprocessed_granule_without_probing(fake_archive, granule_catalog):
+    fake_archive.streams = {(2003, 7, 15): "401"}
+    granule_catalog.ingest_manifest(read_manifest())
+
+    assert len(max_temps()) == 8
+    # One request per year, no listings and no failed guesses
+    assert fake_archive.requests == 8
+    assert fake_archive.listing_requests == 0
+
+
+def test_unknown_months_are_listed_once(fake_archive, granule_catalog):
+    fake_archive.streams = {(2003, 7, 15): "401"}
+    fake_archive.missing_years = {2005}
+
+    assert len(max_temps(15)) == 7
+    assert fake_archive.listing_requests == 8
+    # The missing year is known from its listing, so it is never requested
+    assert fake_archive.requests == 7
+
+    assert len(max_temps(16)) == 7
+    assert fake_archive.listing_requests == 8
+    assert fake_archive.requests == 14
+
+
+def test_provenance_names_the_granules_the_fetcher_resolves(fake_archive, granule_catalog):
+    granule_catalog.ingest_manifest(read_manifest())
+
+    for day in (15, 16):
+        date = datetime.date(2003, 7, day)
+        assert granule_reference("opendap", date) == nasa_data_fetcher.resolve_granule_url(2003, 7, day)
+    assert granule_reference("opendap", datetime.date(2003, 7, 15)).endswith("MERRA2_401.tavg1_2d_slv_Nx.20030715.nc4")
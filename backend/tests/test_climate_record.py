@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import main
+import nasa_data_fetcher
+from app.services.climate_record import update_records
+from app.services.datasets import snap_to_grid
+from app.services.stats import summarize_many
+
+QUERY = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15,
+         "variables": ["max_temp_c", "precipitation_mm"], "window_days": 1}
+
+
+def analyze(path="/analyze", **overrides):
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post(path, json={**QUERY, **overrides}, timeout=60)
+
+    return asyncio.run(post())
+
+
+def job_status(job_id):
+    async def get():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get(f"/jobs/{job_id}")
+
+    return asyncio.run(get()).json()
+
+
+def test_only_missing_years_are_fetched_and_sub_periods_need_no_download(fake_archive, climate_records):
+    first = analyze(start_year=2001, end_year=2004)
+    assert first.json()["metadata"]["climate_period"] == "2001-2004"
+    assert fake_archive.subset_requests == 4 * 3
+
+    # Widening the period downloads the four new years only
+    widened = analyze(start_year=2001, end_year=2008)
+    assert fake_archive.subset_requests == 8 * 3
+    assert widened.json()["results"][0]["raw_data_points"] == 8 * 3
+
+    # Any sub-period comes from the stored records
+    sub_period = analyze(start_year=2003, end_year=2006)
+    assert fake_archive.subset_requests == 8 * 3
+
+    # ... and matches statistics computed from the daily values
+    cell = snap_to_grid(QUERY["latitude"], QUERY["longitude"])
+    direct = nasa_data_fetcher.get_cell_data_multi(cell, 7, 15, ("max_temp_c", "precipitation_mm"), None, 1,
+                                                   (2003, 2006))
+    expected = summarize_many(direct.items())
+    for got, want in zip(sub_period.json()["results"], expected):
+        assert (got["variable"], got["percentiles"], got["raw_data_points"]) == \
+            (want["variable"], want["percentiles"], want["raw_data_points"])
+        assert got["mean"] == pytest.approx(want["mean"], abs=0.01)
+        assert got["std_dev"] == pytest.approx(want["std_dev"], abs=0.01)
+
+
+def test_repeat_query_makes_no_fetcher_call(fake_archive, climate_records, granule_catalog, monkeypatch):
+    fake_archive.missing_years = {2005}
+    first = analyze(start_year=2001, end_year=2008)
+    assert first.json()["results"][0]["raw_data_points"] == 7 * 3
+    assert fake_archive.subset_requests == 7 * 3
+
+    # The records cover every year, and the catalog knows 2005 has no granule
+    def no_fetch(*args, **kwargs):
+        raise AssertionError("the fetcher was called")
+
+    monkeypatch.setattr(nasa_data_fetcher, "iter_cell_data", no_fetch)
+    repeat = analyze(start_year=2001, end_year=2008)
+
+    assert repeat.status_code == 200
+    assert repeat.json()["results"] == first.json()["results"]
+    assert fake_archive.requests + fake_archive.listing_requests == 7 * 3 + 8
+
+
+def test_stream_and_jobs_read_and_extend_the_same_records(fake_archive, climate_records):
+    analyze(start_year=2001, end_year=2004)
+    assert fake_archive.subset_requests == 4 * 3
+
+    # The stream downloads only the years the records lack, and ends with /analyze's result
+    streamed = analyze("/analyze/stream", start_year=2001, end_year=2006)
+    events = [json.loads(line) for line in streamed.text.splitlines()]
+    assert fake_archive.subset_requests == 6 * 3
+    progress = [event for event in events if event["event"] == "progress"]
+    assert len(progress) == 2 * 3 and progress[-1]["done"] == progress[-1]["total"] == 6 * 3
+    assert progress[-1]["provisional"][0]["raw_data_points"] == 6 * 3
+    result = {key: value for key, value in events[-1].items() if key != "event"}
+    assert result == analyze(start_year=2001, end_year=2006).json()
+
+    # So does an analyze job
+    job = analyze("/jobs/analyze", start_year=2001, end_year=2008).json()
+    while job["status"] not in ("done", "failed"):
+        time.sleep(0.05)
+        job = job_status(job["id"])
+    assert fake_archive.subset_requests == 8 * 3
+    assert job["result"] == analyze(start_year=2001, end_year=2008).json()
+
+
+def test_update_records_appends_new_years(fake_archive, climate_records):
+    analyze(start_year=2001, end_year=2005, window_days=0)
+    assert fake_archive.subset_requests == 5
+
+    totals = update_records(end_year=2008)
+
+    assert totals == {"records": 2, "years": 3}
+    assert fake_archive.subset_requests == 8
+    cell = snap_to_grid(QUERY["latitude"], QUERY["longitude"])
+    record = climate_records.get_many(cell.index, 7, 15, 0, ["max_temp_c"])["max_temp_c"]
+    assert record.years.tolist() == list(range(2001, 2009))
+    assert update_records(end_year=2008)["years"] == 0
+
+
+def test_periods_outside_merra2_are_rejected():
+    assert analyze(start_year=1979).status_code == 422
+    assert analyze(start_year=2001, end_year=2100).status_code == 422
+    assert analyze(start_year=2010, end_year=2005).status_code == 422
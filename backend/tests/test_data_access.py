@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+import xarray as xr
+
+import data_simulator
+import main
+import nasa_data_fetcher
+from app import config
+from app.services.data_access import NetCDFMirrorSource, SimulatorSource, get_data_source
+from app.services.datasets import snap_to_grid
+from fake_gesdisc import granule_dataset
+
+CELL = snap_to_grid(37.74, -119.59)
+VARIABLES = ("max_temp_c", "precipitation_mm", "wind_speed_kph")
+
+
+def test_simulator_is_seeded_and_batch_matches_single_queries():
+    source = SimulatorSource(seed=7)
+    cells = [CELL, snap_to_grid(36.0, -118.0)]
+    days = [(7, 15), (2, 29)]
+
+    batch = source.batch_series(cells, days, VARIABLES)
+
+    for cell in cells:
+        for month, day in days:
+            single = source.cell_series(cell, month, day, VARIABLES)
+            assert batch[(cell.index, month, day)] == single
+    assert len(batch[(CELL.index, 7, 15)]["max_temp_c"]) == 30
+    # Feb 29 only exists in leap years
+    assert len(batch[(CELL.index, 2, 29)]["max_temp_c"]) == 8
+    assert min(batch[(CELL.index, 7, 15)]["precipitation_mm"]) >= 0
+    assert SimulatorSource(seed=7).cell_series(CELL, 7, 15, VARIABLES) == batch[(CELL.index, 7, 15)]
+    assert SimulatorSource(seed=8).cell_series(CELL, 7, 15, VARIABLES) != batch[(CELL.index, 7, 15)]
+
+
+def test_simulated_values_follow_the_configured_distribution():
+    keys = np.stack(np.meshgrid(np.arange(200), np.arange(100), [2001], [7], [15], indexing="ij"), axis=-1)
+    values = data_simulator.simulate(keys.reshape(-1, 5), ["max_temp_c", "unknown"])
+
+    mean, std = data_simulator.SIMULATION_PARAMS["max_temp_c"]
+    assert abs(values[:, 0].mean() - mean) < 0.1
+    assert abs(values[:, 0].std() - std) < 0.1
+    assert np.isnan(values[:, 1]).all()
+
+
+def test_netcdf_mirror_matches_the_live_fetch(fake_archive, tmp_path):
+    days = [granule_dataset(year, 7, 15) for year in range(2001, 2009)]
+    path = tmp_path / "mirror.nc4"
+    xr.concat(days, dim="time").to_netcdf(path)
+
+    mirrored = NetCDFMirrorSource(str(path)).cell_series(CELL, 7, 15, VARIABLES)
+    live = nasa_data_fetcher.get_cell_data_multi(CELL, 7, 15, VARIABLES, 4)
+
+    for var in VARIABLES:
+        assert mirrored[var] == pytest.approx(live[var])
+    # Outside the mirrored window there is no data rather than a far-away cell
+    assert NetCDFMirrorSource(str(path)).cell_series(snap_to_grid(0, 0), 7, 15, VARIABLES)["max_temp_c"] == []
+
+
+def test_analyze_uses_the_configured_source(monkeypatch):
+    monkeypatch.setattr(config, "DATA_SOURCE", "simulator")
+    query = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15, "variables": ["max_temp_c"]}
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/analyze", json=query)
+
+    response = asyncio.run(post())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["metadata"]["data_source"] == get_data_source().description
+    assert body["results"][0]["raw_data_points"] == 30
@@ -0,0 +1,27 @@
+import numpy as np
+import xarray as xr
+
+from app.services.datasets import MERRA2_NLON, snap_to_grid
+
+
+def test_nearby_points_snap_to_the_same_cell():
+    a = snap_to_grid(37.74, -119.59)
+    b = snap_to_grid(37.60, -119.50)
+
+    assert a == b
+    assert (a.latitude, a.longitude) == (37.5, -119.375)
+    assert a.index == (255, 97)
+
+
+def test_snapping_clamps_poles_and_wraps_dateline():
+    assert snap_to_grid(90.0, 0.0).lat_index == 360
+    assert snap_to_grid(-91.0, 0.0).lat_index == 0
+    east = snap_to_grid(0.0, 179.9)
+    assert (east.lon_index, east.longitude) == (0, -180.0)
+    assert snap_to_grid(0.0, 179.6).lon_index == MERRA2_NLON - 1
+
+
+def test_halfway_points_match_nearest_selection():
+    lat = xr.DataArray(np.arange(0, 361), coords={"lat": np.linspace(-90.0, 90.0, 361)}, dims="lat")
+    for value in (37.75, -12.25, 0.25):
+        assert snap_to_grid(value, 0.0).lat_index == int(lat.sel(lat=value, method="nearest"))
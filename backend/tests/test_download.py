@@ -0,0 +1,79 @@
+import asyncio
+import csv
+
+import httpx
+import netCDF4
+import numpy as np
+import pytest
+
+import main
+import nasa_data_fetcher
+from app import config
+from app.services.data_access import get_data_source
+from app.services.datasets import snap_to_grid
+from app.utils.provenance import DATASET_DOI, NON_ENDORSEMENT_NOTICE
+
+POINTS = {"latitude": [37.74, 36.0], "longitude": [-119.59, -118.0]}
+VARIABLES = ["max_temp_c", "precipitation_mm"]
+
+
+def download(**params):
+    async def get():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get("/api/download", params=params)
+
+    return asyncio.run(get())
+
+
+def test_csv_export_has_provenance_and_every_date(monkeypatch):
+    monkeypatch.setattr(config, "DATA_SOURCE", "simulator")
+
+    response = download(**POINTS, month=[7, 2], day=[15, 29], variables=VARIABLES + ["unknown"])
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    text = response.text
+    comments = [line for line in text.splitlines() if line.startswith("#")]
+    assert f"# notice: {NON_ENDORSEMENT_NOTICE}" in comments
+    assert f"# dataset_doi: {DATASET_DOI}" in comments
+    rows = list(csv.DictReader(line for line in text.splitlines() if not line.startswith("#")))
+    # 30 years of July 15 and 8 leap years of Feb 29, for each point
+    assert len(rows) == 2 * (30 + 8)
+
+    cell = snap_to_grid(36.0, -118.0)
+    expected = get_data_source().cell_series(cell, 7, 15, VARIABLES)
+    mine = [row for row in rows if row["point"] == "1" and row["month"] == "7"]
+    assert [row["date"][:4] for row in mine] == [str(year) for year in range(1991, 2021)]
+    assert float(mine[0]["cell_latitude"]) == cell.latitude
+    for var in VARIABLES:
+        assert [float(row[var]) for row in mine] == pytest.approx(expected[var], abs=1e-4)
+
+
+def test_netcdf_export_matches_the_fetched_series(fake_archive):
+    response = download(**POINTS, month=[7], day=[15], variables=VARIABLES, format="netcdf")
+
+    assert response.status_code == 200
+    with netCDF4.Dataset("export.nc", memory=response.content) as ds:
+        assert ds.notice == NON_ENDORSEMENT_NOTICE
+        assert DATASET_DOI in ds.citation
+        assert ds.dimensions["record"].size == 2 * 8
+        points = ds["point_index"][:]
+        for n, (lat, lon) in enumerate(zip(POINTS["latitude"], POINTS["longitude"])):
+            cell = snap_to_grid(lat, lon)
+            assert ds["cell_longitude"][n] == cell.longitude
+            expected = nasa_data_fetcher.get_cell_data_multi(cell, 7, 15, tuple(VARIABLES))
+            for var in VARIABLES:
+                values = ds[var][:][points == n]
+                assert values.compressed() == pytest.approx(np.asarray(expected[var]), rel=1e-6)
+        dates = netCDF4.num2date(ds["time"][:], ds["time"].units)
+        granules = netCDF4.chartostring(ds["granule"][:])
+        assert granules[0] == nasa_data_fetcher.granule_url(dates[0].year, 7, 15)
+
+
+def test_download_rejects_mismatched_parameters(monkeypatch):
+    monkeypatch.setattr(config, "DATA_SOURCE", "simulator")
+
+    assert download(latitude=[1.0, 2.0], longitude=[1.0], month=[7], day=[15], variables=VARIABLES).status_code == 422
+    assert download(**POINTS, month=[7], day=[15], variables=["unknown"]).status_code == 422
+    assert download(**POINTS, month=[7], day=[15], variables=VARIABLES, format="xlsx").status_code == 422
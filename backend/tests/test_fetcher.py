@@ -0,0 +1,215 @@
+import time
+
+import numpy as np
+import requests
+
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+from app.utils.metrics import STAGE_SECONDS
+from fake_gesdisc import granule_bytes, granule_dataset
+
+LAT, LON = 37.74, -119.59
+
+
+def expected_max_temp(year, month=7, day=15):
+    ds = granule_dataset(year, month, day)
+    cell = ds["T2M"].sel(lat=LAT, lon=LON, method="nearest")
+    return float(cell.max()) - 273.15
+
+
+def test_concurrent_fetch_matches_sequential_in_year_order(fake_archive):
+    sequential = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=1)
+    concurrent = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=4)
+
+    expected = [expected_max_temp(year) for year in range(2001, 2009)]
+    assert np.allclose(sequential, expected, atol=1e-3)
+    assert concurrent == sequential
+
+
+def test_concurrent_fetch_skips_missing_years(fake_archive):
+    fake_archive.missing_years = {2003, 2006}
+
+    values = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=4)
+
+    years = [y for y in range(2001, 2009) if y not in (2003, 2006)]
+    assert np.allclose(values, [expected_max_temp(y) for y in years], atol=1e-3)
+
+
+def test_http_errors_without_a_response_skip_the_year(fake_archive, monkeypatch):
+    def refuse(*args):
+        raise requests.exceptions.HTTPError("connection dropped")
+
+    monkeypatch.setattr(nasa_data_fetcher, "_download_granule", refuse)
+
+    assert nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=1) == []
+
+
+def test_wall_clock_scales_with_worker_count(fake_archive):
+    # Warm the server-side granule cache so only the simulated latency is measured
+    nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=8)
+    fake_archive.latency = 0.25
+
+    timings = {}
+    for workers in (1, 4):
+        nasa_data_fetcher.get_cell_data_multi.cache_clear()
+        start = time.perf_counter()
+        values = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c", max_workers=workers)
+        timings[workers] = time.perf_counter() - start
+        assert len(values) == 8
+
+    # 8 years at 0.25 s each: ~2 s sequential, ~0.5 s with 4 workers
+    assert timings[1] >= 8 * 0.25
+    assert timings[4] < timings[1] / 2
+
+
+def test_multi_variable_fetch_downloads_each_granule_once(fake_archive):
+    variables = ("max_temp_c", "min_temp_c", "precipitation_mm", "wind_speed_kph", "dust_ug_m3")
+
+    combined = nasa_data_fetcher.get_nasa_data_multi(LAT, LON, 7, 15, variables)
+    assert fake_archive.requests == 8
+
+    for var in variables:
+        nasa_data_fetcher.get_cell_data_multi.cache_clear()
+        single = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, var)
+        assert len(single) == 8
+        assert np.allclose(combined[var], single)
+
+
+ALL_VARIABLES = ("max_temp_c", "min_temp_c", "precipitation_mm", "wind_speed_kph", "dust_ug_m3")
+
+
+def test_subset_mode_transfers_far_fewer_bytes(fake_archive, monkeypatch):
+    # A wider window than the default, still a sliver of the real 361 x 576 grid
+    fake_archive.lat = np.arange(20.0, 55.0 + 0.25, 0.5)
+    fake_archive.lon = -180.0 + 0.625 * np.arange(72, 128)
+    monkeypatch.setattr(nasa_data_fetcher, "FETCH_MODE", "full")
+    full = nasa_data_fetcher.get_nasa_data_multi(LAT, LON, 7, 15, ALL_VARIABLES)
+    full_bytes = fake_archive.bytes_sent
+
+    for protocol in ("dap2", "dap4"):
+        nasa_data_fetcher.get_cell_data_multi.cache_clear()
+        monkeypatch.setattr(nasa_data_fetcher, "FETCH_MODE", "subset")
+        monkeypatch.setattr(nasa_data_fetcher, "DAP_PROTOCOL", protocol)
+        fake_archive.bytes_sent = fake_archive.subset_requests = 0
+
+        subset = nasa_data_fetcher.get_nasa_data_multi(LAT, LON, 7, 15, ALL_VARIABLES)
+
+        assert fake_archive.subset_requests == 8
+        assert fake_archive.bytes_sent * 20 < full_bytes
+        for var in ALL_VARIABLES:
+            assert np.allclose(subset[var], full[var])
+
+
+def test_subset_mode_falls_back_to_full_granule(fake_archive):
+    fake_archive.opendap = False
+
+    values = nasa_data_fetcher.get_nasa_data(LAT, LON, 7, 15, "max_temp_c")
+
+    assert fake_archive.subset_requests == 8
+    assert fake_archive.requests == 16
+    assert np.allclose(values, [expected_max_temp(y) for y in range(2001, 2009)], atol=1e-3)
+
+
+def test_point_cache_survives_process_restart(fake_archive, point_cache):
+    first = nasa_data_fetcher.get_nasa_data_multi(LAT, LON, 7, 15, ALL_VARIABLES)
+    requests_after_first = fake_archive.requests
+
+    # Dropping the in-process lru_cache stands in for a restart
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    second = nasa_data_fetcher.get_nasa_data_multi(LAT, LON, 7, 15, ALL_VARIABLES)
+
+    assert fake_archive.requests == requests_after_first
+    assert second == first
+    assert point_cache.stats()["hits"] == 8 * len(ALL_VARIABLES)
+
+
+def test_nearby_points_share_one_grid_cell_fetch(fake_archive):
+    first = nasa_data_fetcher.get_nasa_data(37.74, -119.59, 7, 15, "max_temp_c")
+    requests_after_first = fake_archive.requests
+
+    second = nasa_data_fetcher.get_nasa_data(37.60, -119.50, 7, 15, "max_temp_c")
+
+    assert second == first
+    assert fake_archive.requests == requests_after_first
+
+
+def test_decode_modes_agree_and_fall_back_to_tempfile(capsys, monkeypatch):
+    cell = snap_to_grid(LAT, LON)
+    ds = granule_dataset(2001, 7, 15)
+    content = granule_bytes(ds)
+    want = nasa_data_fetcher._extract_values(ds, cell, ALL_VARIABLES)
+
+    for mode in ("netcdf4-memory", "h5netcdf-memory", "tempfile"):
+        with nasa_data_fetcher.open_granule(content, mode) as opened:
+            assert nasa_data_fetcher._extract_values(opened, cell, ALL_VARIABLES) == want
+
+    # e.g. a netCDF-C build without in-memory support
+    class NoMemoryNetCDF4:
+        def Dataset(self, *args, **kwargs):
+            raise OSError("in-memory open not supported")
+
+    monkeypatch.setattr(nasa_data_fetcher, "netCDF4", NoMemoryNetCDF4())
+    with nasa_data_fetcher.open_granule(content, "netcdf4-memory") as opened:
+        assert nasa_data_fetcher._extract_values(opened, cell, ALL_VARIABLES) == want
+    assert "falling back to a temporary file" in capsys.readouterr().out
+
+
+def test_batch_fetch_reads_each_granule_once_for_all_cells(fake_archive):
+    cells = [snap_to_grid(LAT, LON), snap_to_grid(36.0, -118.0), snap_to_grid(40.1, -121.3)]
+    days = [(7, 15), (7, 16)]
+    variables = ("max_temp_c", "precipitation_mm")
+
+    batch = nasa_data_fetcher.get_batch_data(cells, days, variables, max_workers=4)
+
+    # 8 years x 2 days, each one subset request covering all three cells
+    assert fake_archive.requests == 16
+    assert fake_archive.subset_requests == 16
+    for cell in cells:
+        for month, day in days:
+            single = nasa_data_fetcher.get_cell_data_multi(cell, month, day, variables, 1)
+            for var in variables:
+                assert np.allclose(batch[(cell.index, month, day)][var], single[var], atol=1e-4)
+
+
+def test_overlapping_day_windows_only_download_new_days(fake_archive, point_cache):
+    cell = snap_to_grid(LAT, LON)
+
+    first = nasa_data_fetcher.get_cell_data_multi(cell, 7, 15, ("max_temp_c",), 4, 2)
+    assert fake_archive.requests == 8 * 5
+    assert len(first["max_temp_c"]) == 8 * 5
+    expected = [expected_max_temp(year, 7, day) for year in range(2001, 2009) for day in range(13, 18)]
+    assert np.allclose(first["max_temp_c"], expected, atol=1e-3)
+
+    # July 16 ±2 shares July 14-17 with the first window: only July 18 is new
+    second = nasa_data_fetcher.get_cell_data_multi(cell, 7, 16, ("max_temp_c",), 4, 2)
+    assert fake_archive.requests == 8 * 5 + 8
+    assert len(second["max_temp_c"]) == 8 * 5
+
+
+def test_day_window_crosses_the_year_boundary(fake_archive):
+    cell = snap_to_grid(LAT, LON)
+
+    values = nasa_data_fetcher.get_cell_data_multi(cell, 1, 1, ("max_temp_c",), 4, 1)["max_temp_c"]
+
+    expected = [
+        expected_max_temp(*date)
+        for year in range(2001, 2009)
+        for date in ((year - 1, 12, 31), (year, 1, 1), (year, 1, 2))
+    ]
+    assert np.allclose(values, expected, atol=1e-3)
+
+
+def test_decode_processes_match_in_process_decoding(fake_archive, monkeypatch):
+    cells = [snap_to_grid(LAT, LON), snap_to_grid(36.0, -118.0)]
+    in_process = nasa_data_fetcher.get_batch_data(cells, [(7, 15)], ALL_VARIABLES, max_workers=4)
+
+    monkeypatch.setattr(nasa_data_fetcher, "DECODE_PROCESSES", 2)
+    try:
+        decode_waits = STAGE_SECONDS.count(stage="decode_wait")
+        pooled = nasa_data_fetcher.get_batch_data(cells, [(7, 15)], ALL_VARIABLES, max_workers=4)
+        assert STAGE_SECONDS.count(stage="decode_wait") == decode_waits + 8
+        assert nasa_data_fetcher.get_decode_pool() is not None
+    finally:
+        nasa_data_fetcher.shutdown_decode_pool()
+
+    assert pooled == in_process
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from app.services.granule_reader import ChunkCache, GranuleReader
+from fake_gesdisc import granule_dataset
+
+FIELDS = ["T2M", "U10M", "DUSMASS"]
+
+
+@pytest.fixture
+def granule(tmp_path):
+    """A granule on disk chunked like the real archive: one hour by a tile of cells."""
+    ds = granule_dataset(2001, 7, 15)
+    path = tmp_path / "granule.nc4"
+    encoding = {name: {"zlib": True, "shuffle": True, "chunksizes": (1, 8, 8)} for name in ds.data_vars}
+    ds.to_netcdf(path, engine="netcdf4", encoding=encoding)
+    return ds, str(path)
+
+
+def test_point_reads_match_xarray_and_skip_cells_off_the_grid(granule):
+    ds, path = granule
+    lats = [float(ds.lat[0]), float(ds.lat[-1]), float(ds.lat[9]), 0.0]
+    lons = [float(ds.lon[0]), float(ds.lon[-1]), float(ds.lon[12]), 0.0]
+
+    with GranuleReader(path, ChunkCache(2**20)) as reader:
+        series = reader.read_points(FIELDS, lats, lons)
+
+    for name in FIELDS:
+        for n in range(3):
+            assert series[name][:, n] == pytest.approx(ds[name].sel(lat=lats[n], lon=lons[n]).values)
+        assert np.isnan(series[name][:, 3]).all()
+
+
+def test_only_the_chunks_holding_a_cell_are_decompressed_once(granule):
+    ds, path = granule
+    cache = ChunkCache(2**20)
+    lat, lon = float(ds.lat[9]), float(ds.lon[12])
+
+    with GranuleReader(path, cache) as reader:
+        reader.read_points(["T2M"], [lat], [lon])
+        # 24 one-hour chunks of 8 x 8 float32 cells
+        assert cache.stats()["decompressed_bytes"] == 24 * 8 * 8 * 4
+        assert cache.stats()["decompressed_bytes"] < ds["T2M"].nbytes / 4
+
+        # A neighbouring cell in the same tile is served from the cache
+        reader.read_points(["T2M"], [float(ds.lat[10])], [lon])
+        assert cache.stats()["decompressed_bytes"] == 24 * 8 * 8 * 4
+        assert cache.stats()["hits"] == 24
+
+    # The cache is shared across readers (requests) of the same file
+    with GranuleReader(path, cache) as reader:
+        reader.read_points(["T2M"], [lat], [lon])
+    assert cache.stats()["misses"] == 24
+
+
+def test_chunk_cache_is_bounded(granule):
+    ds, path = granule
+    cache = ChunkCache(10 * 8 * 8 * 4)
+
+    with GranuleReader(path, cache) as reader:
+        reader.read_points(FIELDS, [float(ds.lat[0])], [float(ds.lon[0])])
+
+    stats = cache.stats()
+    assert stats["chunks"] == 10
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["evictions"] == 3 * 24 - 10
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+import httpx
+
+import main
+
+QUERY = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15, "variables": ["max_temp_c"]}
+
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+def test_health_stays_responsive_during_a_slow_analysis(fake_archive):
+    fake_archive.latency = 0.5
+
+    async def scenario():
+        async with client() as http:
+            analysis = asyncio.create_task(http.post("/analyze", json=QUERY, timeout=60))
+            await asyncio.sleep(0.1)
+            started = time.perf_counter()
+            health = await http.get("/health")
+            health_seconds = time.perf_counter() - started
+            return health, health_seconds, await analysis
+
+    health, health_seconds, analysis = asyncio.run(scenario())
+
+    assert health.status_code == 200
+    assert health.json() == {"status": "ok", "inflight_fetches": 1}
+    assert health_seconds < 0.25
+    assert analysis.status_code == 200
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+from app import config
+
+QUERY = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15, "variables": ["max_temp_c", "precipitation_mm"]}
+
+
+async def call(method, path, body=None):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.request(method, path, json=body)
+
+
+def wait_for(job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = asyncio.run(call("GET", f"/jobs/{job_id}")).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_analyze_job_matches_analyze_and_is_deduplicated(fake_archive):
+    submitted = asyncio.run(call("POST", "/jobs/analyze", QUERY))
+    assert submitted.status_code == 202
+
+    # Another point in the same grid cell is the same query
+    same_cell = asyncio.run(call("POST", "/jobs/analyze", dict(QUERY, latitude=37.6)))
+    assert same_cell.json()["id"] == submitted.json()["id"]
+
+    job = wait_for(submitted.json()["id"])
+    assert job["status"] == "done"
+    assert (job["done"], job["total"]) == (8, 8)
+    # One download per granule, shared by both submissions
+    assert fake_archive.subset_requests == 8
+    assert job["result"] == asyncio.run(call("POST", "/analyze", QUERY)).json()
+
+    assert asyncio.run(call("POST", "/jobs/analyze", QUERY)).json()["id"] == job["id"]
+    assert asyncio.run(call("GET", "/jobs/unknown")).status_code == 404
+
+
+def test_batch_job_matches_analyze_batch(fake_archive):
+    body = {
+        "points": [{"latitude": 37.74, "longitude": -119.59}, {"latitude": 36.0, "longitude": -118.0}],
+        "dates": [{"month": 7, "day": 15}, {"month": 7, "day": 16}],
+        "variables": ["max_temp_c", "wind_speed_kph"],
+    }
+
+    job = wait_for(asyncio.run(call("POST", "/jobs/batch", body)).json()["id"])
+
+    assert job["status"] == "done"
+    assert (job["done"], job["total"]) == (2, 2)
+    assert job["partial"] is None
+    # Bootstrap intervals are seeded per request, so they may differ in the last digits
+    expected = asyncio.run(call("POST", "/analyze/batch", body)).json()
+    for name, values in expected["results"].items():
+        assert job["result"]["results"][name] == pytest.approx(values), name
+    assert {**job["result"], "results": None} == {**expected, "results": None}
+
+
+def test_jobs_run_in_worker_processes(monkeypatch):
+    # Spawned workers read their configuration from the environment
+    monkeypatch.setenv("DATA_SOURCE", "simulator")
+    monkeypatch.setattr(config, "DATA_SOURCE", "simulator")
+    monkeypatch.setattr(config, "JOB_PROCESSES", 1)
+
+    job = wait_for(asyncio.run(call("POST", "/jobs/analyze", QUERY)).json()["id"])
+
+    assert job["status"] == "done"
+    assert job["result"] == asyncio.run(call("POST", "/analyze", QUERY)).json()
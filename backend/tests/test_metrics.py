@@ -0,0 +1,73 @@
+import asyncio
+import re
+
+import httpx
+
+import main
+from app.main import app as scaffold_app
+from app.utils.metrics import Counter, Histogram
+
+QUERY = {"latitude": 37.74, "longitude": -119.59, "month": 7, "day": 15, "variables": ["max_temp_c"]}
+
+
+def sample(text, name):
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ["stage"], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, stage='say "hi"')
+    counter = Counter("demo_total", "Demo.")
+    counter.inc(2)
+
+    lines = histogram.render() + counter.render()
+
+    assert lines[:2] == ["# HELP demo_seconds Demo.", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="say \\"hi\\"",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{stage="say \\"hi\\""} 4' in lines
+    assert "demo_total 2" in lines
+
+
+def test_metrics_cover_every_stage_of_a_query(fake_archive, point_cache):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            before = (await http.get("/metrics")).text
+            assert (await http.post("/analyze", json=QUERY, timeout=60)).status_code == 200
+            return before, await http.get("/metrics")
+
+    before, response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    def grew(name, by=1):
+        return (sample(text, name) or 0) - (sample(before, name) or 0) >= by
+
+    for stage in ("auth", "resolve", "download", "hdf5_lock_wait", "decode", "select_reduce",
+                  "cache_lookup", "statistics"):
+        per_granule = stage in ("resolve", "download", "hdf5_lock_wait", "decode", "select_reduce")
+        assert grew(f'terraclime_stage_seconds_count{{stage="{stage}"}}', 8 if per_granule else 1), stage
+    assert grew('terraclime_request_seconds_count{endpoint="analyze"}')
+    assert grew('terraclime_granules_total{outcome="ok"}', 8)
+    assert grew('terraclime_download_bytes_total{mode="subset"}', 1000)
+    assert sample(text, "terraclime_point_cache_misses_total") == 8
+    assert sample(text, "terraclime_point_cache_hit_ratio") == 0.0
+    assert sample(text, "terraclime_earthdata_requests_total") == 8
+
+
+def test_scaffold_app_serves_metrics():
+    async def scenario():
+        transport = httpx.ASGITransport(app=scaffold_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get("/metrics")
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert "# TYPE terraclime_stage_seconds histogram" in response.text
@@ -0,0 +1,61 @@
+import numpy as np
+
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+from app.services.pipeline import build_climatology_cube
+from app.storage import store
+from app.storage.store import ClimatologyCube
+from fake_gesdisc import granule_dataset
+
+BBOX = (36.0, -121.0, 39.0, -118.0)
+DAYS = [(7, 14), (7, 15), (7, 16)]
+VARIABLES = ("max_temp_c", "min_temp_c", "precipitation_mm", "wind_speed_kph", "dust_ug_m3")
+
+
+def expected(cell, year, month, day):
+    return nasa_data_fetcher._extract_values(granule_dataset(year, month, day), cell, VARIABLES)
+
+
+def test_build_cube_from_mirror_matches_point_extraction(tmp_path, granule_mirror):
+    (granule_mirror / "2002" / "07").joinpath(
+        nasa_data_fetcher.granule_url(2002, 7, 16).rsplit("/", 1)[-1]).unlink()
+
+    totals = build_climatology_cube(tmp_path / "cube", 2001, 2003, BBOX, days=DAYS,
+                                    mirror_dir=str(granule_mirror), processes=2)
+
+    assert totals == {"done": 8, "missing": 1, "failed": 0}
+    cube = ClimatologyCube(tmp_path / "cube")
+    cell = snap_to_grid(37.74, -119.59)
+    sample = cube.sample(cell.index, 7, 15, VARIABLES, [2001, 2002, 2003])
+    for var in VARIABLES:
+        want = [expected(cell, year, 7, 15)[var] for year in (2001, 2002, 2003)]
+        assert np.allclose(sample[var], want, rtol=1e-5)
+    # The missing granule is left out rather than reported as a value
+    assert len(cube.sample(cell.index, 7, 16, VARIABLES, [2001, 2002, 2003])["max_temp_c"]) == 2
+
+
+def test_build_resumes_without_redoing_finished_days(tmp_path, granule_mirror):
+    first = build_climatology_cube(tmp_path / "cube", 2001, 2003, BBOX, days=DAYS[:1],
+                                   mirror_dir=str(granule_mirror), processes=1)
+    second = build_climatology_cube(tmp_path / "cube", 2001, 2003, BBOX, days=DAYS,
+                                    mirror_dir=str(granule_mirror), processes=1)
+
+    assert first["done"] == 3
+    assert second["done"] == 6
+
+
+def test_fetcher_answers_from_cube_without_downloads(tmp_path, granule_mirror, monkeypatch):
+    build_climatology_cube(tmp_path / "cube", 2001, 2003, BBOX, days=DAYS,
+                           mirror_dir=str(granule_mirror), processes=1)
+    monkeypatch.setattr(store, "CLIMATOLOGY_CUBE_DIR", str(tmp_path / "cube"))
+    monkeypatch.setattr(nasa_data_fetcher, "CLIMATE_START_YEAR", 2001)
+    monkeypatch.setattr(nasa_data_fetcher, "CLIMATE_END_YEAR", 2003)
+    # Any download attempt would fail loudly
+    monkeypatch.setattr(nasa_data_fetcher, "get_session", None)
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+
+    values = nasa_data_fetcher.get_nasa_data_multi(37.74, -119.59, 7, 15, VARIABLES)
+
+    cell = snap_to_grid(37.74, -119.59)
+    assert np.allclose(values["dust_ug_m3"], [expected(cell, y, 7, 15)["dust_ug_m3"] for y in (2001, 2002, 2003)])
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
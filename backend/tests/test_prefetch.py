@@ -0,0 +1,94 @@
+import asyncio
+import datetime
+
+import httpx
+
+import main
+import nasa_data_fetcher
+from app.services.datasets import snap_to_grid
+from app.services.prefetch import Prefetcher, TrafficMonitor
+
+YOSEMITE = [("Yosemite Valley, USA", 37.74, -119.59)]
+
+
+def JULY_15():
+    return datetime.date(2024, 7, 15)
+
+
+async def no_fetch(cell, month, day, variables):
+    raise AssertionError("not expected to fetch")
+
+
+def test_plan_covers_examples_and_popular_cells_nearest_dates_first(point_cache):
+    popular = snap_to_grid(40.0, -120.0)
+    for _ in range(3):
+        point_cache.log_query(popular.index, 7, 1)
+    point_cache.log_query(snap_to_grid(36.0, -118.0).index, 7, 1)
+    # A second example in the same grid cell is not fetched twice
+    locations = YOSEMITE + [("Yosemite Falls", 37.60, -119.50)]
+    prefetcher = Prefetcher(no_fetch, locations=locations, days_ahead=2, popular_cells=1, today=JULY_15)
+
+    assert prefetcher.plan() == 4
+    assert list(prefetcher._queue) == [
+        (snap_to_grid(37.74, -119.59), 7, 15),
+        (popular, 7, 15),
+        (snap_to_grid(37.74, -119.59), 7, 16),
+        (popular, 7, 16),
+    ]
+
+
+def test_prefetch_warms_the_point_cache(fake_archive, point_cache):
+    prefetcher = Prefetcher(main.prefetch_item, traffic=TrafficMonitor(), locations=YOSEMITE,
+                            days_ahead=2, popular_cells=0, idle_seconds=0, today=JULY_15)
+
+    asyncio.run(prefetcher.run_once())
+
+    assert prefetcher.status()["done"] == 2
+    assert prefetcher.status()["queue_depth"] == 0
+    assert prefetcher.status()["progress"] == 1.0
+    downloads = fake_archive.requests
+    assert downloads == 16
+
+    # The first live query is now served without touching the archive
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    values = nasa_data_fetcher.get_nasa_data_multi(37.74, -119.59, 7, 16, ["max_temp_c", "dust_ug_m3"])
+    assert len(values["max_temp_c"]) == 8
+    assert fake_archive.requests == downloads
+
+
+def test_prefetch_yields_to_live_traffic():
+    traffic = TrafficMonitor()
+    fetched = []
+
+    async def fetch(cell, month, day, variables):
+        fetched.append((month, day))
+
+    prefetcher = Prefetcher(fetch, traffic=traffic, locations=YOSEMITE, days_ahead=3,
+                            popular_cells=0, idle_seconds=0.1, today=JULY_15)
+
+    async def scenario():
+        with traffic.track():
+            task = asyncio.create_task(prefetcher.run_once())
+            await asyncio.sleep(0.3)
+            paused = (prefetcher.status(), list(fetched))
+        await task
+        return paused
+
+    paused_status, fetched_while_busy = asyncio.run(scenario())
+
+    assert fetched_while_busy == []
+    assert paused_status["state"] == "paused"
+    assert paused_status["queue_depth"] == 3
+    assert fetched == [(7, 15), (7, 16), (7, 17)]
+
+
+def test_status_endpoint():
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get("/prefetch/status")
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 200
+    assert {"state", "queue_depth", "planned", "done", "failed", "progress"} <= set(response.json())
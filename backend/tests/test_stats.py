@@ -0,0 +1,74 @@
+import numpy as np
+from scipy.stats import norm
+
+from app.services import stats
+
+RNG = np.random.default_rng(7)
+SERIES = [RNG.normal(30, 3, size=n) for n in (30, 25, 1, 12)]
+
+
+def test_describe_matches_per_row_numpy():
+    samples = stats.pad_series(SERIES)
+    thresholds = np.array([32.0, 28.0, 29.0, 31.0])
+
+    result = stats.describe(samples, thresholds, resamples=0)
+
+    for row, values in enumerate(SERIES):
+        threshold = thresholds[row]
+        scale = np.std(values) if np.std(values) > 0 else 0.01
+        assert result["count"][row] == len(values)
+        assert np.isclose(result["mean"][row], np.mean(values))
+        assert np.isclose(result["std"][row], np.std(values))
+        assert np.isclose(result["normal_exceedance"][row], norm.sf(threshold, np.mean(values), scale))
+        assert np.isclose(result["empirical_exceedance"][row], np.mean(values > threshold))
+        assert np.allclose(result["quantiles"][row], np.quantile(values, stats.QUANTILES))
+
+
+def test_missing_samples_anywhere_in_a_row_are_ignored():
+    row = np.array([np.nan, 1.0, 2.0, np.nan, 3.0])
+    result = stats.describe(np.vstack([row, np.full(5, np.nan)]), [1.5, 0.0], empirical=[True, True])
+
+    assert list(result["count"]) == [3, 0]
+    assert result["mean"][0] == 2.0
+    assert np.isclose(result["probability"][0], 2 / 3)
+    assert np.isnan(result["mean"][1]) and np.isnan(result["ci_low"][1])
+
+
+def test_bootstrap_interval_brackets_the_estimate_and_is_reproducible():
+    samples = stats.pad_series(SERIES[:2])
+    thresholds = [32.0, 30.0]
+
+    first = stats.describe(samples, thresholds, empirical=[False, True])
+    second = stats.describe(samples, thresholds, empirical=[False, True])
+
+    assert np.array_equal(first["ci_low"], second["ci_low"])
+    assert np.all(first["ci_low"] <= first["probability"])
+    assert np.all(first["probability"] <= first["ci_high"])
+    assert np.all(first["ci_high"] - first["ci_low"] > 0)
+
+
+def test_bootstrap_in_row_blocks(monkeypatch):
+    monkeypatch.setattr(stats, "BOOTSTRAP_BLOCK_SIZE", 1)
+
+    result = stats.describe(stats.pad_series(SERIES), 30.0)
+
+    assert np.all(result["ci_low"] <= result["probability"])
+    assert np.all(result["probability"] <= result["ci_high"])
+    # A single sample resamples to itself
+    assert result["ci_low"][2] == result["ci_high"][2] == result["probability"][2]
+
+
+def test_summarize_many_keeps_item_order_and_skips_empty_series():
+    summaries = stats.summarize_many([
+        ("max_temp_c", SERIES[0]),
+        ("precipitation_mm", []),
+        ("unknown", SERIES[1]),
+        ("precipitation_mm", [0.0, 2.0, 3.0, 0.5]),
+    ])
+
+    assert summaries[1] is None and summaries[2] is None
+    assert summaries[0]["variable"] == "max_temp_c"
+    assert summaries[0]["mean"] == round(float(np.mean(SERIES[0])), 2)
+    assert set(summaries[0]["percentiles"]) == {"p10", "p50", "p90"}
+    assert summaries[3]["likelihood"]["probability_of_event"] == 0.5
+    assert "probability_exceeding" not in summaries[3]["likelihood"]
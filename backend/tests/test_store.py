@@ -0,0 +1,171 @@
+import datetime
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import nasa_data_fetcher
+from app.services.datasets import cell_from_index
+from app.storage.store import ClimateRecordStore, PointCache, SeriesStore
+
+CELL = (255, 97)
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = PointCache(tmp_path / "points.sqlite")
+    cache.put_many(CELL, {("max_temp_c", "2001-07-15"): 31.5, ("max_temp_c", "2002-07-15"): 30.25})
+
+    found = cache.get_many(CELL, ["max_temp_c", "dust_ug_m3"], ["2001-07-15", "2002-07-15"])
+
+    assert found == {("max_temp_c", "2001-07-15"): 31.5, ("max_temp_c", "2002-07-15"): 30.25}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_persists_across_instances(tmp_path):
+    PointCache(tmp_path / "points.sqlite").put_many(CELL, {("dust_ug_m3", "2010-01-01"): 12.0})
+
+    reopened = PointCache(tmp_path / "points.sqlite")
+
+    assert reopened.get_many(CELL, ["dust_ug_m3"], ["2010-01-01"]) == {("dust_ug_m3", "2010-01-01"): 12.0}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = PointCache(tmp_path / "points.sqlite", max_entries=10)
+    for year in range(2001, 2011):
+        cache.put_many(CELL, {("max_temp_c", f"{year}-07-15"): float(year)})
+    # Touch the oldest entry so it survives eviction
+    cache.get_many(CELL, ["max_temp_c"], ["2001-07-15"])
+
+    cache.put_many(CELL, {("max_temp_c", "2011-07-15"): 2011.0})
+
+    stats = cache.stats()
+    assert stats["entries"] == 9
+    assert stats["evictions"] == 2
+    assert cache.get_many(CELL, ["max_temp_c"], ["2001-07-15"])
+    assert not cache.get_many(CELL, ["max_temp_c"], ["2002-07-15"])
+
+
+def test_entry_count_is_kept_without_scanning(tmp_path):
+    cache = PointCache(tmp_path / "points.sqlite")
+    cache.put_many(CELL, {("max_temp_c", "2001-07-15"): 31.5, ("max_temp_c", "2002-07-15"): 30.25})
+    # Overwriting a value does not add an entry
+    cache.put_many(CELL, {("max_temp_c", "2001-07-15"): 29.0, ("max_temp_c", "2003-07-15"): 28.0})
+
+    assert cache.stats()["entries"] == 3
+    assert cache.get_many(CELL, ["max_temp_c"], ["2001-07-15"]) == {("max_temp_c", "2001-07-15"): 29.0}
+
+    # A cache written before the count was kept is counted once when opened
+    cache._connection().execute("DELETE FROM counters WHERE name = 'entries'")
+    assert PointCache(tmp_path / "points.sqlite").stats()["entries"] == 3
+
+
+def _write_rows(path, worker):
+    cache = PointCache(path)
+    for day in range(1, 29):
+        cache.put_many((worker, 0), {("max_temp_c", f"2001-02-{day:02d}"): float(day)})
+
+
+def test_concurrent_writers_from_several_processes(tmp_path):
+    path = str(tmp_path / "points.sqlite")
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_write_rows, args=(path, w)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(60)
+        assert p.exitcode == 0
+
+    assert PointCache(path).stats()["entries"] == 4 * 28
+
+
+def test_series_store_round_trip_and_zero_copy_reads(tmp_path):
+    store = SeriesStore(tmp_path / "series")
+    values = {("max_temp_c", f"{year}-07-15"): 30 + year / 1000 for year in range(1991, 2021)}
+    store.put_many(CELL, values)
+
+    found = SeriesStore(tmp_path / "series").get_many(CELL, ["max_temp_c", "dust_ug_m3"], ["2001-07-15", "2001-07-16"])
+    assert found == {("max_temp_c", "2001-07-15"): float(np.float32(32.001))}
+
+    # One calendar day within a block of years is a read-only view of the mapped file
+    decade = store.series(CELL, "max_temp_c", [datetime.date(year, 7, 15) for year in range(2000, 2010)])
+    assert not decade.flags.owndata and not decade.flags.writeable
+    assert decade.dtype == np.float32 and decade.nbytes == 10 * 4
+    assert decade.tolist() == [np.float32(30 + year / 1000) for year in range(2000, 2010)]
+
+    # Spanning blocks, or with gaps, the values are gathered
+    period = store.series(CELL, "max_temp_c", [datetime.date(year, 7, 15) for year in range(1991, 2021)])
+    assert np.allclose(period, [30 + year / 1000 for year in range(1991, 2021)])
+    assert np.isnan(store.series((0, 0), "max_temp_c", [datetime.date(2001, 7, 15)])).all()
+
+
+def test_series_store_files_are_sparse_and_counters_shared(tmp_path):
+    store = SeriesStore(tmp_path / "series")
+    store.put_many(CELL, {("max_temp_c", "2001-07-15"): 31.5})
+    store.get_many(CELL, ["max_temp_c"], ["2001-07-15", "2001-07-16"])
+
+    # A full block would be ~3.75 MB of values; only the written pages take space
+    stats = SeriesStore(tmp_path / "series").stats()
+    assert (stats["hits"], stats["misses"], stats["files"]) == (1, 1, 1)
+    assert stats["bytes"] < 64 * 1024
+    # A stored zero is a value, an unwritten zero is not
+    store.put_many(CELL, {("max_temp_c", "2002-07-15"): 0.0})
+    assert store.get_many(CELL, ["max_temp_c"], ["2002-07-15", "2003-07-15"]) == {("max_temp_c", "2002-07-15"): 0.0}
+
+
+def test_series_store_evicts_least_recently_used_blocks(tmp_path):
+    sizing = SeriesStore(tmp_path / "sizing")
+    sizing.put_many(CELL, {("max_temp_c", "2001-07-15"): 31.5})
+    store = SeriesStore(tmp_path / "series", max_bytes=int(sizing.stats()["bytes"] * 3.5))
+    for year in (2001, 2011, 2021):
+        store.put_many(CELL, {("max_temp_c", f"{year}-07-15"): 31.5})
+    # Read the oldest block so the next-oldest is evicted instead
+    store.get_many(CELL, ["max_temp_c"], ["2001-07-15"])
+
+    store.put_many(CELL, {("max_temp_c", "1991-07-15"): 29.0})
+
+    stats = store.stats()
+    assert stats["bytes"] <= store.max_bytes * 0.9
+    assert (stats["files"], stats["evictions"]) == (3, 1)
+    assert store.get_many(CELL, ["max_temp_c"], ["2001-07-15", "2011-07-15"]) == {("max_temp_c", "2001-07-15"): 31.5}
+    # Another instance does not read an evicted block through a stale map
+    assert not SeriesStore(tmp_path / "series").get_many(CELL, ["max_temp_c"], ["2011-07-15"])
+
+
+def test_fetcher_reads_the_series_store_without_downloading(fake_archive, series_store):
+    cell = cell_from_index(255, 97)
+    variables = ("max_temp_c", "wind_speed_kph")
+    first = nasa_data_fetcher.get_cell_data_multi(cell, 7, 15, variables, 4)
+    assert fake_archive.requests == 8
+
+    nasa_data_fetcher.get_cell_data_multi.cache_clear()
+    second = nasa_data_fetcher.get_cell_data_multi(cell, 7, 15, variables, 4)
+
+    assert fake_archive.requests == 8
+    for var in variables:
+        assert second[var].tolist() == first[var].tolist()
+        # Years 2001-2008 lie in one block: served straight from the mapped file
+        assert not second[var].flags.owndata
+
+
+def test_climate_record_period_statistics_come_from_stored_aggregates(tmp_path):
+    rng = np.random.default_rng(3)
+    values = {year: (25 + rng.normal(size=3)).astype(np.float32).tolist() for year in range(1980, 2025)}
+    values[1996] = []  # a year without values still counts as covered
+    store = ClimateRecordStore(tmp_path / "records.sqlite")
+
+    # Years arrive out of order: the baseline first, then later and earlier ones
+    for years in (range(1991, 2021), range(2021, 2025), range(1980, 1991)):
+        store.add_years(CELL, 7, 15, 1, {"max_temp_c": {year: values[year] for year in years}})
+    record = ClimateRecordStore(tmp_path / "records.sqlite").get_many(CELL, 7, 15, 1, ["max_temp_c"])["max_temp_c"]
+
+    assert record.years.tolist() == list(range(1980, 2025))
+    assert record.missing(range(1975, 1982)) == [1975, 1976, 1977, 1978, 1979]
+    for start, end in ((1980, 2024), (1991, 2020), (1995, 1997), (2024, 2024)):
+        expected = np.array([v for year in range(start, end + 1) for v in values[year]], dtype=np.float32)
+        sample, mean, std = record.period(start, end)
+        assert sample.tolist() == sorted(expected.tolist())
+        assert mean == pytest.approx(expected.astype(np.float64).mean(), abs=1e-9)
+        assert std == pytest.approx(expected.astype(np.float64).std(), abs=1e-9)
+    assert np.isnan(record.period(1996, 1996)[1])